@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+бенчмарк CoinGeckoClient на 500 монетах против локальной заглушки /simple/price;
+отдельно — поиск id по справочнику /coins/list без CRYPTO_ID_MAP
+
+    poetry run python benchmarks/bench_coingecko.py [--coins 500] [--latency 0.2]
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from valutatrade_hub.parser_service.api_clients import CoinGeckoClient  # noqa: E402
+from valutatrade_hub.parser_service.config import ParserConfig  # noqa: E402
+
+
+def coin_list(coins: int) -> list:
+    """монеты заглушки; у каждого символа есть мелкий двойник с тем же тикером"""
+    listed = []
+    for i in range(coins):
+        symbol = coin_code(i).lower()
+        listed.append({"id": f"coin-{i}", "symbol": symbol, "name": f"Coin {i}"})
+        listed.append({"id": f"a-{symbol}-clone", "symbol": symbol,
+                       "name": f"Clone {i}"})
+    return listed
+
+
+def make_handler(latency: float, fail_every: int, coins: int = 0):
+    counter = {"requests": 0}
+    lock = threading.Lock()
+
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            with lock:
+                counter["requests"] += 1
+                number = counter["requests"]
+            time.sleep(latency)
+
+            if fail_every and number % fail_every == 0:
+                self.send_response(503)
+                self.end_headers()
+                return
+
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            if url.path.endswith("/coins/list"):
+                body = json.dumps(coin_list(coins))
+            elif url.path.endswith("/coins/markets"):
+                page, per_page = int(query["page"][0]), int(query["per_page"][0])
+                ranked = range((page - 1) * per_page, min(page * per_page, coins))
+                body = json.dumps([{"id": f"coin-{i}", "market_cap": 1e9 - i}
+                                   for i in ranked])
+            else:
+                ids = query.get("ids", [""])[0].split(",")
+                body = json.dumps({coin_id: {"usd": 1.0 + i}
+                                   for i, coin_id in enumerate(ids)})
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body.encode())
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler, counter
+
+
+def coin_code(i: int) -> str:
+    letters = ""
+    for _ in range(4):
+        i, rest = divmod(i, 26)
+        letters += chr(ord("A") + rest)
+    return letters
+
+
+def run_case(name: str, port: int, coins: int, **overrides):
+    config = ParserConfig(
+        COINGECKO_URL=f"http://127.0.0.1:{port}/simple/price",
+        CRYPTO_CURRENCIES=tuple(coin_code(i) for i in range(coins)),
+        CRYPTO_ID_MAP={coin_code(i): f"coin-{i}" for i in range(coins)},
+        COINGECKO_RATE_LIMIT=1000.0,
+        COINGECKO_RATE_BURST=1000,
+        **overrides,
+    )
+    client = CoinGeckoClient(config)
+
+    start = time.perf_counter()
+    rates = client.fetch_rates()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<40} {elapsed:8.3f} s   rates: {len(rates)}")
+
+
+def run_discovery(port: int, coins: int, coins_file: str):
+    """первый клиент скачивает справочник, второй клиент берёт его с диска"""
+    base = f"http://127.0.0.1:{port}"
+    config = ParserConfig(
+        COINGECKO_URL=f"{base}/simple/price",
+        COINGECKO_COINS_LIST_URL=f"{base}/coins/list",
+        COINGECKO_MARKETS_URL=f"{base}/coins/markets",
+        COINGECKO_COINS_FILE_PATH=coins_file,
+        CRYPTO_CURRENCIES=tuple(coin_code(i) for i in range(coins)),
+        COINGECKO_CHUNK_SIZE=100,
+        COINGECKO_MAX_WORKERS=4,
+        COINGECKO_RATE_LIMIT=1000.0,
+        COINGECKO_RATE_BURST=1000,
+    )
+    expected = {coin_code(i): f"coin-{i}" for i in range(coins)}
+    for name in ("discovery, first load (download)", "discovery, cached list on disk"):
+        client = CoinGeckoClient(config)
+        start = time.perf_counter()
+        resolved = client._resolve_ids()
+        resolve_elapsed = time.perf_counter() - start
+        rates = client.fetch_rates()
+        elapsed = time.perf_counter() - start
+        print(f"{name:<40} {elapsed:8.3f} s   rates: {len(rates)}   "
+              f"resolve: {resolve_elapsed * 1000:.1f} ms, downloads: "
+              f"{client.coin_ids.stats['downloads']}, "
+              f"ids by market cap: {resolved == expected}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--coins", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+    logging.getLogger("parser").setLevel(logging.CRITICAL)
+
+    handler, _ = make_handler(args.latency, fail_every=0)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+
+    print(f"{args.coins} coins, "
+          f"stub latency {args.latency * 1000:.0f} ms per request\n")
+    run_case("single request (chunk = all ids)", port, args.coins,
+             COINGECKO_CHUNK_SIZE=args.coins, COINGECKO_MAX_WORKERS=1)
+    run_case("chunks of 100, sequential", port, args.coins,
+             COINGECKO_CHUNK_SIZE=100, COINGECKO_MAX_WORKERS=1)
+    run_case("chunks of 100, 4 workers", port, args.coins,
+             COINGECKO_CHUNK_SIZE=100, COINGECKO_MAX_WORKERS=4)
+    run_case("chunks of 50, 8 workers", port, args.coins,
+             COINGECKO_CHUNK_SIZE=50, COINGECKO_MAX_WORKERS=8)
+    server.shutdown()
+
+    handler, _ = make_handler(args.latency, fail_every=3)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    run_case("chunks of 100, 4 workers, every 3rd fails", server.server_address[1],
+             args.coins, COINGECKO_CHUNK_SIZE=100, COINGECKO_MAX_WORKERS=4)
+    server.shutdown()
+
+    handler, _ = make_handler(args.latency, fail_every=0, coins=args.coins)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    workdir = tempfile.mkdtemp(prefix="valutatrade-coins-")
+    try:
+        run_discovery(server.server_address[1], args.coins,
+                      os.path.join(workdir, "coingecko_coins.json"))
+    finally:
+        server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+время векторного планирования ребалансировки для N портфелей
+
+    poetry run python benchmarks/bench_rebalance.py [--portfolios 1000000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from valutatrade_hub.core.rebalance import (  # noqa: E402
+    RebalancePlanner,
+    compute_rebalance,
+    parse_targets,
+)
+
+CURRENCIES = ["BTC", "USD", "ETH", "EUR", "LTC", "ADA"]
+PRICES = np.array([88000.0, 1.0, 3000.0, 1.08, 78.0, 0.35])
+
+
+def synthetic_portfolios(count: int, seed: int) -> list:
+    """записи как в portfolios.json: у каждого пользователя 2–4 случайных кошелька"""
+    rnd = np.random.default_rng(seed)
+    held = np.argsort(rnd.random((count, len(CURRENCIES))), axis=1)
+    sizes = rnd.integers(2, 5, size=count)
+    balances = (rnd.uniform(0, 5000, size=(count, len(CURRENCIES))) / PRICES).tolist()
+    portfolios = []
+    for row in range(count):
+        portfolios.append({"user_id": row + 1, "wallets": {
+            CURRENCIES[i]: {"currency_code": CURRENCIES[i], "balance": balances[row][i]}
+            for i in held[row, :sizes[row]].tolist()
+        }})
+    return portfolios
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--portfolios", type=int, default=1_000_000)
+    parser.add_argument("--target", default="BTC:60,USD:40")
+    parser.add_argument("--min-trade", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    targets = parse_targets(args.target)
+    started = time.perf_counter()
+    portfolios = synthetic_portfolios(args.portfolios, args.seed)
+    elapsed = time.perf_counter() - started
+    print(f"generated {len(portfolios):,} portfolios in {elapsed:.1f} s")
+
+    started = time.perf_counter()
+    _, columns, balances = RebalancePlanner.build_matrix(portfolios, targets)
+    matrix_seconds = time.perf_counter() - started
+    prices = PRICES[[CURRENCIES.index(code) for code in columns]]
+    weights = np.array([targets.get(code, 0.0) for code in columns])
+    cash_index = columns.index("USD") if "USD" in targets else None
+
+    timings = []
+    for _ in range(5):
+        started = time.perf_counter()
+        deltas = compute_rebalance(balances, prices, weights, args.min_trade,
+                                   cash_index)
+        timings.append(time.perf_counter() - started)
+
+    after = balances + deltas
+    values = after * prices
+    shares = values / values.sum(axis=1, keepdims=True)
+    drift = np.abs(shares - weights).max(axis=1)
+
+    print(f"matrix {balances.shape[0]:,} × {balances.shape[1]} "
+          f"built in {matrix_seconds:.2f} s")
+    print(f"planning: best {min(timings) * 1000:.1f} ms, "
+          f"median {sorted(timings)[2] * 1000:.1f} ms")
+    print(f"orders: {np.count_nonzero(deltas):,}, "
+          f"turnover {float((np.abs(deltas) * prices).sum()):,.0f} USD, "
+          f"portfolios off target by >1% after plan: {int((drift > 0.01).sum()):,} "
+          f"(legs below --min-trade)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+бенчмарк сериализаторов на больших portfolios.json и exchange_rates.json
+
+    poetry run python benchmarks/bench_serializers.py [--users 20000] [--records 100000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from valutatrade_hub.infra.serializers import available_serializers  # noqa: E402
+
+CODES = ["USD", "EUR", "GBP", "RUB", "JPY", "CNY", "BTC", "ETH", "SOL", "USDT"]
+
+
+def make_portfolios(users: int) -> list:
+    rnd = random.Random(42)
+    return [
+        {
+            "user_id": user_id,
+            "wallets": {
+                code: {"currency_code": code, "balance": round(rnd.uniform(0, 1e4), 6)}
+                for code in rnd.sample(CODES, rnd.randint(1, len(CODES)))
+            }
+        }
+        for user_id in range(1, users + 1)
+    ]
+
+
+def make_history(records: int) -> list:
+    rnd = random.Random(7)
+    history = []
+    for i in range(records):
+        from_currency = rnd.choice(CODES[1:])
+        timestamp = f"2025-10-{1 + i % 28:02d}T12:{i % 60:02d}:00.{i % 1000000:06d}"
+        history.append({
+            "id": f"{from_currency}_USD_{timestamp}",
+            "from_currency": from_currency,
+            "to_currency": "USD",
+            "rate": rnd.uniform(0.001, 100000.0),
+            "timestamp": timestamp,
+            "source": "CoinGecko",
+            "meta": {}
+        })
+    return history
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_dataset(title: str, data: list, tmp_dir: str, repeat: int):
+    print(f"\n{title}")
+    print(f"{'format':<12} {'dump, s':>9} {'load, s':>9} {'size, KB':>10}")
+    for name, serializer in available_serializers().items():
+        path = os.path.join(tmp_dir, f"{name}.json")
+        dump_time = best_of(lambda: serializer.dump_file(data, path), repeat)
+        load_time = best_of(lambda: serializer.load_file(path), repeat)
+        size_kb = os.path.getsize(path) / 1024
+        print(f"{name:<12} {dump_time:9.3f} {load_time:9.3f} {size_kb:10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--records", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        run_dataset(f"portfolios.json, {args.users} users",
+                    make_portfolios(args.users), tmp_dir, args.repeat)
+        run_dataset(f"exchange_rates.json, {args.records} records",
+                    make_history(args.records), tmp_dir, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+нагрузочный генератор: N трейдеров (потоки или процессы) выполняют смесь
+login/buy/sell/show-portfolio/get-rate над копией data/, параллельно
+update-rates ходит в локальную заглушку провайдеров; в конце итоговые балансы
+сверяются с успешными сделками
+
+    poetry run python benchmarks/load_generator.py [--traders 8] [--mode thread|process]
+        [--ops 200] [--update-interval 0.2] [--keep]
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from valutatrade_hub.core.usecases import PortfolioManager, UserManager  # noqa: E402
+from valutatrade_hub.core.utils import DataManager, ExchangeRateService  # noqa: E402
+from valutatrade_hub.infra.serializers import get_serializer  # noqa: E402
+from valutatrade_hub.parser_service.config import ParserConfig  # noqa: E402
+from valutatrade_hub.parser_service.updater import RatesUpdater  # noqa: E402
+
+PASSWORD = "load-test"
+CURRENCIES = ["BTC", "ETH", "LTC", "ADA", "EUR", "GBP"]
+FIAT = {"EUR": 0.92, "GBP": 0.79, "JPY": 150.0, "RUB": 95.0}
+CRYPTO = {"bitcoin": 88000.0, "ethereum": 3000.0, "litecoin": 78.0, "cardano": 0.35}
+OPERATIONS = {"buy": 30, "sell": 20, "show-portfolio": 25, "get-rate": 20, "login": 5}
+
+
+def make_stub_handler():
+    rnd = random.Random(0)
+    lock = threading.Lock()
+
+    def walk(price: float) -> float:
+        with lock:
+            return price * (1 + rnd.uniform(-0.01, 0.01))
+
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path.endswith("/simple/price"):
+                ids = parse_qs(url.query).get("ids", [""])[0].split(",")
+                body = {coin: {"usd": walk(CRYPTO[coin])}
+                        for coin in ids if coin in CRYPTO}
+            else:
+                rates = {code: walk(rate) for code, rate in FIAT.items()}
+                body = {"result": "success", "conversion_rates": {"USD": 1.0, **rates}}
+
+            raw = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+
+def stub_config(port: int) -> ParserConfig:
+    return ParserConfig(
+        COINGECKO_URL=f"http://127.0.0.1:{port}/simple/price",
+        EXCHANGERATE_API_URL=f"http://127.0.0.1:{port}/v6",
+        EXCHANGERATE_API_KEY="stub",
+        FIAT_CURRENCIES=tuple(FIAT),
+        COINGECKO_RATE_LIMIT=1000.0,
+        COINGECKO_RATE_BURST=1000,
+    )
+
+
+def quiet_logging():
+    for name in ("actions", "parser", "storage"):
+        logging.getLogger(name).setLevel(logging.CRITICAL)
+
+
+def run_trader(trader: int, ops: int, seed: int) -> dict:
+    """одна сессия трейдера; возвращает замеры и успешно проведённые сделки"""
+    quiet_logging()
+    rnd = random.Random(seed * 1000 + trader)
+    data_manager = DataManager()
+    rate_service = ExchangeRateService(data_manager)
+    user_manager = UserManager(data_manager)
+    portfolio_manager = PortfolioManager(data_manager, rate_service)
+    username = f"load_{trader}"
+
+    samples = []
+    errors = Counter()
+    trades = []
+    user = None
+    names, weights = zip(*OPERATIONS.items())
+
+    for step in range(ops):
+        operation = "login" if user is None else rnd.choices(names, weights)[0]
+        started = time.perf_counter()
+        try:
+            # как в CLI: одна команда — один unit of work и одна версия курсов
+            with data_manager.unit_of_work(), rate_service.snapshot():
+                if operation == "login":
+                    user = user_manager.login(username, PASSWORD)
+                elif operation == "buy":
+                    currency = rnd.choice(CURRENCIES)
+                    amount = round(rnd.uniform(0.01, 2.0), 4)
+                    portfolio_manager.buy_currency(user.user_id, currency, amount)
+                    trades.append((currency, amount))
+                elif operation == "sell":
+                    portfolio = portfolio_manager.get_user_portfolio(user.user_id)
+                    held = [code for code, wallet in portfolio.wallets.items()
+                            if wallet.balance > 0]
+                    if not held:
+                        raise ValueError("nothing to sell")
+                    currency = rnd.choice(held)
+                    balance = portfolio.get_wallet(currency).balance
+                    amount = round(balance * rnd.uniform(0.1, 0.5), 6) or balance
+                    portfolio_manager.sell_currency(user.user_id, currency, amount)
+                    trades.append((currency, -amount))
+                elif operation == "show-portfolio":
+                    portfolio = portfolio_manager.get_user_portfolio(user.user_id)
+                    for code in portfolio.wallets:
+                        rate_service.get_rate(code, "USD")
+                else:
+                    rate_service.get_rate(rnd.choice(CURRENCIES),
+                                          rnd.choice(["USD", "EUR"]))
+            ok = True
+        except Exception as e:
+            ok = False
+            errors[f"{operation}: {type(e).__name__}"] += 1
+        samples.append((operation, time.perf_counter() - started, ok))
+
+    return {"trader": trader, "samples": samples, "errors": errors, "trades": trades}
+
+
+def prepare_workdir(traders: int, keep: bool) -> str:
+    workdir = tempfile.mkdtemp(prefix="valutatrade-load-")
+    shutil.copytree(os.path.join(ROOT, "data"), os.path.join(workdir, "data"))
+    os.chdir(workdir)
+
+    user_manager = UserManager(DataManager())
+    for trader in range(traders):
+        user_manager.register_user(f"load_{trader}", PASSWORD)
+    if keep:
+        print(f"data copy: {workdir}")
+    return workdir
+
+
+def load_balances() -> dict:
+    portfolios = get_serializer().load_file(os.path.join("data", "portfolios.json"))
+    users = get_serializer().load_file(os.path.join("data", "users.json"))
+    user_ids = {user["username"]: user["user_id"] for user in users}
+    by_id = {portfolio["user_id"]: portfolio["wallets"] for portfolio in portfolios}
+    return {
+        name: {code: wallet["balance"]
+               for code, wallet in by_id.get(user_id, {}).items()}
+        for name, user_id in user_ids.items()
+    }
+
+
+def reconcile(results: list, initial: dict, final: dict) -> list:
+    """расхождения итоговых балансов с суммой успешных сделок (потерянные обновления)"""
+    violations = []
+    for result in results:
+        username = f"load_{result['trader']}"
+        expected = defaultdict(float, initial.get(username, {}))
+        for currency, amount in result["trades"]:
+            expected[currency] += amount
+        actual = final.get(username, {})
+        for currency in set(expected) | set(actual):
+            if abs(expected[currency] - actual.get(currency, 0.0)) > 1e-6:
+                violations.append(
+                    (username, currency, expected[currency], actual.get(currency, 0.0))
+                )
+    return violations
+
+
+def check_ledger(results: list) -> dict:
+    path = os.path.join("data", "trades.jsonl")
+    trade_ids = []
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            trade_ids = [json.loads(line)["trade_id"] for line in f if line.strip()]
+    issued = sum(len(result["trades"]) for result in results)
+    duplicates = sum(count - 1 for count in Counter(trade_ids).values() if count > 1)
+    return {"issued": issued, "recorded": len(trade_ids), "duplicate_ids": duplicates}
+
+
+def percentile(sorted_values: list, share: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(share * len(sorted_values)))]
+
+
+def print_report(results: list, elapsed: float, updates: Counter,
+                 violations: list, ledger: dict):
+    by_operation = defaultdict(list)
+    errors = Counter()
+    for result in results:
+        errors.update(result["errors"])
+        for operation, latency, _ in result["samples"]:
+            by_operation[operation].append(latency * 1000)
+
+    total = sum(len(values) for values in by_operation.values())
+    print(f"\n{total} operations in {elapsed:.2f} s — {total / elapsed:.0f} ops/s")
+    print(f"rate updates: {updates['ok']} ok, {updates['failed']} failed\n")
+
+    print(f"{'operation':<16} {'count':>7} {'p50, ms':>9} {'p95, ms':>9} "
+          f"{'p99, ms':>9} {'max, ms':>9}")
+    for operation, values in sorted(by_operation.items()):
+        values.sort()
+        print(f"{operation:<16} {len(values):>7} {percentile(values, 0.5):9.2f} "
+              f"{percentile(values, 0.95):9.2f} {percentile(values, 0.99):9.2f} "
+              f"{values[-1]:9.2f}")
+
+    print("\nerrors:" if errors else "\nerrors: none")
+    for name, count in errors.most_common():
+        print(f"  {name}: {count}")
+
+    print(f"\nledger: {ledger['issued']} trades issued, {ledger['recorded']} recorded, "
+          f"{ledger['duplicate_ids']} duplicate trade ids")
+    print(f"lost-update violations: {len(violations)}")
+    for username, currency, expected, actual in violations[:10]:
+        print(f"  {username} {currency}: expected {expected:.6f}, found {actual:.6f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--traders", type=int, default=8)
+    parser.add_argument("--mode", choices=["thread", "process"], default="thread")
+    parser.add_argument("--ops", type=int, default=200, help="operations per trader")
+    parser.add_argument("--update-interval", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true", help="keep the data copy")
+    args = parser.parse_args()
+    quiet_logging()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_stub_handler())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    cwd = os.getcwd()
+    workdir = prepare_workdir(args.traders, args.keep)
+    initial = load_balances()
+
+    updater = RatesUpdater(stub_config(server.server_address[1]))
+    updates = Counter()
+    stop = threading.Event()
+
+    def update_loop():
+        while not stop.is_set():
+            try:
+                updates["ok" if updater.run_update() else "failed"] += 1
+            except Exception:
+                updates["failed"] += 1
+            stop.wait(args.update_interval)
+
+    update_thread = threading.Thread(target=update_loop, daemon=True)
+    update_thread.start()
+
+    executor_class = (ThreadPoolExecutor if args.mode == "thread"
+                      else ProcessPoolExecutor)
+    started = time.perf_counter()
+    with executor_class(max_workers=args.traders) as executor:
+        futures = [executor.submit(run_trader, trader, args.ops, args.seed)
+                   for trader in range(args.traders)]
+        results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    update_thread.join()
+    server.shutdown()
+
+    violations = reconcile(results, initial, load_balances())
+    print(f"{args.traders} traders ({args.mode} mode), {args.ops} operations each")
+    print_report(results, elapsed, updates, violations, check_ledger(results))
+
+    os.chdir(cwd)
+    if not args.keep:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
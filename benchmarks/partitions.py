@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+проверка разделов пользователей на одной машине: копия data/ раскладывается
+на N разделов, каждый раздел — отдельный процесс; трейдеры регистрируются,
+покупают и продают через роутер, затем разделы добавляются и итоговые
+балансы сверяются до и после переноса
+
+    poetry run python benchmarks/partitions.py [--partitions 2] [--grow-to 4]
+        [--users 200] [--ops 2000] [--threads 8] [--local] [--keep]
+"""
+
+import argparse
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from valutatrade_hub.core.exceptions import InsufficientFundsError  # noqa: E402
+from valutatrade_hub.core.partitions import (  # noqa: E402
+    PartitionRouter,
+    add_partitions,
+    init_partitions,
+)
+
+PASSWORD = "partition-test"
+CURRENCIES = ["BTC", "ETH", "EUR", "GBP"]
+
+
+def run_traders(router: PartitionRouter, user_ids: list, ops: int, threads: int,
+                seed: int) -> dict:
+    """случайные покупки и продажи через роутер из нескольких потоков"""
+    def trader(worker: int) -> dict:
+        rnd = random.Random(seed + worker)
+        counts = {"buy": 0, "sell": 0, "rejected": 0}
+        for _ in range(ops // threads):
+            user_id = rnd.choice(user_ids)
+            currency = rnd.choice(CURRENCIES)
+            amount = round(rnd.uniform(0.01, 2.0), 4)
+            try:
+                if rnd.random() < 0.6:
+                    router.buy_currency(user_id, currency, amount)
+                    counts["buy"] += 1
+                else:
+                    router.sell_currency(user_id, currency, amount)
+                    counts["sell"] += 1
+            except (InsufficientFundsError, ValueError):
+                counts["rejected"] += 1
+        return counts
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(trader, range(threads)))
+    return {key: sum(result[key] for result in results) for key in results[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--partitions", type=int, default=2)
+    parser.add_argument("--grow-to", type=int, default=4)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--ops", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--local", action="store_true",
+                        help="partitions in this process")
+    parser.add_argument("--keep", action="store_true", help="keep the working copy")
+    args = parser.parse_args()
+    logging.getLogger("actions").setLevel(logging.CRITICAL)
+
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="valutatrade-partitions-")
+    shutil.copytree(os.path.join(ROOT, "data"), os.path.join(workdir, "data"))
+    os.chdir(workdir)
+    processes = not args.local
+
+    try:
+        stats = init_partitions("data", args.partitions)
+        print(f"init: {stats['moved']} existing users → "
+              f"{stats['partitions']} partitions "
+              f"{stats['users']}")
+
+        with PartitionRouter("data", processes=processes) as router:
+            started = time.perf_counter()
+            user_ids = [router.register_user(f"trader{i}", PASSWORD).user_id
+                        for i in range(args.users)]
+            elapsed = time.perf_counter() - started
+            print(f"registered {len(user_ids)} users in {elapsed:.2f} s")
+
+            started = time.perf_counter()
+            counts = run_traders(router, user_ids, args.ops, args.threads, args.seed)
+            elapsed = time.perf_counter() - started
+            total = counts["buy"] + counts["sell"] + counts["rejected"]
+            print(f"trades: {counts} in {elapsed:.2f} s ({total / elapsed:,.0f} ops/s, "
+                  f"{'processes' if processes else 'in-process'})")
+
+            started = time.perf_counter()
+            before = router.book_summary()
+            print(f"book: {before['users']} users, {before['value']:,.2f} USD, "
+                  f"scatter-gather {(time.perf_counter() - started) * 1000:.1f} ms")
+            history_before = {user_id: router.get_trade_history(user_id, 1000)["trades"]
+                              for user_id in user_ids[:20]}
+
+        started = time.perf_counter()
+        stats = add_partitions("data", args.grow_to)
+        elapsed = time.perf_counter() - started
+        print(f"grow to {stats['partitions']}: moved {stats['moved']} users "
+              f"in {elapsed:.2f} s, per partition {stats['users']}")
+
+        with PartitionRouter("data", processes=processes) as router:
+            after = router.book_summary()
+            history_after = {user_id: router.get_trade_history(user_id, 1000)["trades"]
+                             for user_id in history_before}
+            router.login("trader0", PASSWORD)
+
+        same_balances = all(abs(after["balances"].get(code, 0.0) - balance) < 1e-9
+                            for code, balance in before["balances"].items())
+        def fingerprint(trades):
+            return [(t["side"], t["pair"], t["amount"], t["timestamp"]) for t in trades]
+
+        same_history = all(
+            fingerprint(history_after[user_id]) == fingerprint(trades)
+            for user_id, trades in history_before.items()
+        )
+        print(f"after grow: users {after['users']} (was {before['users']}), "
+              f"balances equal: {same_balances}, trade history equal: {same_history}")
+        if not (same_balances and same_history and after["users"] == before["users"]):
+            sys.exit(1)
+    finally:
+        os.chdir(cwd)
+        if args.keep:
+            print(f"working copy: {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
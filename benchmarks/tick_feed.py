@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+локальная заглушка потока тиков и замер потокового приёма курсов
+
+    # заглушка фида для stream-rates --feed tcp://127.0.0.1:9100
+    poetry run python benchmarks/tick_feed.py --serve [--port 9100] [--rate 5000]
+
+    # замер: StreamIngestor над копией data/ против записи на каждый тик
+    poetry run python benchmarks/tick_feed.py [--duration 5] [--rate 0]
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import shutil
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import replace
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from valutatrade_hub.parser_service.config import ParserConfig  # noqa: E402
+from valutatrade_hub.parser_service.streaming import (  # noqa: E402
+    StreamIngestor,
+    open_feed,
+)
+
+PRICES = {
+    "BTC_USD": 88000.0, "ETH_USD": 3000.0, "LTC_USD": 78.0, "ADA_USD": 0.35,
+    "EUR_USD": 1.08, "GBP_USD": 1.27, "JPY_USD": 0.0067, "RUB_USD": 0.011,
+}
+
+
+def make_handler(rate: float):
+    """rate — тиков в секунду на клиента, 0 — без ограничения"""
+
+    class TickHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            rnd = random.Random(0)
+            prices = dict(PRICES)
+            pairs = list(prices)
+            started = time.perf_counter()
+            sent = 0
+            try:
+                while True:
+                    lines = []
+                    for _ in range(100):
+                        pair = rnd.choice(pairs)
+                        prices[pair] *= 1 + rnd.uniform(-0.001, 0.001)
+                        lines.append(json.dumps({
+                            "pair": pair, "rate": prices[pair],
+                            "timestamp": datetime.now().isoformat()
+                        }))
+                    self.wfile.write(("\n".join(lines) + "\n").encode())
+                    sent += len(lines)
+                    if rate:
+                        ahead = sent / rate - (time.perf_counter() - started)
+                        if ahead > 0:
+                            time.sleep(ahead)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+    return TickHandler
+
+
+class TickServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def start_server(port: int, rate: float) -> TickServer:
+    server = TickServer(("127.0.0.1", port), make_handler(rate))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def measure(config: ParserConfig, port: int, duration: float) -> dict:
+    ingestor = StreamIngestor(config)
+    with open_feed(f"tcp://127.0.0.1:{port}") as lines:
+        return ingestor.run(lines, duration)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--serve", action="store_true", help="only serve the feed")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--rate", type=float, default=0,
+                        help="ticks per second per client, 0 — unlimited")
+    parser.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args()
+    logging.getLogger("parser").setLevel(logging.CRITICAL)
+
+    if args.serve:
+        server = start_server(args.port, args.rate)
+        port = server.server_address[1]
+        print(f"tick feed on tcp://127.0.0.1:{port}, Ctrl+C to stop")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
+        return
+
+    server = start_server(0, args.rate)
+    port = server.server_address[1]
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="valutatrade-stream-")
+    shutil.copytree(os.path.join(ROOT, "data"), os.path.join(workdir, "data"))
+    os.chdir(workdir)
+
+    try:
+        config = ParserConfig()
+        cases = [
+            ("micro-batch", config, args.duration),
+            ("write per tick",
+             replace(config, STREAM_BATCH_SIZE=1, STREAM_BATCH_INTERVAL=0),
+             min(args.duration, 2.0)),
+        ]
+        print(f"{'mode':<16} {'ticks/s':>10} {'batches':>8} {'writes/s':>9} "
+              f"{'history':>8} {'max queue':>10} {'blocked, s':>11}")
+        for name, case_config, duration in cases:
+            stats = measure(case_config, port, duration)
+            elapsed = stats["elapsed"]
+            print(f"{name:<16} {stats['written'] / elapsed:>10,.0f} "
+                  f"{stats['batches']:>8} "
+                  f"{stats['batches'] / elapsed:>9.1f} {stats['history_records']:>8} "
+                  f"{stats['max_queue']:>10} {stats['backpressure_seconds']:>11.2f}")
+    finally:
+        server.shutdown()
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,62 @@
 import argparse
-from typing import Optional
-
+import csv
+import os
+import shlex
+import time
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+import numpy as np
+from prettytable import PrettyTable
+
+from ..core.analytics import (
+    PortfolioValuationService,
+    RateHistory,
+    RatesIndex,
+    RateStatsService,
+)
+from ..core.backtest import STRATEGIES, BacktestEngine
 from ..core.currencies import get_all_currencies
 from ..core.exceptions import CurrencyNotFoundError, InsufficientFundsError
 from ..core.models import User
-from ..core.usecases import PortfolioManager, UserManager
+from ..core.partitions import (
+    PartitionRouter,
+    add_partitions,
+    init_partitions,
+    load_layout,
+)
+from ..core.rebalance import RebalancePlanner, parse_targets
+from ..core.risk import RiskService
+from ..core.simulation import SimulatedPortfolioManager, SimulationSession
+from ..core.transfer import DATASETS, FORMATS, BulkTransferService
+from ..core.usecases import (
+    AlertManager,
+    OrderManager,
+    PortfolioManager,
+    UserManager,
+)
 from ..core.utils import DataManager, ExchangeRateService
+from ..infra.audit import RESULTS, AuditIndex
+from ..infra.profiler import profile_command
 from ..parser_service.config import ParserConfig
 from ..parser_service.storage import RatesStorage
+from ..parser_service.streaming import StreamIngestor, open_feed
 from ..parser_service.updater import RatesUpdater
 
 
 class CLIInterface:
-    def __init__(self):
+    # команды, имя которых не может быть именем метода
+    COMMAND_METHODS = {"import": "import_data", "export": "export_data"}
+
+    def __init__(self, profile: Optional[bool] = None,
+                 profile_dir: Optional[str] = None):
+        # профилирование всех команд: VALUTATRADE_PROFILE=1, дампы cProfile —
+        # в каталог VALUTATRADE_PROFILE_DIR
+        if profile is None:
+            profile = os.getenv("VALUTATRADE_PROFILE", "") not in ("", "0")
+        self.profile = profile
+        self.profile_dir = profile_dir or os.getenv("VALUTATRADE_PROFILE_DIR") or None
         self.data_manager = DataManager()
         self.rate_service = ExchangeRateService(self.data_manager)
         self.user_manager = UserManager(self.data_manager)
@@ -20,6 +64,96 @@ class CLIInterface:
         self.current_user: Optional[User] = None
         self.rates_updater = RatesUpdater()
         self.rates_storage = RatesStorage(ParserConfig())
+        self.alert_manager = AlertManager(self.data_manager, self.rate_service)
+        self.order_manager = OrderManager(self.data_manager, self.portfolio_manager)
+        self.rate_history = RateHistory(self.rates_storage)
+        self.rate_stats_service = RateStatsService(self.rate_history)
+        self.rates_index = RatesIndex(self.rates_storage, self.rate_history)
+        self.valuation_service = PortfolioValuationService(
+            self.portfolio_manager, self.rate_history)
+        self.transfer_service = BulkTransferService(self.data_manager,
+                                                    self.rates_storage)
+        self.backtest_engine = BacktestEngine(self.rate_history)
+        self.rebalance_planner = RebalancePlanner(
+            self.data_manager, self.portfolio_manager, self.rate_service)
+        self.risk_service = RiskService(self.rate_history, self.data_manager,
+                                        self.rate_service)
+        self.audit_index = AuditIndex()
+        # what-if сессия: пока она активна, portfolio_manager работает через оверлей
+        self.simulation: Optional[SimulationSession] = None
+        self.live_portfolio_manager = self.portfolio_manager
+        self.rates_updater.add_listener(self._on_rates_updated)
+        self.stream_ingestor = StreamIngestor(self.rates_storage.config,
+                                              self.rates_storage)
+        self.stream_ingestor.add_listener(self._on_stream_batch)
+        # пользователи разложены по разделам — команды пользователей и портфелей
+        # идут через роутер, корневые users.json/portfolios.json не используются
+        self.partition_router: Optional[PartitionRouter] = None
+        if load_layout(self.data_manager.data_dir):
+            self._use_partitions()
+
+    def _use_partitions(self):
+        """UserManager/PortfolioManager заменяются роутером разделов"""
+        if self.partition_router:
+            self.partition_router.close()
+        router = PartitionRouter(self.data_manager.data_dir)
+        self.partition_router = router
+        self.user_manager = self.portfolio_manager = router
+        self.live_portfolio_manager = router
+        self.order_manager.portfolio_manager = router
+        self.valuation_service.portfolio_manager = router
+
+    def _partitions_unsupported(self) -> bool:
+        """команды, читающие все портфели корневого каталога, при разделах недоступны"""
+        if self.partition_router is None:
+            return False
+        print("\n❌ Ошибка: Команда недоступна, пока пользователи разложены "
+              "по разделам (partitions status — сводка по всем разделам)")
+        return True
+
+    def _simulation_active(self) -> bool:
+        """
+        команды, меняющие реальные портфели в обход оверлея симуляции,
+        недоступны, пока она не завершена
+        """
+        if self.simulation is None:
+            return False
+        print("\n❌ Ошибка: Сначала завершите симуляцию "
+              "(simulate commit | discard)")
+        return True
+
+    def _on_rates_updated(self, old_rates, new_rates):
+        """
+        проверка уведомлений и лимитных заявок после обновления курсов;
+        заявки исполняются по только что опубликованным курсам, а не по
+        снимку, закреплённому в начале команды
+        """
+        with self.rate_service.snapshot():
+            triggered = self.alert_manager.evaluate(old_rates, new_rates)
+            for alert in triggered:
+                if self.current_user and alert.user_id == self.current_user.user_id:
+                    print(f"\n🔔 Уведомление {alert.get_alert_info()} сработало: "
+                          f"курс {alert.triggered_rate}")
+
+            executed = self.order_manager.evaluate(old_rates, new_rates)
+            for order in executed:
+                if self.current_user and order.user_id == self.current_user.user_id:
+                    self._print_order_result(order)
+
+    def _on_stream_batch(self, old_rates, new_rates):
+        """
+        пакет потока курсов: заявки исполняются по курсам этого пакета,
+        изменения портфелей сохраняются сразу, не дожидаясь конца команды
+        """
+        self._on_rates_updated(old_rates, new_rates)
+        self.data_manager.commit()
+
+    def _print_order_result(self, order):
+        if order.status == "filled":
+            print(f"\n✅ Заявка {order.get_order_info()} исполнена "
+                  f"по курсу {order.fill_rate}")
+        elif order.status == "failed":
+            print(f"\n❌ Заявка {order.get_order_info()} не исполнена: {order.reason}")
 
     def register(self, args):
         """register - создать нового пользователя"""
@@ -43,6 +177,10 @@ class CLIInterface:
             print("\n❌ Ошибка: Пожалуйста, войдите в систему сначала")
             return
 
+        if args.at or args.date_from or args.date_to:
+            self._show_portfolio_history(args)
+            return
+
         try:
             portfolio = self.portfolio_manager.get_user_portfolio(self.current_user.user_id)
 
@@ -79,6 +217,98 @@ class CLIInterface:
         except Exception as e:
             print(f"\n❌ Ошибка получения портфеля: {e}")
 
+    STEP_UNITS = {"s": "seconds", "m": "minutes", "h": "hours", "d": "days"}
+
+    @classmethod
+    def _parse_step(cls, value: str) -> timedelta:
+        """шаг вида 30m, 4h, 1d"""
+        unit = cls.STEP_UNITS.get(value[-1:].lower())
+        try:
+            amount = int(value[:-1])
+        except ValueError:
+            amount = 0
+        if not unit or amount <= 0:
+            raise ValueError(f"Invalid step '{value}', expected e.g. 30m, 4h or 1d")
+        return timedelta(**{unit: amount})
+
+    def _show_portfolio_history(self, args):
+        """стоимость портфеля на момент --at или кривая стоимости --from/--to"""
+        base_currency = args.base.upper() if args.base else 'USD'
+        user_id = self.current_user.user_id
+
+        try:
+            if args.at:
+                if args.date_from or args.date_to:
+                    raise ValueError("Use either --at or --from/--to")
+                moment = datetime.fromisoformat(args.at)
+                valuation = self.valuation_service.value_at(user_id, moment,
+                                                            base_currency)
+            else:
+                end = datetime.now()
+                if args.date_to:
+                    end = datetime.fromisoformat(args.date_to)
+                start = datetime.fromisoformat(args.date_from) if args.date_from else (
+                    end - timedelta(days=30))
+                step = self._parse_step(args.step)
+                if start >= end:
+                    raise ValueError("--from must be earlier than --to")
+                points = int((end - start) / step) + 1
+                if points > 100_000:
+                    raise ValueError(f"Too many points ({points}), increase --step")
+                moments = [start + step * i for i in range(points)]
+                series = self.valuation_service.value_series(user_id, moments,
+                                                             base_currency)
+        except ValueError as e:
+            print(f"\n❌ Ошибка: {e}")
+            return
+
+        if args.at:
+            print(f"\n💹 Портфель пользователя '{self.current_user.username}' "
+                  f"на {moment.isoformat(sep=' ')} (базовая валюта: {base_currency}):")
+            if not valuation["positions"]:
+                print("  Портфель пуст")
+                return
+            for currency_code, position in valuation["positions"].items():
+                if position["rate"] is None:
+                    print(f"  - {currency_code}: {position['balance']:.4f} "
+                          f"→ курс недоступен")
+                else:
+                    print(f"  - {currency_code}: {position['balance']:.4f} → "
+                          f"{position['value']:.2f} {base_currency} "
+                          f"(курс: {position['rate']:.4f})")
+            print("-" * 40)
+            print(f"\n💹 ИТОГО: {valuation['total']:,.2f} {base_currency}")
+            return
+
+        if args.out:
+            try:
+                with open(args.out, "w", newline="", encoding="utf-8") as f:
+                    writer = csv.writer(f)
+                    writer.writerow(["timestamp", f"total_{base_currency.lower()}"])
+                    for timestamp, total in zip(series["timestamps"], series["total"]):
+                        writer.writerow([str(timestamp), f"{total:.2f}"])
+            except OSError as e:
+                print(f"\n❌ Ошибка записи {args.out}: {e}")
+                return
+
+        totals = series["total"]
+        print(f"\n💹 Стоимость портфеля '{self.current_user.username}' "
+              f"{start.isoformat(sep=' ')} — {end.isoformat(sep=' ')}, "
+              f"шаг {args.step}, точек: {len(totals)} ({base_currency}):")
+        print(f"  Начало: {totals[0]:,.2f}  Конец: {totals[-1]:,.2f}  "
+              f"Мин: {totals.min():,.2f}  Макс: {totals.max():,.2f}")
+        if not args.out:
+            shown = range(len(totals)) if len(totals) <= 20 else [
+                round(i * (len(totals) - 1) / 19) for i in range(20)]
+            for i in shown:
+                print(f"  {str(series['timestamps'][i])[:19]}  {totals[i]:>16,.2f}")
+        else:
+            print(f"✅ Кривая стоимости сохранена в {args.out}")
+
+        if series["missing_rates"]:
+            print(f"⚠ Нет курсов в истории для части периода: "
+                  f"{', '.join(series['missing_rates'])}")
+
     def buy(self, args):
         """buy - купить валюту"""
         if not self.current_user:
@@ -101,6 +331,8 @@ class CLIInterface:
 
             print("Изменения в портфеле:")
             print(f"  - {result['currency']}: было {result['old_balance']:.4f} → стало {result['new_balance']:.4f}")
+            if self.simulation:
+                print("🧪 Симуляция: реальный портфель не изменён")
 
         except (CurrencyNotFoundError, ValueError) as e:
             print(f"\n❌ Ошибка: {e}")
@@ -127,10 +359,139 @@ class CLIInterface:
 
             print("Изменения в портфеле:")
             print(f"  - {result['currency']}: было {result['old_balance']:.4f} → стало {result['new_balance']:.4f}")
+            if self.simulation:
+                print("🧪 Симуляция: реальный портфель не изменён")
 
         except (CurrencyNotFoundError, InsufficientFundsError, ValueError) as e:
             print(f"\n❌ Ошибка: {e}")
 
+    def simulate(self, args):
+        """simulate - what-if сессия: сделки без изменения реальных данных"""
+        if not self.current_user:
+            print("\n❌ Ошибка: Пожалуйста, войдите в систему сначала")
+            return
+
+        if args.action == "start":
+            if self._partitions_unsupported():
+                return
+            if self.simulation:
+                print("\n❌ Ошибка: Симуляция уже запущена (simulate commit | discard)")
+                return
+            self.simulation = SimulationSession(self.data_manager)
+            self.portfolio_manager = SimulatedPortfolioManager(
+                self.data_manager, self.rate_service, self.simulation,
+                self.live_portfolio_manager.ledger)
+            print("\n🧪 Симуляция запущена: buy/sell и show-portfolio "
+                  "работают с копией портфеля")
+            print("Итог: simulate status, применить: simulate commit, "
+                  "отменить: simulate discard")
+            return
+
+        if not self.simulation:
+            print("\n❌ Ошибка: Симуляция не запущена (simulate start)")
+            return
+
+        if args.action == "status":
+            self._print_simulation_status(args.base.upper() if args.base else 'USD')
+        elif args.action == "commit":
+            try:
+                applied = self.simulation.commit(self.live_portfolio_manager)
+            except (CurrencyNotFoundError, InsufficientFundsError, ValueError) as e:
+                print(f"\n❌ Ошибка: {e}")
+                print("Сессия сохранена: simulate discard — отменить")
+                return
+            self._stop_simulation()
+            print(f"\n✅ Симуляция применена, исполнено сделок: {applied}")
+        else:
+            trades = len(self.simulation.trades)
+            self._stop_simulation()
+            print(f"\n✅ Симуляция отменена, отброшено сделок: {trades}")
+
+    def _stop_simulation(self):
+        self.simulation = None
+        self.portfolio_manager = self.live_portfolio_manager
+
+    def _print_simulation_status(self, base_currency: str):
+        """портфель в симуляции против реального и сделки сессии"""
+        user_id = self.current_user.user_id
+        live = self.simulation.base_portfolio(user_id) or {"wallets": {}}
+        simulated = self.simulation.load(user_id) or {"wallets": {}}
+        trades = [trade for trade in self.simulation.trades
+                  if trade["user_id"] == user_id]
+
+        started_at = self.simulation.started_at.isoformat(timespec='seconds')
+        print(f"\n🧪 Симуляция с {started_at}: сделок {len(trades)}, "
+              f"изменённых портфелей {len(self.simulation.portfolios)}")
+        for trade in trades:
+            print(f"  {trade['trade_id']} {trade['side'].upper()} "
+                  f"{trade['amount']:.4f} {trade['currency']} "
+                  f"→ баланс {trade['balance']:.4f}")
+
+        table = PrettyTable(["Валюта", "Сейчас", "В симуляции", "Изменение",
+                             f"Стоимость, {base_currency}"])
+        table.align = "r"
+        totals = [0.0, 0.0]
+        codes = list(dict.fromkeys([*live["wallets"], *simulated["wallets"]]))
+        for code in codes:
+            balances = [portfolio["wallets"].get(code, {}).get("balance", 0.0)
+                        for portfolio in (live, simulated)]
+            rate = self.rate_service.get_rate(code, base_currency)
+            for i, balance in enumerate(balances):
+                totals[i] += balance * rate if rate else 0.0
+            table.add_row([code, f"{balances[0]:.4f}", f"{balances[1]:.4f}",
+                           f"{balances[1] - balances[0]:+.4f}",
+                           f"{balances[1] * rate:,.2f}" if rate else "н/д"])
+        print(table)
+        print(f"💹 ИТОГО: {totals[0]:,.2f} → {totals[1]:,.2f} {base_currency} "
+              f"({totals[1] - totals[0]:+,.2f})")
+
+    def partitions(self, args):
+        """partitions - разделы пользователей: раскладка, сводка, добавление разделов"""
+        data_dir = self.data_manager.data_dir
+        if args.action != "status" and self._simulation_active():
+            return
+        try:
+            if args.action == "status":
+                started = time.perf_counter()
+                with PartitionRouter(data_dir, processes=args.processes) as router:
+                    summary = router.book_summary(
+                        args.base.upper() if args.base else 'USD')
+                elapsed = time.perf_counter() - started
+            elif args.count is None:
+                print("\n❌ Ошибка: Укажите число разделов: --count <N>")
+                return
+            elif args.action == "init":
+                result = init_partitions(data_dir, args.count)
+            else:
+                # разделы CLI живут в этом процессе и делят движок хранения с переносом
+                result = add_partitions(data_dir, args.count)
+        except ValueError as e:
+            print(f"\n❌ Ошибка: {e}")
+            return
+
+        if args.action != "status":
+            self._use_partitions()
+            moved = f"перенесено пользователей: {result['moved']}"
+            print(f"\n✅ Разделов: {result['partitions']}, {moved}")
+            print("Пользователей по разделам: " + ", ".join(map(str, result["users"])))
+            return
+
+        base_currency = summary["base"]
+        print(f"\n🗂 Разделов: {len(summary['partitions'])}, "
+              f"пользователей: {summary['users']}, "
+              f"стоимость книги: {summary['value']:,.2f} {base_currency} "
+              f"(scatter-gather: {elapsed * 1000:.1f} мс)")
+        table = PrettyTable(["Раздел", "Пользователи", "Портфели",
+                             f"Стоимость, {base_currency}"])
+        table.align = "r"
+        for index, part in enumerate(summary["partitions"]):
+            table.add_row([index, part["users"], part["portfolios"],
+                           f"{part['value']:,.2f}"])
+        print(table)
+        if summary["missing_rates"]:
+            missing = ", ".join(summary["missing_rates"])
+            print(f"⚠ Нет курса к {base_currency}: {missing}")
+
     def get_rate(self, args):
         """get-rate - получить курс валюты"""
         try:
@@ -163,7 +524,7 @@ class CLIInterface:
         fiats = []
         cryptos = []
 
-        for currency in currencies.values():
+        for _, currency in sorted(currencies.items()):
             if hasattr(currency, 'issuing_country'):
                 fiats.append(currency)
             else:
@@ -196,40 +557,632 @@ class CLIInterface:
         except Exception as e:
             print(f"\n❌ Обновление не удалось: {e}")
 
+    def stream_rates(self, args):
+        """stream-rates - потоковый приём тиков курсов с записью микро-пакетами"""
+        print(f"\n📡 Приём тиков из {args.feed} (Ctrl+C — остановка)...")
+        try:
+            with open_feed(args.feed) as lines:
+                stats = self.stream_ingestor.run(lines, args.duration)
+        except (OSError, ValueError) as e:
+            print(f"\n❌ Ошибка потока курсов: {e}")
+            return
+
+        elapsed = max(stats["elapsed"], 1e-9)
+        print(f"\n✅ Принято тиков: {stats['received']} за {stats['elapsed']:.1f} с "
+              f"({stats['received'] / elapsed:,.0f} тиков/с), "
+              f"некорректных: {stats['invalid']}")
+        print(f"Пакетов записано: {stats['batches']}, тиков в них: {stats['written']}, "
+              f"записей в историю: {stats['history_records']}")
+        print(f"Макс. заполнение очереди: {stats['max_queue']}, ожиданий из-за "
+              f"переполнения: {stats['backpressure_waits']} "
+              f"({stats['backpressure_seconds']:.2f} с)")
+
+    def sources_status(self, args):
+        """sources-status - состояние источников курсов"""
+        status = self.rates_updater.health.get_status()
+        if not status:
+            print("\nСтатистика по источникам пока не собрана. "
+                  "Запустите 'update-rates'.")
+            return
+
+        table = PrettyTable(["Источник", "Цепь", "Успешных, %", "Ср. задержка, мс",
+                             "p95, мс", "Ошибок подряд", "Последняя ошибка"])
+        table.align = "l"
+
+        def number(value: Optional[float], scale: float = 1.0, digits: int = 0) -> str:
+            return f"{value * scale:.{digits}f}" if value is not None else "—"
+
+        for name, info in status.items():
+            state = info["state"]
+            if info["retry_at"]:
+                state += f" до {info['retry_at'].isoformat(timespec='seconds')}"
+            table.add_row([
+                name,
+                state,
+                number(info["success_rate"], 100, 1),
+                number(info["avg_latency_ms"]),
+                number(info["p95_latency_ms"]),
+                info["consecutive_failures"],
+                (info["last_error"] or "—")[:60],
+            ])
+        print(table)
+
+    def compact_history(self, args):
+        """compact-history - перенести старую историю курсов в сжатый архив"""
+        try:
+            result = self.rates_storage.compact_history()
+        except (OSError, ValueError) as e:
+            print(f"\n❌ Ошибка сжатия истории: {e}")
+            return
+
+        print("\n✅ Сжатие истории завершено:")
+        print(f"  - перенесено записей: {result['moved']} "
+              f"→ в архиве {result['archived']}")
+        print(f"  - осталось свежих записей: {result['kept']}")
+        print(f"  - затронуто сегментов: {result['segments']}, "
+              f"удалено: {result['pruned_segments']}")
+        print(f"  - файл истории: {result['hot_bytes_before'] / 1024:.1f} KB → "
+              f"{result['hot_bytes_after'] / 1024:.1f} KB")
+        print(f"  - размер архива: {result['archive_bytes'] / 1024:.1f} KB")
+
+    def export_data(self, args):
+        """export - потоковая выгрузка данных в CSV/JSON Lines"""
+        if args.dataset != "history" and self._partitions_unsupported():
+            return
+        try:
+            result = self.transfer_service.export(
+                args.dataset, args.out, args.format, args.resume
+            )
+        except (OSError, ValueError) as e:
+            print(f"\n❌ Ошибка экспорта: {e}")
+            return
+
+        if result["resumed_from"]:
+            print(f"\nПродолжено с записи {result['resumed_from']}")
+        print(f"\n✅ Экспортировано записей: {result['records']} → {args.out} "
+              f"({result['bytes'] / 1024:.1f} KB)")
+
+    def import_data(self, args):
+        """import - потоковая загрузка данных из CSV/JSON Lines"""
+        if args.dataset != "history" and self._partitions_unsupported():
+            return
+        try:
+            result = self.transfer_service.import_(
+                args.dataset, args.file, args.format, args.batch_size, args.resume
+            )
+        except ValueError as e:
+            print(f"\n❌ Ошибка импорта: {e}")
+            return
+        except OSError as e:
+            print(f"\n❌ Ошибка импорта: {e}")
+            print("Для продолжения с последней зафиксированной пачки добавьте --resume")
+            return
+
+        if result["resumed_from"]:
+            print(f"\nПродолжено с записи {result['resumed_from']}")
+        print(f"\n✅ Импортировано записей: {result['imported']} "
+              f"из {result['records']}")
+        if result["invalid"]:
+            print(f"❌ Отклонено записей: {result['invalid']}")
+            for error in result["errors"]:
+                print(f"  - {error}")
+
     def show_rates(self, args):
         """show-rates - показать курсы из кэша"""
         try:
-            current_data = self.rates_storage.load_current_rates()
+            rows = self.rates_index.query(
+                currency=args.currency, base=args.base, sort=args.sort,
+                top=args.top, ascending=args.asc
+            )
+        except ValueError as e:
+            print(f"\n❌ Ошибка: {e}")
+            return
+        except Exception as e:
+            print(f"\n❌ Ошибка отображения курсов: {e}")
+            return
 
-            if not current_data.get("pairs"):
+        if not rows:
+            if not self.rates_index.last_refresh:
                 print("Локальный кэш курсов пуст. Запустите 'update-rates' для загрузки данных.")
+            else:
+                print("Нет курсов по заданному фильтру")
+            return
+
+        last_refresh = self.rates_index.last_refresh or 'неизвестно'
+        print(f"Курсы из кэша (обновлено: {last_refresh}):")
+        table = PrettyTable(["Пара", "Курс", "1ч, %", "24ч, %", "Возраст", "Источник"])
+        table.align = "l"
+        for row in rows:
+            table.add_row([
+                row["pair"],
+                f"{row['rate']:.6g}",
+                f"{row['change_1h']:+.2f}" if row["change_1h"] is not None else "—",
+                f"{row['change_24h']:+.2f}" if row["change_24h"] is not None else "—",
+                self._format_age(row["age"]),
+                row["source"] or "неизвестно",
+            ])
+        print(table)
+
+    @staticmethod
+    def _format_age(seconds: Optional[float]) -> str:
+        if seconds is None:
+            return "—"
+        if seconds < 60:
+            return f"{seconds:.0f} с"
+        if seconds < 3600:
+            return f"{seconds / 60:.0f} мин"
+        if seconds < 86400:
+            return f"{seconds / 3600:.1f} ч"
+        return f"{seconds / 86400:.1f} д"
+
+    def history(self, args):
+        """history - история сделок"""
+        if not self.current_user:
+            print("\n❌ Ошибка: Пожалуйста, войдите в систему сначала")
+            return
+
+        try:
+            page = self.portfolio_manager.get_trade_history(
+                self.current_user.user_id, args.limit, args.before
+            )
+        except ValueError as e:
+            print(f"\n❌ Ошибка: {e}")
+            return
+
+        if not page["trades"]:
+            print("\nИстория сделок пуста")
+            return
+
+        print("\n🧾 История сделок:")
+        for trade in page["trades"]:
+            rate = f"{trade['rate']:.4f}" if trade["rate"] else "н/д"
+            print(f"  #{trade['trade_id']} {trade['timestamp'][:19]} "
+                  f"{trade['side'].upper()} {trade['amount']:.4f} {trade['pair']} "
+                  f"по курсу {rate} → баланс {trade['balance']:.4f}")
+
+        if page["next_cursor"]:
+            print(f"\nДальше: history --limit {args.limit} "
+                  f"--before {page['next_cursor']}")
+
+    def audit(self, args):
+        """audit - поиск по журналу действий (actions.log и его ротациям)"""
+        if not self.current_user:
+            print("\n❌ Ошибка: Пожалуйста, войдите в систему сначала")
+            return
+
+        user_id = username = None
+        if args.user:
+            if args.user.isdigit():
+                user_id = int(args.user)
+            else:
+                # BUY/SELL пишут только user_id, REGISTER/LOGIN — имя
+                username = args.user
+                if self.partition_router:
+                    user_id = self.partition_router.find_user(username)
+                else:
+                    users = self.data_manager.load_json("users.json", [])
+                    user_id = next((user["user_id"] for user in users
+                                    if user["username"] == username), None)
+        try:
+            start = datetime.fromisoformat(args.date_from) if args.date_from else None
+            end = datetime.fromisoformat(args.date_to) if args.date_to else None
+        except ValueError as e:
+            print(f"\n❌ Ошибка: {e}")
+            return
+
+        try:
+            stats = self.audit_index.refresh()
+        except OSError as e:
+            print(f"\n❌ Ошибка чтения журнала: {e}")
+            return
+        started = time.perf_counter()
+        found = self.audit_index.query(user_id, username, args.action, args.result,
+                                       args.currency, start, end, args.limit)
+        elapsed = time.perf_counter() - started
+
+        print(f"\n🔎 Найдено записей: {found['count']} "
+              f"(индекс: {stats['rows']} строк в "
+              f"{stats['files']} файлах, новых: {stats['indexed']}, "
+              f"запрос: {elapsed * 1000:.1f} мс)")
+        if found["by_action"]:
+            print("  " + ", ".join(f"{action}: {count}"
+                                   for action, count in found["by_action"].items()))
+        if not found["entries"]:
+            return
+
+        table = PrettyTable(["Время", "Действие", "Пользователь", "Валюта",
+                             "Результат", "Ошибка"])
+        table.align = "l"
+        for entry in found["entries"]:
+            user = entry["username"] or entry["user_id"] or "-"
+            _, _, error = (entry["line"] or "").partition(" error=")
+            table.add_row([entry["timestamp"].isoformat(), entry["action"], user,
+                           entry["currency"] or "-", entry["result"], error or "-"])
+        print(table)
+        if found["count"] > len(found["entries"]):
+            print(f"... показаны последние {len(found['entries'])} "
+                  f"из {found['count']}, больше: --limit <N>")
+
+    def pnl(self, args):
+        """pnl - себестоимость (FIFO) и реализованный P&L"""
+        if not self.current_user:
+            print("\n❌ Ошибка: Пожалуйста, войдите в систему сначала")
+            return
+
+        basis = self.portfolio_manager.get_cost_basis(self.current_user.user_id)
+        if not basis:
+            print("\nИстория сделок пуста")
+            return
+
+        print("\n💹 Себестоимость (FIFO) и реализованный P&L, USD:")
+        total_realized = 0.0
+        for currency_code, info in basis.items():
+            avg_cost = "н/д"
+            if info["avg_cost"] is not None:
+                avg_cost = f"{info['avg_cost']:.4f}"
+            print(f"  - {currency_code}: в лотах {info['amount']:.4f} "
+                  f"({info['lots']} лот.), себестоимость {info['cost_basis']:,.2f}, "
+                  f"средняя цена {avg_cost}, "
+                  f"реализовано {info['realized_pnl']:+,.2f}")
+            total_realized += info["realized_pnl"]
+        print("-" * 40)
+        print(f"\n💹 Реализованный P&L: {total_realized:+,.2f} USD")
+
+    def rate_stats(self, args):
+        """rate-stats - скользящие статистики по истории курсов"""
+        try:
+            stats = self.rate_stats_service.get_rate_stats(args.pair, args.window)
+        except ValueError as e:
+            print(f"\n❌ Ошибка: {e}")
+            return
+
+        latest = stats["latest"]
+        print(f"\n📈 Статистика {stats['pair']} (окно: {stats['window']}, "
+              f"точек в истории: {stats['points']}):")
+        print(f"  Последний курс: {latest['rate']:.6f} "
+              f"({latest['timestamp'].isoformat(timespec='seconds')})")
+        print(f"  Скользящее среднее: {latest['sma']:.6f}")
+        print(f"  Волатильность: {latest['volatility']:.4f}%")
+        print(f"  Мин / макс: {latest['min']:.6f} / {latest['max']:.6f}")
+        print(f"  Изменение за окно: {latest['pct_change']:+.4f}%")
+
+    def backtest(self, args):
+        """backtest - прогон стратегий по истории курсов"""
+        strategies = list(STRATEGIES) if args.strategy == "all" else [args.strategy]
+        currencies = None
+        if args.currency:
+            currencies = [code.strip().upper() for code in args.currency.split(",")]
+
+        try:
+            report = self.backtest_engine.run(strategies, currencies, args.capital,
+                                              args.workers)
+        except ValueError as e:
+            print(f"\n❌ Ошибка: {e}")
+            return
+
+        print(f"\n🧪 Бэктест: {report['ticks']} тиков "
+              f"({report['start'].isoformat()} — {report['end'].isoformat()}), "
+              f"прогонов: {len(report['results'])}, процессов: {report['workers']}")
+
+        table = PrettyTable(["Стратегия", "Валюта", "Параметры", "Итог, USD",
+                             "Доходность, %", "Макс. просадка, %", "Оборот"])
+        table.align = "r"
+        results = sorted(report["results"], key=lambda result: result["final_value"],
+                         reverse=True)
+        for result in results:
+            params = ", ".join(f"{key}={value}"
+                               for key, value in result["params"].items())
+            table.add_row([
+                result["strategy"], result["currency"], params,
+                f"{result['final_value']:,.2f}", f"{result['return_pct']:+.2f}",
+                f"{result['max_drawdown_pct']:.2f}", f"{result['turnover']:.2f}",
+            ])
+        print(table)
+
+    def rebalance(self, args):
+        """rebalance - план ребалансировки портфеля к целевым долям"""
+        if not self.current_user:
+            print("\n❌ Ошибка: Пожалуйста, войдите в систему сначала")
+            return
+        if self._partitions_unsupported() or self._simulation_active():
+            return
+
+        base_currency = args.base.upper() if args.base else 'USD'
+        try:
+            targets = parse_targets(args.target)
+            plan = self.rebalance_planner.plan(
+                targets, base_currency, args.min_trade,
+                None if args.all else self.current_user.user_id
+            )
+        except ValueError as e:
+            print(f"\n❌ Ошибка: {e}")
+            return
+
+        target_text = " / ".join(f"{share * 100:g}% {code}"
+                                 for code, share in targets.items())
+        scope = f"портфелей: {len(plan.user_ids)}" if args.all else \
+            f"пользователь '{self.current_user.username}'"
+        print(f"\n⚖ Ребалансировка к {target_text} "
+              f"({scope}, базовая валюта: {base_currency})")
+        print(f"Заявок: {plan.order_count}, "
+              f"затронуто портфелей: {plan.users_affected}, "
+              f"оборот: {plan.turnover:,.2f} {base_currency}, "
+              f"расчёт: {plan.planning_seconds * 1000:.1f} мс")
+
+        if args.out:
+            try:
+                with open(args.out, "w", newline="", encoding="utf-8") as f:
+                    writer = csv.DictWriter(f, fieldnames=[
+                        "user_id", "side", "currency", "amount", "value"])
+                    writer.writeheader()
+                    writer.writerows(plan.iter_orders())
+            except OSError as e:
+                print(f"\n❌ Ошибка записи {args.out}: {e}")
                 return
+            print(f"✅ План сохранён в {args.out}")
+        elif plan.order_count:
+            table = PrettyTable(["Пользователь", "Операция", "Валюта", "Количество",
+                                 f"Сумма, {base_currency}"])
+            table.align = "r"
+            for number, order in enumerate(plan.iter_orders()):
+                if number == 50:
+                    print(f"... показаны первые 50 заявок из {plan.order_count}, "
+                          f"полный план: --out <file.csv>")
+                    break
+                table.add_row([order["user_id"], order["side"].upper(),
+                               order["currency"], f"{order['amount']:.8f}",
+                               f"{order['value']:,.2f}"])
+            print(table)
+
+        if not plan.order_count:
+            print("Портфель уже соответствует целевым долям")
+            return
+        if not args.execute:
+            print("Для исполнения повторите команду с --execute")
+            return
 
-            pairs = current_data["pairs"]
-            filtered_pairs = {}
+        result = self.rebalance_planner.execute(plan)
+        print(f"\n✅ Исполнено заявок: {result['executed']} из {plan.order_count}")
+        for order, error in result["failed"][:10]:
+            print(f"  ❌ {order['user_id']} {order['side']} {order['amount']:.8f} "
+                  f"{order['currency']}: {error}")
+
+    def risk(self, args):
+        """risk - исторический VaR, expected shortfall и волатильность портфеля"""
+        if not self.current_user:
+            print("\n❌ Ошибка: Пожалуйста, войдите в систему сначала")
+            return
+        if self._partitions_unsupported():
+            return
 
-            if args.currency:
-                currency = args.currency.upper()
-                for pair, data in pairs.items():
-                    if pair.startswith(currency + "_") or pair.endswith("_" + currency):
-                        filtered_pairs[pair] = data
+        try:
+            interval = int(self._parse_step(args.interval).total_seconds())
+            if args.all:
+                started = time.perf_counter()
+                report = self.risk_service.book_risk(
+                    args.confidence, interval, args.lookback)
+                elapsed = time.perf_counter() - started
             else:
-                filtered_pairs = pairs
+                report = self.risk_service.portfolio_risk(
+                    self.current_user.user_id, args.confidence, interval, args.lookback)
+        except ValueError as e:
+            print(f"\n❌ Ошибка: {e}")
+            return
+
+        level = f"{report['confidence'] * 100:g}%"
+        print(f"\n📉 Риск за шаг {args.interval}, доверие {level}: "
+              f"{report['observations']} доходностей "
+              f"({report['start'].isoformat(timespec='minutes')} — "
+              f"{report['end'].isoformat(timespec='minutes')})")
+
+        if args.all:
+            book = report["book"]
+            print(f"Портфелей: {len(report['user_ids'])}, "
+                  f"расчёт: {elapsed * 1000:.1f} мс")
+            print(f"  Книга целиком: стоимость {book['value']:,.2f} USD, "
+                  f"VaR {book['var']:,.2f}, ES {book['expected_shortfall']:,.2f}, "
+                  f"волатильность {book['volatility_annual']:,.2f} USD/год")
+            table = PrettyTable(["Пользователь", "Стоимость, USD", f"VaR {level}",
+                                 "ES", "Волатильность, USD/год"])
+            table.align = "r"
+            for row in np.argsort(-report["var"])[:10]:
+                table.add_row([
+                    int(report["user_ids"][row]), f"{report['value'][row]:,.2f}",
+                    f"{report['var'][row]:,.2f}",
+                    f"{report['expected_shortfall'][row]:,.2f}",
+                    f"{report['volatility_annual'][row]:,.2f}",
+                ])
+            print(table)
+        else:
+            value = report["value"]
+
+            def share(amount: float) -> str:
+                return f" ({amount / value * 100:.2f}%)" if value else ""
+
+            print(f"  Стоимость портфеля: {value:,.2f} USD")
+            print(f"  VaR {level}: {report['var']:,.2f} USD{share(report['var'])}")
+            print(f"  Expected shortfall: {report['expected_shortfall']:,.2f} USD"
+                  f"{share(report['expected_shortfall'])}")
+            print(f"  Годовая волатильность: {report['volatility_annual']:,.2f} USD"
+                  f"{share(report['volatility_annual'])}")
+            for code, info in report["contributions"].items():
+                print(f"  - {code}: позиция {info['exposure']:,.2f} USD, "
+                      f"доля волатильности {info['volatility_share'] * 100:.1f}%")
+
+        if report["unmodeled"]:
+            unmodeled = ", ".join(report["unmodeled"])
+            print(f"⚠ Нет истории курсов, в риск не вошли: {unmodeled}")
+
+    def add_alert(self, args):
+        """add-alert - создать ценовое уведомление"""
+        if not self.current_user:
+            print("\n❌ Ошибка: Пожалуйста, войдите в систему сначала")
+            return
 
-            sorted_pairs = sorted(filtered_pairs.items(),
-                                key=lambda x: x[1]["rate"],
-                                reverse=True)
+        if (args.above is None) == (args.below is None):
+            print("\n❌ Ошибка: Укажите ровно один из параметров --above или --below")
+            return
 
-            if args.top:
-                sorted_pairs = sorted_pairs[:args.top]
+        direction = "above" if args.above is not None else "below"
+        threshold = args.above if args.above is not None else args.below
 
-            print(f"Курсы из кэша (обновлено: {current_data.get('last_refresh', 'неизвестно')}):")
-            for pair, data in sorted_pairs:
-                print(f"- {pair}: {data['rate']} (источник: {data.get('source', 'неизвестно')})")
+        try:
+            alert = self.alert_manager.add_alert(
+                self.current_user.user_id,
+                args.currency,
+                threshold,
+                direction,
+                args.base or "USD"
+            )
+            print(f"\n✅ Уведомление создано: {alert.get_alert_info()}")
+        except (CurrencyNotFoundError, ValueError) as e:
+            print(f"\n❌ Ошибка: {e}")
 
-        except Exception as e:
-            print(f"\n❌ Ошибка отображения курсов: {e}")
+    def list_alerts(self, args):
+        """list-alerts - показать ценовые уведомления"""
+        if not self.current_user:
+            print("\n❌ Ошибка: Пожалуйста, войдите в систему сначала")
+            return
 
+        alerts = self.alert_manager.list_alerts(self.current_user.user_id)
+        if not alerts:
+            print("\nУ вас нет ценовых уведомлений")
+            return
+
+        print("\n🔔 Ценовые уведомления:")
+        for alert in alerts:
+            if alert.is_triggered:
+                triggered_at = alert.triggered_at.isoformat(timespec='seconds')
+                status = f"сработало {triggered_at} (курс: {alert.triggered_rate})"
+            else:
+                status = "активно"
+            print(f"  {alert.get_alert_info()} — {status}")
+
+    def remove_alert(self, args):
+        """remove-alert - удалить ценовое уведомление"""
+        if not self.current_user:
+            print("\n❌ Ошибка: Пожалуйста, войдите в систему сначала")
+            return
+
+        try:
+            alert = self.alert_manager.remove_alert(self.current_user.user_id, args.id)
+            print(f"\n✅ Уведомление {alert.get_alert_info()} удалено")
+        except ValueError as e:
+            print(f"\n❌ Ошибка: {e}")
+
+    def place_order(self, args):
+        """place-order - разместить лимитную заявку"""
+        if not self.current_user:
+            print("\n❌ Ошибка: Пожалуйста, войдите в систему сначала")
+            return
+        if self._simulation_active():
+            return
+
+        try:
+            order = self.order_manager.place_order(
+                self.current_user.user_id,
+                args.side,
+                args.currency,
+                args.amount,
+                args.limit
+            )
+            if order.is_pending:
+                print(f"\n✅ Заявка размещена: {order.get_order_info()}")
+            else:
+                self._print_order_result(order)
+        except (CurrencyNotFoundError, InsufficientFundsError, ValueError) as e:
+            print(f"\n❌ Ошибка: {e}")
+
+    def list_orders(self, args):
+        """list-orders - показать лимитные заявки"""
+        if not self.current_user:
+            print("\n❌ Ошибка: Пожалуйста, войдите в систему сначала")
+            return
+
+        orders = self.order_manager.list_orders(self.current_user.user_id, args.all)
+        if not orders:
+            print("\nУ вас нет активных заявок")
+            return
+
+        print("\n📋 Лимитные заявки:")
+        for order in orders:
+            status = order.status
+            if order.status == "filled":
+                status += f" (курс: {order.fill_rate})"
+            elif order.status == "failed":
+                status += f" ({order.reason})"
+            print(f"  {order.get_order_info()} — {status}")
+
+    def cancel_order(self, args):
+        """cancel-order - отменить лимитную заявку"""
+        if not self.current_user:
+            print("\n❌ Ошибка: Пожалуйста, войдите в систему сначала")
+            return
+        if self._simulation_active():
+            return
+
+        try:
+            order = self.order_manager.cancel_order(self.current_user.user_id, args.id)
+            print(f"\n✅ Заявка {order.get_order_info()} отменена")
+        except ValueError as e:
+            print(f"\n❌ Ошибка: {e}")
+
+    def _extract_profile_options(
+        self, user_input: str
+    ) -> Tuple[str, bool, Optional[str]]:
+        """убирает из ввода --profile и --profile-out <файл>"""
+        try:
+            parts = shlex.split(user_input)
+        except ValueError:
+            return user_input, self.profile, None
+
+        enabled = self.profile
+        dump_path = None
+        rest = []
+        i = 0
+        while i < len(parts):
+            if parts[i] == "--profile":
+                enabled = True
+            elif parts[i] == "--profile-out" and i + 1 < len(parts):
+                enabled = True
+                dump_path = parts[i + 1]
+                i += 1
+            else:
+                rest.append(parts[i])
+            i += 1
+
+        if enabled and dump_path is None and self.profile_dir and rest:
+            stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+            dump_path = os.path.join(self.profile_dir, f"{rest[0]}-{stamp}.prof")
+        if len(rest) == len(parts):
+            return user_input, enabled, dump_path
+        return shlex.join(rest), enabled, dump_path
+
+    def _print_profile(self, report: dict):
+        """вывод профиля команды"""
+        print(f"\n⏱ Профиль '{report['command']}': "
+              f"{report['wall_time'] * 1000:.1f} мс, "
+              f"пик памяти {report['peak_memory'] / 1024:.1f} KB")
+
+        phases = PrettyTable(["Фаза", "Время, мс", "%"])
+        phases.align = "l"
+        for name, elapsed in report["phases"].items():
+            share = elapsed / report["wall_time"] * 100 if report["wall_time"] else 0.0
+            phases.add_row([name, f"{elapsed * 1000:.2f}", f"{share:.1f}"])
+        print(phases)
+
+        if report["io"]:
+            io_table = PrettyTable(["Файл / хост", "Прочитано, KB", "Записано, KB"])
+            io_table.align = "l"
+            for path, stats in report["io"].items():
+                io_table.add_row([
+                    path, f"{stats['read'] / 1024:.1f}",
+                    f"{stats['written'] / 1024:.1f}"
+                ])
+            print(io_table)
+
+        if report["dump_path"]:
+            print(f"cProfile: {report['dump_path']}")
 
     def _parse_input(self, user_input: str):
         """парсинг ввода пользователя в аргументы"""
@@ -262,6 +1215,11 @@ class CLIInterface:
             parser.add_argument('--password', required=True)
         elif command == "show-portfolio":
             parser.add_argument('--base', required=False)
+            parser.add_argument('--at', required=False)
+            parser.add_argument('--from', dest='date_from', required=False)
+            parser.add_argument('--to', dest='date_to', required=False)
+            parser.add_argument('--step', default='1d')
+            parser.add_argument('--out', required=False)
         elif command == "buy":
             parser.add_argument('--currency', required=True)
             parser.add_argument('--amount', type=float, required=True)
@@ -277,8 +1235,90 @@ class CLIInterface:
             parser.add_argument('--currency', required=False)
             parser.add_argument('--top', type=int, required=False)
             parser.add_argument('--base', required=False)
+            parser.add_argument('--sort', choices=RatesIndex.SORT_KEYS, default='rate')
+            parser.add_argument('--asc', action='store_true')
         elif command == "list-currencies":
             pass
+        elif command == "sources-status":
+            pass
+        elif command == "stream-rates":
+            parser.add_argument('--feed', required=True)
+            parser.add_argument('--duration', type=float, required=False)
+        elif command == "compact-history":
+            pass
+        elif command == "export":
+            parser.add_argument('--dataset', choices=DATASETS, required=True)
+            parser.add_argument('--out', required=True)
+            parser.add_argument('--format', choices=FORMATS, required=False)
+            parser.add_argument('--resume', action='store_true')
+        elif command == "import":
+            parser.add_argument('--dataset', choices=DATASETS, required=True)
+            parser.add_argument('--file', required=True)
+            parser.add_argument('--format', choices=FORMATS, required=False)
+            parser.add_argument('--batch-size', type=int, default=1000)
+            parser.add_argument('--resume', action='store_true')
+        elif command == "history":
+            parser.add_argument('--limit', type=int, default=20)
+            parser.add_argument('--before', type=int, required=False)
+        elif command == "pnl":
+            pass
+        elif command == "partitions":
+            parser.add_argument('action', choices=['init', 'status', 'add'])
+            parser.add_argument('--count', type=int, required=False)
+            parser.add_argument('--base', required=False)
+            parser.add_argument('--processes', action='store_true')
+        elif command == "simulate":
+            parser.add_argument('action',
+                                choices=['start', 'status', 'commit', 'discard'])
+            parser.add_argument('--base', required=False)
+        elif command == "audit":
+            parser.add_argument('--user', required=False)
+            parser.add_argument('--action', type=str.upper, required=False)
+            parser.add_argument('--result', type=str.upper, choices=RESULTS,
+                                required=False)
+            parser.add_argument('--currency', required=False)
+            parser.add_argument('--from', dest='date_from', required=False)
+            parser.add_argument('--to', dest='date_to', required=False)
+            parser.add_argument('--limit', type=int, default=20)
+        elif command == "rate-stats":
+            parser.add_argument('--pair', required=True)
+            parser.add_argument('--window', type=int, default=10)
+        elif command == "rebalance":
+            parser.add_argument('--target', required=True)
+            parser.add_argument('--base', required=False)
+            parser.add_argument('--min-trade', type=float, default=0.0)
+            parser.add_argument('--all', action='store_true')
+            parser.add_argument('--out', required=False)
+            parser.add_argument('--execute', action='store_true')
+        elif command == "risk":
+            parser.add_argument('--confidence', type=float, default=0.95)
+            parser.add_argument('--interval', default='1h')
+            parser.add_argument('--lookback', type=int, default=30)
+            parser.add_argument('--all', action='store_true')
+        elif command == "backtest":
+            parser.add_argument('--strategy', choices=[*STRATEGIES, 'all'],
+                                default='all')
+            parser.add_argument('--currency', required=False)
+            parser.add_argument('--capital', type=float, default=10000.0)
+            parser.add_argument('--workers', type=int, required=False)
+        elif command == "add-alert":
+            parser.add_argument('--currency', required=True)
+            parser.add_argument('--above', type=float, required=False)
+            parser.add_argument('--below', type=float, required=False)
+            parser.add_argument('--base', required=False)
+        elif command == "list-alerts":
+            pass
+        elif command == "remove-alert":
+            parser.add_argument('--id', type=int, required=True)
+        elif command == "place-order":
+            parser.add_argument('--side', choices=['buy', 'sell'], required=True)
+            parser.add_argument('--currency', required=True)
+            parser.add_argument('--amount', type=float, required=True)
+            parser.add_argument('--limit', type=float, required=True)
+        elif command == "list-orders":
+            parser.add_argument('--all', action='store_true')
+        elif command == "cancel-order":
+            parser.add_argument('--id', type=int, required=True)
         else:
             return None
 
@@ -289,21 +1329,59 @@ class CLIInterface:
         print("\nДоступные команды:")
         print("  register --username <username> --password <password>")
         print("  login --username <username> --password <password>")
-        print("  show-portfolio [--base <currency>]")
+        print("  show-portfolio [--base <currency>] [--at <YYYY-MM-DDTHH:MM>]")
+        print("  show-portfolio [--base <currency>] --from <date> [--to <date>] "
+              "[--step <30m|4h|1d>] [--out <file.csv>]")
         print("  buy --currency <code> --amount <amount>")
         print("  sell --currency <code> --amount <amount>")
         print("  get-rate --from <currency> --to <currency>")
         print("  update-rates [--source <coingecko|exchangerate>]")
-        print("  show-rates [--currency <code>] [--top <N>] [--base <currency>]")
+        print("  show-rates [--currency <code>] [--top <N>] [--base <currency>] "
+              "[--sort <rate|change-1h|change-24h|age>] [--asc]")
         print("  list-currencies")
+        print("  sources-status")
+        print("  stream-rates --feed <tcp://host:port|file|-> [--duration <seconds>]")
+        print("  compact-history")
+        print("  export --dataset <users|portfolios|history> "
+              "--out <file.csv|.jsonl[.gz]> [--format <csv|jsonl>] [--resume]")
+        print("  import --dataset <users|portfolios|history> "
+              "--file <file.csv|.jsonl[.gz]> [--format <csv|jsonl>] "
+              "[--batch-size <N>] [--resume]")
+        print("  history [--limit <N>] [--before <trade_id>]")
+        print("  pnl")
+        print("  simulate <start|status|commit|discard> [--base <currency>]")
+        print("  partitions <init|add> --count <N>")
+        print("  partitions status [--base <currency>] [--processes]")
+        print("  audit [--user <name|id>] [--action <BUY|SELL|LOGIN|...>] "
+              "[--result <OK|ERROR>] [--currency <code>] [--from <date>] "
+              "[--to <date>] [--limit <N>]")
+        print("  rate-stats --pair <FROM_TO> [--window <N>]")
+        print("  backtest [--strategy <dca|rebalance|momentum|all>] "
+              "[--currency <code,...>] [--capital <USD>] [--workers <N>]")
+        print("  risk [--confidence <0.95>] [--interval <1h>] [--lookback <days>] "
+              "[--all]")
+        print("  rebalance --target <BTC:60,USD:40> [--base <currency>] "
+              "[--min-trade <amount>] [--all] [--out <plan.csv>] [--execute]")
+        print("  add-alert --currency <code> (--above <rate> | --below <rate>) "
+              "[--base <currency>]")
+        print("  list-alerts")
+        print("  remove-alert --id <alert_id>")
+        print("  place-order --side <buy|sell> --currency <code> --amount <amount> "
+              "--limit <rate>")
+        print("  list-orders [--all]")
+        print("  cancel-order --id <order_id>")
         print("  help")
         print("  exit")
+        print("\nК любой команде можно добавить --profile "
+              "или --profile-out <файл.prof>")
         print("\nПримеры:")
         print("  register --username sergey --password 1234")
         print("  buy --currency BTC --amount 0.05")
         print("  get-rate --from USD --to BTC")
         print("  update-rates --source coingecko")
         print("  show-rates --top 3")
+        print("  add-alert --currency BTC --above 100000")
+        print("  place-order --side buy --currency BTC --amount 0.1 --limit 80000")
 
     def run(self):
         """запуск интерфейса"""
@@ -314,6 +1392,8 @@ class CLIInterface:
                 prompt = "valutatrade"
                 if self.current_user:
                     prompt = f"valutatrade[{self.current_user.username}]"
+                if self.simulation:
+                    prompt += "[симуляция]"
 
                 user_input = input(f"\n{prompt}> ").strip()
 
@@ -328,6 +1408,8 @@ class CLIInterface:
                     self._print_help()
                     continue
 
+                user_input, profile, dump_path = self._extract_profile_options(
+                    user_input)
                 args = self._parse_input(user_input)
                 if not args:
                     print(f"\n❌ Неизвестная команда или неверные аргументы: {user_input}")
@@ -335,11 +1417,19 @@ class CLIInterface:
                     continue
 
                 command_parts = user_input.split()
-                command = command_parts[0].replace('-', '_')
+                command = self.COMMAND_METHODS.get(
+                    command_parts[0], command_parts[0].replace('-', '_')
+                )
 
                 if hasattr(self, command):
                     command_method = getattr(self, command)
-                    command_method(args)
+                    profiling = (profile_command(command_parts[0], dump_path)
+                                 if profile else nullcontext())
+                    with profiling as profiler, self.data_manager.unit_of_work(), \
+                            self.rate_service.snapshot():
+                        command_method(args)
+                    if profiler:
+                        self._print_profile(profiler.report())
                 else:
                     print(f"Н\n❌ Неизвестная команда: {command_parts[0]}")
 
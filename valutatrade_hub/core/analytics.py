@@ -0,0 +1,356 @@
+import heapq
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+class RateHistory:
+    """история курсов в виде отсортированных по времени массивов numpy по парам"""
+
+    def __init__(self, storage):
+        self.storage = storage
+        self._signature: Optional[tuple] = None
+        self._series: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def refresh(self) -> bool:
+        """перестраивает массивы, если история изменилась; True если перестроено"""
+        signature = self.storage.history_signature()
+        if signature == self._signature and self._series:
+            return False
+
+        grouped: Dict[str, Tuple[list, list]] = {}
+        for record in self.storage.load_historical_data():
+            pair = f"{record['from_currency']}_{record['to_currency']}"
+            timestamps, rates = grouped.setdefault(pair, ([], []))
+            timestamps.append(record["timestamp"])
+            rates.append(record["rate"])
+
+        self._series = {}
+        for pair, (timestamps, rates) in grouped.items():
+            ts = np.array(timestamps, dtype="datetime64[us]")
+            values = np.array(rates, dtype=np.float64)
+            order = np.argsort(ts, kind="stable")
+            self._series[pair] = (ts[order], values[order])
+
+        self._signature = signature
+        return True
+
+    def pairs(self):
+        self.refresh()
+        return list(self._series)
+
+    def get_series(self, pair: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(timestamps, rates) для пары; обратная пара пересчитывается как 1/rate"""
+        self.refresh()
+        pair = pair.upper()
+        if pair in self._series:
+            return self._series[pair]
+
+        from_currency, _, to_currency = pair.partition("_")
+        reverse = f"{to_currency}_{from_currency}"
+        if reverse in self._series:
+            ts, values = self._series[reverse]
+            return ts, 1.0 / values
+
+        raise ValueError(f"No rate history for pair '{pair}'")
+
+    def rate_at(self, pair: str, moment: np.datetime64) -> Optional[float]:
+        """
+        последний известный курс пары на момент moment (бинарный поиск);
+        для пар без своей истории — кросс-курс через USD
+        """
+        rate = self.rates_at(pair, np.array([moment], dtype="datetime64[us]"))[0]
+        return None if np.isnan(rate) else float(rate)
+
+    def rates_at(self, pair: str, moments: np.ndarray) -> np.ndarray:
+        """курсы пары на моменты одним searchsorted; NaN — курса ещё не было"""
+        pair = pair.upper()
+        from_currency, _, to_currency = pair.partition("_")
+        if from_currency == to_currency:
+            return np.ones(len(moments))
+
+        try:
+            timestamps, rates = self.get_series(pair)
+        except ValueError:
+            if "USD" in (from_currency, to_currency):
+                return np.full(len(moments), np.nan)
+            return (self.rates_at(f"{from_currency}_USD", moments)
+                    / self.rates_at(f"{to_currency}_USD", moments))
+
+        positions = np.searchsorted(timestamps, moments, side="right") - 1
+        result = rates[np.maximum(positions, 0)].astype(np.float64)
+        result[positions < 0] = np.nan
+        return result
+
+
+class RateStatsService:
+    """скользящие статистики по истории курсов"""
+
+    def __init__(self, history: RateHistory):
+        self.history = history
+        self._cache: Dict[Tuple[str, int, Any], Dict[str, Any]] = {}
+
+    def get_rate_stats(self, pair: str, window: int) -> Dict[str, Any]:
+        """скользящие среднее, волатильность, min/max и изменение в % по окну"""
+        if not isinstance(window, int) or window < 2:
+            raise ValueError("Window must be an integer >= 2")
+
+        if self.history.refresh():
+            self._cache.clear()
+
+        pair = pair.upper()
+        timestamps, rates = self.history.get_series(pair)
+        if len(rates) < window:
+            raise ValueError(
+                f"Not enough history for {pair}: {len(rates)} points, window {window}"
+            )
+
+        key = (pair, window, timestamps[-1])
+        if key in self._cache:
+            return self._cache[key]
+
+        cumsum = np.concatenate(([0.0], np.cumsum(rates)))
+        sma = (cumsum[window:] - cumsum[:-window]) / window
+
+        windows = sliding_window_view(rates, window)
+        rolling_min = windows.min(axis=1)
+        rolling_max = windows.max(axis=1)
+        pct_change = (rates[window - 1:] / rates[:len(rates) - window + 1] - 1.0) * 100
+
+        returns = rates[1:] / rates[:-1] - 1.0
+        volatility = sliding_window_view(returns, window - 1).std(axis=1) * 100
+
+        stats = {
+            "pair": pair,
+            "window": window,
+            "points": len(rates),
+            "timestamps": timestamps[window - 1:],
+            "sma": sma,
+            "volatility": volatility,
+            "min": rolling_min,
+            "max": rolling_max,
+            "pct_change": pct_change,
+            "latest": {
+                "timestamp": timestamps[-1].item(),
+                "rate": float(rates[-1]),
+                "sma": float(sma[-1]),
+                "volatility": float(volatility[-1]),
+                "min": float(rolling_min[-1]),
+                "max": float(rolling_max[-1]),
+                "pct_change": float(pct_change[-1]),
+            },
+        }
+        self._cache[key] = stats
+        return stats
+
+
+class RatesIndex:
+    """
+    индекс текущих курсов по валютам пары (перестраивается при смене снимка)
+    с выборкой top-N через heap и изменениями за 1ч/24ч по истории
+    """
+
+    SORT_KEYS = ("rate", "change-1h", "change-24h", "age")
+    _PERIODS = {"change_1h": np.timedelta64(1, "h"),
+                "change_24h": np.timedelta64(24, "h")}
+
+    def __init__(self, storage, history: RateHistory):
+        self.storage = storage
+        self.history = history
+        self._token = None
+        self.last_refresh: Optional[str] = None
+        self._pairs: Dict[str, Dict[str, Any]] = {}
+        self._by_currency: Dict[str, List[str]] = {}
+
+    def refresh(self):
+        """перестраивает индекс, если опубликован новый снимок курсов"""
+        token = self.storage.snapshots.current_token()
+        if token == self._token and self._pairs:
+            return
+
+        data = self.storage.load_current_rates()
+        self.last_refresh = data.get("last_refresh")
+        self._pairs = data.get("pairs", {})
+        self._by_currency = {}
+        for pair in self._pairs:
+            from_currency, _, to_currency = pair.partition("_")
+            self._by_currency.setdefault(from_currency, []).append(pair)
+            if to_currency != from_currency:
+                self._by_currency.setdefault(to_currency, []).append(pair)
+        self._token = token
+
+    def _convert(self, pair: str, base: str) -> Optional[Tuple[str, float]]:
+        """пара FROM_USD в пересчёте на base: (FROM_BASE, курс)"""
+        from_currency, _, to_currency = pair.partition("_")
+        if to_currency == base:
+            return pair, self._pairs[pair]["rate"]
+        base_pair = self._pairs.get(f"{base}_{to_currency}")
+        if not base_pair or from_currency == base:
+            return None
+        return f"{from_currency}_{base}", self._pairs[pair]["rate"] / base_pair["rate"]
+
+    def _row(self, pair: str, rate: float, data: Dict[str, Any],
+             now: np.datetime64) -> Dict[str, Any]:
+        updated_at = data.get("updated_at")
+        updated = datetime.fromisoformat(updated_at) if updated_at else None
+        row = {
+            "pair": pair,
+            "rate": rate,
+            "source": data.get("source"),
+            "updated_at": updated_at,
+            "age": (datetime.now() - updated).total_seconds() if updated else None,
+        }
+        for key, period in self._PERIODS.items():
+            # курс не обновлялся внутри окна — изменение за окно неизвестно, а не 0%
+            if updated is None or np.datetime64(updated, "us") < now - period:
+                row[key] = None
+                continue
+            past = self.history.rate_at(pair, now - period)
+            row[key] = (rate / past - 1.0) * 100 if past else None
+        return row
+
+    def query(self, currency: Optional[str] = None, base: Optional[str] = None,
+              sort: str = "rate", top: Optional[int] = None,
+              ascending: bool = False) -> List[Dict[str, Any]]:
+        """курсы с фильтром по валюте, пересчётом в base и сортировкой"""
+        if sort not in self.SORT_KEYS:
+            raise ValueError(
+                f"Unknown sort key '{sort}', expected one of {self.SORT_KEYS}")
+        if top is not None and top <= 0:
+            raise ValueError("Top must be positive")
+
+        self.refresh()
+        currency = currency.upper() if currency else None
+        base = base.upper() if base else None
+
+        if currency:
+            pairs = self._by_currency.get(currency, [])
+        else:
+            pairs = list(self._pairs)
+
+        candidates = []
+        for pair in pairs:
+            if base:
+                converted = self._convert(pair, base)
+            else:
+                converted = (pair, self._pairs[pair]["rate"])
+            if converted:
+                candidates.append((pair, *converted))
+
+        now = np.datetime64(datetime.now(), "us")
+        field = sort.replace("-", "_")
+        if field == "rate":
+            # курс известен без истории — сначала top-N, потом изменения только для них
+            selected = self._select(candidates, lambda item: item[2], top, ascending)
+            return [self._row(name, rate, self._pairs[pair], now)
+                    for pair, name, rate in selected]
+
+        rows = [self._row(name, rate, self._pairs[pair], now)
+                for pair, name, rate in candidates]
+        return self._select(rows, lambda row: row[field], top, ascending)
+
+    @staticmethod
+    def _select(items: list, key, top: Optional[int], ascending: bool) -> list:
+        # значения None (нет истории) всегда в конце
+        known = [item for item in items if key(item) is not None]
+        unknown = [item for item in items if key(item) is None]
+        if top is None:
+            known.sort(key=key, reverse=not ascending)
+        elif ascending:
+            known = heapq.nsmallest(top, known, key=key)
+        else:
+            known = heapq.nlargest(top, known, key=key)
+        result = known + unknown
+        return result[:top] if top is not None else result
+
+
+class PortfolioValuationService:
+    """
+    стоимость портфеля на прошлые моменты: балансы восстанавливаются по журналу
+    сделок, курсы берутся последние известные на момент из истории
+    """
+
+    def __init__(self, portfolio_manager, history: RateHistory):
+        self.portfolio_manager = portfolio_manager
+        self.history = history
+
+    def _balance_steps(self, user_id: int) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """
+        валюта -> (время сделок, балансы): balances[k] — баланс после k сделок,
+        balances[0] — до первой сделки; без сделок — текущий баланс кошелька
+        """
+        trades: Dict[str, Tuple[list, list]] = {}
+        for trade in self.portfolio_manager.ledger.iter_user_trades(user_id):
+            currency_code = trade["pair"].split("_")[0]
+            signed = trade["amount"] if trade["side"] == "buy" else -trade["amount"]
+            timestamps, balances = trades.setdefault(
+                currency_code, ([], [trade["balance"] - signed]))
+            timestamps.append(trade["timestamp"])
+            balances.append(trade["balance"])
+
+        portfolio = self.portfolio_manager.get_user_portfolio(user_id)
+        for currency_code, wallet in portfolio.wallets.items():
+            trades.setdefault(currency_code, ([], [wallet.balance]))
+
+        return {
+            currency_code: (np.array(timestamps, dtype="datetime64[us]"),
+                            np.array(balances, dtype=np.float64))
+            for currency_code, (timestamps, balances) in trades.items()
+        }
+
+    def value_series(self, user_id: int, moments, base: str = "USD") -> Dict[str, Any]:
+        """
+        стоимость портфеля сразу на много моментов: баланс и курс на T —
+        searchsorted по сделкам журнала и по истории пары
+        """
+        moments = np.asarray(moments, dtype="datetime64[us]")
+        base = base.upper()
+        total = np.zeros(len(moments))
+        positions = {}
+        missing = set()
+
+        for currency_code, (timestamps, steps) in self._balance_steps(user_id).items():
+            balances = steps[np.searchsorted(timestamps, moments, side="right")]
+            rates = self.history.rates_at(f"{currency_code}_{base}", moments)
+            values = balances * rates
+
+            unknown = np.isnan(rates) & (np.abs(balances) > 1e-12)
+            if unknown.any():
+                missing.add(currency_code)
+            values = np.where(np.isnan(values), 0.0, values)
+            total += values
+            positions[currency_code] = {"balance": balances, "rate": rates,
+                                        "value": values}
+
+        return {
+            "base": base,
+            "timestamps": moments,
+            "total": total,
+            "positions": positions,
+            "missing_rates": sorted(missing)
+        }
+
+    def value_at(self, user_id: int, moment: datetime,
+                 base: str = "USD") -> Dict[str, Any]:
+        """стоимость портфеля на момент moment"""
+        series = self.value_series(user_id, [np.datetime64(moment, "us")], base)
+        positions = {}
+        for currency_code, position in series["positions"].items():
+            balance = float(position["balance"][0])
+            if abs(balance) <= 1e-12:
+                continue
+            rate = float(position["rate"][0])
+            positions[currency_code] = {
+                "balance": balance,
+                "rate": None if np.isnan(rate) else rate,
+                "value": None if np.isnan(rate) else float(position["value"][0])
+            }
+        return {
+            "timestamp": moment,
+            "base": series["base"],
+            "positions": positions,
+            "total": float(series["total"][0]),
+            "missing_rates": series["missing_rates"]
+        }
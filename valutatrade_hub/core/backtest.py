@@ -0,0 +1,223 @@
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .analytics import RateHistory
+from .models import Portfolio, Wallet
+
+STRATEGIES = ("dca", "rebalance", "momentum")
+
+# сетки параметров по умолчанию для каждой стратегии
+DEFAULT_GRIDS: Dict[str, Dict[str, list]] = {
+    "dca": {"interval": [1, 2, 4, 8]},
+    "rebalance": {"target": [0.3, 0.5, 0.7], "threshold": [0.02, 0.05, 0.1]},
+    "momentum": {"window": [3, 5, 10, 20]},
+}
+
+# матрица цен процесса-воркера, передаётся один раз через initializer
+_WORKER_STATE: Dict[str, Any] = {}
+
+
+def build_jobs(strategies: List[str], currencies: List[str]) -> List[Dict[str, Any]]:
+    """все комбинации стратегия × валюта × параметры из DEFAULT_GRIDS"""
+    jobs = []
+    for strategy in strategies:
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy '{strategy}'. "
+                             f"Available: {', '.join(STRATEGIES)}")
+        grid = DEFAULT_GRIDS[strategy]
+        for currency_code in currencies:
+            for values in itertools.product(*grid.values()):
+                jobs.append({
+                    "strategy": strategy,
+                    "currency": currency_code,
+                    "params": dict(zip(grid.keys(), values)),
+                })
+    return jobs
+
+
+def _max_drawdown(values: np.ndarray) -> float:
+    peaks = np.maximum.accumulate(values)
+    return float(np.max(1.0 - values / peaks)) if len(values) else 0.0
+
+
+def _final_portfolio(currency_code: str, cash: float, units: float) -> Portfolio:
+    return Portfolio(0, {
+        "USD": Wallet("USD", max(cash, 0.0)),
+        currency_code: Wallet(currency_code, max(units, 0.0)),
+    })
+
+
+def _simulate_dca(prices: np.ndarray, capital: float, interval: int):
+    """равные покупки каждые interval тиков на весь капитал"""
+    buy_mask = np.zeros(len(prices), dtype=bool)
+    buy_mask[::interval] = True
+    spent = np.where(buy_mask, capital / buy_mask.sum(), 0.0)
+
+    units = np.cumsum(spent / prices)
+    cash = capital - np.cumsum(spent)
+    values = cash + units * prices
+    traded = float(spent.sum())
+    return values, cash[-1], units[-1], traded
+
+
+def _simulate_momentum(prices: np.ndarray, capital: float, window: int):
+    """держим валюту, пока курс выше скользящего среднего, иначе USD"""
+    cumsum = np.concatenate(([0.0], np.cumsum(prices)))
+    sma = np.full(len(prices), np.inf)
+    if len(prices) >= window:
+        sma[window - 1:] = (cumsum[window:] - cumsum[:-window]) / window
+    position = (prices > sma).astype(np.float64)
+
+    returns = np.zeros(len(prices))
+    returns[1:] = prices[1:] / prices[:-1] - 1.0
+    held = np.concatenate(([0.0], position[:-1]))
+    values = capital * np.cumprod(1.0 + held * returns)
+
+    switches = np.abs(np.diff(np.concatenate(([0.0], position))))
+    traded = float(np.sum(switches * values))
+    in_currency = position[-1] == 1.0
+    cash = 0.0 if in_currency else values[-1]
+    units = values[-1] / prices[-1] if in_currency else 0.0
+    return values, cash, units, traded
+
+
+def _simulate_rebalance(prices: np.ndarray, capital: float, target: float,
+                        threshold: float):
+    """целевая доля валюты с ребалансировкой при отклонении больше threshold"""
+    portfolio = Portfolio(0, {"USD": Wallet("USD", capital)})
+    portfolio.add_currency("CUR")
+    usd, cur = portfolio.get_wallet("USD"), portfolio.get_wallet("CUR")
+
+    values = np.empty(len(prices))
+    traded = 0.0
+    for i, price in enumerate(prices):
+        value = usd.balance + cur.balance * price
+        weight = cur.balance * price / value if value else 0.0
+        if i == 0 or abs(weight - target) > threshold:
+            delta = target * value - cur.balance * price
+            # в оборот идёт исполненная сумма, урезанная до доступного баланса
+            if delta > 0:
+                amount = min(delta, usd.balance)
+                if amount > 0:
+                    usd.withdraw(amount)
+                    cur.deposit(amount / price)
+                    traded += amount
+            elif delta < 0:
+                amount = min(-delta / price, cur.balance)
+                if amount > 0:
+                    cur.withdraw(amount)
+                    usd.deposit(amount * price)
+                    traded += amount * price
+        values[i] = usd.balance + cur.balance * price
+    return values, usd.balance, cur.balance, traded
+
+
+_SIMULATORS = {
+    "dca": _simulate_dca,
+    "rebalance": _simulate_rebalance,
+    "momentum": _simulate_momentum,
+}
+
+
+def _init_worker(currencies: List[str], prices: np.ndarray, capital: float):
+    _WORKER_STATE["columns"] = {code: i for i, code in enumerate(currencies)}
+    _WORKER_STATE["prices"] = prices
+    _WORKER_STATE["capital"] = capital
+
+
+def _run_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """прогон одной комбинации стратегия/параметры по матрице цен воркера"""
+    column = _WORKER_STATE["columns"][job["currency"]]
+    prices = _WORKER_STATE["prices"][:, column]
+    capital = _WORKER_STATE["capital"]
+
+    simulate = _SIMULATORS[job["strategy"]]
+    values, cash, units, traded = simulate(prices, capital, **job["params"])
+    portfolio = _final_portfolio(job["currency"], cash, units)
+    final_value = portfolio.get_total_value(
+        "USD", {f"{job['currency']}_USD": {"rate": float(prices[-1])}}
+    )
+
+    return {
+        **job,
+        "final_value": final_value,
+        "return_pct": (final_value / capital - 1.0) * 100,
+        "max_drawdown_pct": _max_drawdown(values) * 100,
+        "turnover": traded / float(np.mean(values)),
+    }
+
+
+class BacktestEngine:
+    """прогон стратегий по истории курсов из exchange_rates.json"""
+
+    def __init__(self, history: RateHistory):
+        self.history = history
+
+    def build_price_matrix(self, currencies: Optional[List[str]] = None
+                           ) -> Tuple[np.ndarray, List[str], np.ndarray]:
+        """
+        одна выборка истории: тики (с точностью до секунды) × валюты,
+        курсы к USD протягиваются вперёд от последнего известного значения
+        """
+        pairs = [pair for pair in self.history.pairs() if pair.endswith("_USD")]
+        available = [pair.split("_")[0] for pair in pairs]
+        if currencies:
+            missing = [code for code in currencies if code not in available]
+            if missing:
+                raise ValueError(f"No USD rate history for: {', '.join(missing)}")
+        else:
+            currencies = available
+        if not currencies:
+            raise ValueError("Rate history is empty")
+
+        series = [self.history.get_series(f"{code}_USD") for code in currencies]
+        seconds = [ts.astype("datetime64[s]") for ts, _ in series]
+        ticks = np.unique(np.concatenate(seconds))
+
+        prices = np.empty((len(ticks), len(currencies)))
+        for column, (ts, (_, rates)) in enumerate(zip(seconds, series)):
+            positions = np.searchsorted(ts, ticks, side="right") - 1
+            prices[:, column] = rates[np.clip(positions, 0, None)]
+
+        # до первой котировки берём первое известное значение
+        start = max(int(np.searchsorted(ticks, ts[0])) for ts in seconds)
+        return ticks[start:], currencies, prices[start:]
+
+    def run(self, strategies: List[str], currencies: Optional[List[str]] = None,
+            capital: float = 10000.0, workers: Optional[int] = None) -> Dict[str, Any]:
+        """прогоняет все комбинации параметров, при workers > 1 — в пуле процессов"""
+        if capital <= 0:
+            raise ValueError("Capital must be positive")
+
+        ticks, currencies, prices = self.build_price_matrix(currencies)
+        if len(ticks) < 2:
+            raise ValueError(
+                "Not enough rate history for backtest: need at least 2 ticks")
+
+        jobs = build_jobs(strategies, currencies)
+        workers = workers or os.cpu_count() or 1
+        workers = min(workers, len(jobs))
+
+        if workers <= 1:
+            _init_worker(currencies, prices, capital)
+            results = [_run_job(job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(currencies, prices, capital),
+            ) as pool:
+                chunksize = max(1, len(jobs) // (workers * 4))
+                results = list(pool.map(_run_job, jobs, chunksize=chunksize))
+
+        return {
+            "ticks": len(ticks),
+            "start": ticks[0].item(),
+            "end": ticks[-1].item(),
+            "workers": workers,
+            "results": results,
+        }
@@ -1,5 +1,8 @@
+import json
+import logging
+import os
 from abc import ABC, abstractmethod
-from typing import Dict
+from typing import Dict, Iterable, Optional
 
 from .exceptions import CurrencyNotFoundError
 
@@ -26,6 +29,11 @@ class Currency(ABC):
     def get_display_info(self) -> str:
         """строковое представление для интерфейса/логов"""
         pass
+
+    @abstractmethod
+    def to_dict(self) -> dict:
+        """запись для currencies.json"""
+        pass
     
     def _validate_code(self, code: str):
         """валидация кода валюты"""
@@ -60,14 +68,24 @@ class FiatCurrency(Currency):
     def get_display_info(self) -> str:
         return f"[FIAT] {self.code} — {self.name} (Issuing: {self.issuing_country})"
 
+    def to_dict(self) -> dict:
+        return {
+            "type": "fiat",
+            "code": self.code,
+            "name": self.name,
+            "issuing_country": self.issuing_country
+        }
+
 
 class CryptoCurrency(Currency):
     """крипта"""
     
-    def __init__(self, name: str, code: str, algorithm: str, market_cap: float = 0.0):
+    def __init__(self, name: str, code: str, algorithm: str, market_cap: float = 0.0,
+                 provider_id: Optional[str] = None):
         super().__init__(name, code)
         self._algorithm = algorithm
         self._market_cap = market_cap
+        self._provider_id = provider_id
     
     @property
     def algorithm(self) -> str:
@@ -76,44 +94,201 @@ class CryptoCurrency(Currency):
     @property
     def market_cap(self) -> float:
         return self._market_cap
+
+    @property
+    def provider_id(self) -> Optional[str]:
+        """id монеты у поставщика курсов (CoinGecko)"""
+        return self._provider_id
     
     def get_display_info(self) -> str:
         mcap_str = f"{self.market_cap:.2e}" if self.market_cap > 0 else "N/A"
         return f"[CRYPTO] {self.code} — {self.name} (Algo: {self.algorithm}, MCAP: {mcap_str})"
 
+    def to_dict(self) -> dict:
+        return {
+            "type": "crypto",
+            "code": self.code,
+            "name": self.name,
+            "algorithm": self.algorithm,
+            "market_cap": self.market_cap,
+            "provider_id": self.provider_id
+        }
+
 
-"""реестр валют"""
+"""реестр валют: загружается лениво из data/currencies.json"""
 _CURRENCY_REGISTRY: Dict[str, Currency] = {}
+_REGISTRY_LOADED = False
+
+logger = logging.getLogger('currencies')
+
+
+def _registry_path() -> str:
+    from ..infra.settings import settings
+    return os.path.join(settings.get("data_dir", "data"), "currencies.json")
+
+
+def _default_currencies() -> Iterable[Currency]:
+    """встроенный набор на случай отсутствия currencies.json"""
+    return [
+        FiatCurrency("US Dollar", "USD", "United States"),
+        FiatCurrency("Euro", "EUR", "Eurozone"),
+        FiatCurrency("Russian Ruble", "RUB", "Russia"),
+        FiatCurrency("British Pound", "GBP", "United Kingdom"),
+        FiatCurrency("Japanese Yen", "JPY", "Japan"),
+        CryptoCurrency("Bitcoin", "BTC", "SHA-256", 1.12e12, "bitcoin"),
+        CryptoCurrency("Ethereum", "ETH", "Ethash", 4.5e11, "ethereum"),
+        CryptoCurrency("Litecoin", "LTC", "Scrypt", 5.8e9, "litecoin"),
+        CryptoCurrency("Cardano", "ADA", "Ouroboros", 1.2e10, "cardano"),
+    ]
+
+
+def currency_from_dict(data: dict) -> Currency:
+    """создаёт валюту из записи currencies.json"""
+    if data.get("type") == "crypto":
+        return CryptoCurrency(
+            data["name"], data["code"], data.get("algorithm", "Unknown"),
+            data.get("market_cap", 0.0), data.get("provider_id")
+        )
+    return FiatCurrency(data["name"], data["code"],
+                        data.get("issuing_country", "Unknown"))
+
+
+def _read_currencies(path: str) -> list:
+    """валюты из файла реестра (или встроенный набор, если файла нет)"""
+    records = None
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            logger.error(f"Failed to load currency registry {path}: {e}")
+
+    if records is None:
+        return list(_default_currencies())
+
+    currencies = []
+    for record in records:
+        try:
+            currencies.append(currency_from_dict(record))
+        except (KeyError, ValueError) as e:
+            logger.warning(f"Skipping invalid currency record {record}: {e}")
+    return currencies
+
+
+def initialize_currencies(path: Optional[str] = None):
+    """инициализация реестра валют из файла данных (или из тёплого состояния)"""
+    from ..infra.warm_state import get_warm_state
+    global _REGISTRY_LOADED
+
+    path = path or _registry_path()
+    warm = get_warm_state(os.path.dirname(path) or ".")
+    if warm:
+        currencies = warm.load(os.path.basename(path), path,
+                               lambda: _read_currencies(path))
+    else:
+        currencies = _read_currencies(path)
+
+    _CURRENCY_REGISTRY.clear()
+    for currency in currencies:
+        _CURRENCY_REGISTRY[currency.code] = currency
+    _REGISTRY_LOADED = True
+
+
+def _ensure_loaded():
+    if not _REGISTRY_LOADED:
+        initialize_currencies()
+
+
+def save_currencies(path: Optional[str] = None):
+    """
+    атомарно записывает реестр в файл данных: его читают другие процессы,
+    недописанный файл они приняли бы за отсутствующий
+    """
+    from ..infra.serializers import get_serializer
+
+    _ensure_loaded()
+    path = path or _registry_path()
+    records = [currency.to_dict() for currency in _CURRENCY_REGISTRY.values()]
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    get_serializer().dump_file(records, tmp_path)
+    os.replace(tmp_path, path)
+
 
 def register_currency(currency: Currency):
     """регистрирует валюту в реестре"""
+    _ensure_loaded()
     _CURRENCY_REGISTRY[currency.code] = currency
 
+
+def register_currencies(currencies: Iterable[Currency], persist: bool = True) -> int:
+    """пакетная регистрация новых валют; возвращает число добавленных"""
+    _ensure_loaded()
+    added = 0
+    for currency in currencies:
+        if currency.code not in _CURRENCY_REGISTRY:
+            _CURRENCY_REGISTRY[currency.code] = currency
+            added += 1
+
+    if added and persist:
+        save_currencies()
+    return added
+
+
+def register_fiat_codes(codes: Iterable[str], persist: bool = True) -> int:
+    """регистрирует неизвестные коды фиатных валют из ответа поставщика"""
+    _ensure_loaded()
+    new_currencies = []
+    for code in codes:
+        if code in _CURRENCY_REGISTRY:
+            continue
+        try:
+            new_currencies.append(FiatCurrency(code, code, "Unknown"))
+        except ValueError:
+            logger.warning(f"Skipping invalid currency code from provider: {code}")
+    return register_currencies(new_currencies, persist)
+
+
+def register_crypto_coins(coins: Iterable[dict], persist: bool = True) -> int:
+    """
+    регистрирует неизвестные криптовалюты из списка монет поставщика
+    (id, symbol, name, market_cap); при повторе символа побеждает первая монета
+    """
+    _ensure_loaded()
+    new_currencies = []
+    for coin in coins:
+        code = str(coin.get("symbol") or "").upper()
+        if code in _CURRENCY_REGISTRY:
+            continue
+        try:
+            new_currencies.append(CryptoCurrency(
+                coin.get("name") or code, code, "Unknown",
+                float(coin.get("market_cap") or 0.0), coin.get("id")
+            ))
+        except ValueError:
+            # тикеры вроде 1INCH или USDC.E не проходят валидацию кода
+            logger.debug(f"Skipping unsupported coin symbol from provider: {code}")
+    return register_currencies(new_currencies, persist)
+
+
 def get_currency(code: str) -> Currency:
     """возвращает валюту по коду"""
+    _ensure_loaded()
     code = code.upper()
     if code not in _CURRENCY_REGISTRY:
         raise CurrencyNotFoundError(code)
     return _CURRENCY_REGISTRY[code]
 
+
 def get_all_currencies() -> Dict[str, Currency]:
     """возвращает все зарегистрированные валюты"""
+    _ensure_loaded()
     return _CURRENCY_REGISTRY.copy()
 
 
-def initialize_currencies():
-    """инициализация реестра валют"""
-    
-    register_currency(FiatCurrency("US Dollar", "USD", "United States"))
-    register_currency(FiatCurrency("Euro", "EUR", "Eurozone"))
-    register_currency(FiatCurrency("Russian Ruble", "RUB", "Russia"))
-    register_currency(FiatCurrency("British Pound", "GBP", "United Kingdom"))
-    register_currency(FiatCurrency("Japanese Yen", "JPY", "Japan"))
-   
-    register_currency(CryptoCurrency("Bitcoin", "BTC", "SHA-256", 1.12e12))
-    register_currency(CryptoCurrency("Ethereum", "ETH", "Ethash", 4.5e11))
-    register_currency(CryptoCurrency("Litecoin", "LTC", "Scrypt", 5.8e9))
-    register_currency(CryptoCurrency("Cardano", "ADA", "Ouroboros", 1.2e10))
-
-
-initialize_currencies()
\ No newline at end of file
+def get_crypto_currencies() -> Dict[str, CryptoCurrency]:
+    """зарегистрированные криптовалюты"""
+    _ensure_loaded()
+    return {
+        code: currency for code, currency in _CURRENCY_REGISTRY.items()
+        if isinstance(currency, CryptoCurrency)
+    }
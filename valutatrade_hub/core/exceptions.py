@@ -12,6 +12,10 @@ class InsufficientFundsError(TradingBaseError):
         self.required = required
         super().__init__(f"Insufficient funds: available {available} {currency_code}, required {required} {currency_code}")
 
+    def __reduce__(self):
+        # исключение передаётся между процессами (воркеры разделов)
+        return self.__class__, (self.currency_code, self.available, self.required)
+
 
 class CurrencyNotFoundError(TradingBaseError):
     """неизвестная валюта"""
@@ -20,10 +24,16 @@ class CurrencyNotFoundError(TradingBaseError):
         self.currency_code = currency_code
         super().__init__(f"Unknown currency '{currency_code}'")
 
+    def __reduce__(self):
+        return self.__class__, (self.currency_code,)
+
 
 class ApiRequestError(TradingBaseError):
     """ошибка при обращении к внешнему API"""
     
     def __init__(self, reason: str = "Unknown error"):
         self.reason = reason
-        super().__init__(f"Error when accessing external API: {reason}")
\ No newline at end of file
+        super().__init__(f"Error when accessing external API: {reason}")
+
+    def __reduce__(self):
+        return self.__class__, (self.reason,)
@@ -0,0 +1,281 @@
+import json
+import os
+import struct
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional
+
+from ..infra import profiler
+
+try:
+    import fcntl
+except ImportError:  # нет flock (Windows) — блокировка только внутри процесса
+    fcntl = None
+
+_PROCESS_LOCK = threading.Lock()
+
+
+class TradeLedger:
+    """
+    журнал сделок: append-only trades.jsonl и по одному индексу смещений
+    на пользователя; запись идёт под flock журнала, поэтому trade_id растут
+    и смещения верны при нескольких писателях (CLI, разделы, нагрузка)
+    """
+
+    LEDGER_FILE = "trades.jsonl"
+    INDEX_DIR = "trades_index"
+    # запись индекса: trade_id, смещение строки в trades.jsonl
+    _INDEX_RECORD = struct.Struct("<QQ")
+
+    def __init__(self, data_dir: str = "data"):
+        self.ledger_path = os.path.join(data_dir, self.LEDGER_FILE)
+        self.index_dir = os.path.join(data_dir, self.INDEX_DIR)
+
+        if os.path.exists(self.ledger_path) and not os.path.isdir(self.index_dir):
+            self.rebuild_index()
+        os.makedirs(self.index_dir, exist_ok=True)
+
+    @contextmanager
+    def _locked(self) -> Iterator[BinaryIO]:
+        """журнал под эксклюзивной блокировкой, позиция — в конце файла"""
+        if fcntl is None:
+            _PROCESS_LOCK.acquire()
+        try:
+            while True:
+                f = open(self.ledger_path, 'a+b')
+                if fcntl is None:
+                    break
+                # снимается при закрытии файла
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                # пока ждали, drop_users мог подменить файл — берём новый
+                if os.fstat(f.fileno()).st_ino == os.stat(self.ledger_path).st_ino:
+                    break
+                f.close()
+            with f:
+                f.seek(0, os.SEEK_END)
+                yield f
+        finally:
+            if fcntl is None:
+                _PROCESS_LOCK.release()
+
+    def _index_path(self, user_id: int) -> str:
+        return os.path.join(self.index_dir, f"{user_id}.idx")
+
+    @staticmethod
+    def _read_last_trade_id(f: BinaryIO) -> int:
+        """id последней сделки по хвосту журнала (вызывается под блокировкой)"""
+        end = f.seek(0, os.SEEK_END)
+        chunk = 4096
+        while True:
+            start = max(0, end - chunk)
+            f.seek(start)
+            lines = f.read(end - start).splitlines()
+            if start == 0 or len(lines) > 1:
+                break
+            chunk *= 2
+        f.seek(end)
+
+        for line in reversed(lines):
+            if line.strip():
+                return json.loads(line)["trade_id"]
+        return 0
+
+    def record(self, user_id: int, side: str, currency_code: str, amount: float,
+               rate: Optional[float], balance: float,
+               base_currency: str = "USD") -> Dict[str, Any]:
+        """добавляет сделку в журнал и индекс пользователя"""
+        with profiler.phase(profiler.PHASE_STORAGE_SAVE), self._locked() as f:
+            trade = {
+                "trade_id": self._read_last_trade_id(f) + 1,
+                "user_id": user_id,
+                "side": side,
+                "pair": f"{currency_code}_{base_currency}",
+                "amount": amount,
+                "rate": rate,
+                "timestamp": datetime.now().isoformat(),
+                "balance": balance
+            }
+            line = (json.dumps(trade, ensure_ascii=False) + "\n").encode("utf-8")
+            offset = f.tell()
+            f.write(line)
+            f.flush()
+
+            with open(self._index_path(user_id), 'ab') as index:
+                index.write(self._INDEX_RECORD.pack(trade["trade_id"], offset))
+        profiler.record_io(self.ledger_path, written=len(line))
+        profiler.record_io(self._index_path(user_id), written=self._INDEX_RECORD.size)
+        return trade
+
+    def import_trades(self, trades: List[Dict[str, Any]]):
+        """
+        дописывает сделки из другого журнала (перенос пользователей между
+        разделами): время и балансы сохраняются, trade_id выдаются заново
+        """
+        if not trades:
+            return
+
+        index_records: Dict[int, bytearray] = {}
+        with self._locked() as f:
+            trade_id = self._read_last_trade_id(f)
+            for trade in trades:
+                trade_id += 1
+                trade = {**trade, "trade_id": trade_id}
+                line = (json.dumps(trade, ensure_ascii=False) + "\n").encode("utf-8")
+                index_records.setdefault(trade["user_id"], bytearray()).extend(
+                    self._INDEX_RECORD.pack(trade_id, f.tell())
+                )
+                f.write(line)
+            f.flush()
+
+            for user_id, records in index_records.items():
+                with open(self._index_path(user_id), 'ab') as index:
+                    index.write(records)
+
+    def drop_users(self, user_ids):
+        """убирает сделки пользователей из журнала (переписывает его) и их индексы"""
+        user_ids = set(user_ids)
+        if not user_ids or not os.path.exists(self.ledger_path):
+            return
+        tmp_path = f"{self.ledger_path}.{os.getpid()}.tmp"
+        with self._locked() as source:
+            source.seek(0)
+            with open(tmp_path, 'wb') as target:
+                for line in source:
+                    if line.strip() and json.loads(line)["user_id"] not in user_ids:
+                        target.write(line)
+            os.replace(tmp_path, self.ledger_path)
+            self._rebuild_index()
+
+    def rebuild_index(self):
+        """перестраивает индексы пользователей одним проходом по журналу"""
+        with self._locked():
+            self._rebuild_index()
+
+    def _rebuild_index(self):
+        os.makedirs(self.index_dir, exist_ok=True)
+        for name in os.listdir(self.index_dir):
+            os.remove(os.path.join(self.index_dir, name))
+
+        buffers: Dict[int, bytearray] = {}
+        with open(self.ledger_path, 'rb') as f:
+            offset = 0
+            for line in f:
+                if line.strip():
+                    trade = json.loads(line)
+                    buffers.setdefault(trade["user_id"], bytearray()).extend(
+                        self._INDEX_RECORD.pack(trade["trade_id"], offset)
+                    )
+                offset += len(line)
+
+        for user_id, buffer in buffers.items():
+            with open(self._index_path(user_id), 'wb') as f:
+                f.write(buffer)
+
+    def _read_index(self, user_id: int) -> bytes:
+        path = self._index_path(user_id)
+        if not os.path.exists(path):
+            return b""
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def _load_trades(self, offsets: List[int]) -> List[Dict[str, Any]]:
+        trades = []
+        if not offsets:
+            return trades
+        with profiler.phase(profiler.PHASE_STORAGE_LOAD), \
+                open(self.ledger_path, 'rb') as f:
+            for offset in offsets:
+                f.seek(offset)
+                line = f.readline()
+                profiler.record_io(self.ledger_path, read=len(line))
+                trades.append(json.loads(line))
+        return trades
+
+    def get_history(self, user_id: int, limit: int = 20,
+                    before: Optional[int] = None) -> Dict[str, Any]:
+        """страница сделок пользователя (новые сначала) до курсора before"""
+        if limit <= 0:
+            raise ValueError("Limit must be positive")
+
+        path = self._index_path(user_id)
+        if not os.path.exists(path):
+            return {"trades": [], "next_cursor": None}
+
+        size = self._INDEX_RECORD.size
+        with open(path, 'rb') as f:
+            count = os.fstat(f.fileno()).st_size // size
+
+            # бинарный поиск первой записи с trade_id >= before
+            end = count
+            if before is not None:
+                lo, hi = 0, count
+                while lo < hi:
+                    mid = (lo + hi) // 2
+                    f.seek(mid * size)
+                    trade_id, _ = self._INDEX_RECORD.unpack(f.read(size))
+                    if trade_id < before:
+                        lo = mid + 1
+                    else:
+                        hi = mid
+                end = lo
+
+            start = max(0, end - limit)
+            f.seek(start * size)
+            page = f.read((end - start) * size)
+
+        offsets = [offset for _, offset in self._INDEX_RECORD.iter_unpack(page)]
+        offsets.reverse()
+        trades = self._load_trades(offsets)
+
+        return {
+            "trades": trades,
+            "next_cursor": trades[-1]["trade_id"] if trades and start > 0 else None
+        }
+
+    def iter_user_trades(self, user_id: int) -> Iterator[Dict[str, Any]]:
+        """все сделки пользователя в хронологическом порядке"""
+        index = self._read_index(user_id)
+        offsets = [offset for _, offset in self._INDEX_RECORD.iter_unpack(index)]
+        yield from self._load_trades(offsets)
+
+    def get_cost_basis(self, user_id: int) -> Dict[str, Dict[str, Any]]:
+        """себестоимость по FIFO-лотам и реализованный P&L по валютам (в USD)"""
+        lots: Dict[str, deque] = {}
+        realized: Dict[str, float] = {}
+
+        for trade in self.iter_user_trades(user_id):
+            currency_code = trade["pair"].split("_")[0]
+            currency_lots = lots.setdefault(currency_code, deque())
+            realized.setdefault(currency_code, 0.0)
+
+            if trade["side"] == "buy":
+                currency_lots.append([trade["amount"], trade["rate"]])
+                continue
+
+            remaining = trade["amount"]
+            while remaining > 1e-12 and currency_lots:
+                lot = currency_lots[0]
+                used = min(lot[0], remaining)
+                if lot[1] is not None and trade["rate"] is not None:
+                    realized[currency_code] += used * (trade["rate"] - lot[1])
+                lot[0] -= used
+                remaining -= used
+                if lot[0] <= 1e-12:
+                    currency_lots.popleft()
+
+        result = {}
+        for currency_code, currency_lots in lots.items():
+            amount = sum(lot[0] for lot in currency_lots)
+            known = [lot for lot in currency_lots if lot[1] is not None]
+            cost = sum(lot[0] * lot[1] for lot in known)
+            known_amount = sum(lot[0] for lot in known)
+            result[currency_code] = {
+                "amount": amount,
+                "lots": len(currency_lots),
+                "cost_basis": cost,
+                "avg_cost": cost / known_amount if known_amount else None,
+                "realized_pnl": realized[currency_code]
+            }
+        return result
@@ -200,4 +200,267 @@ class Portfolio:
             currency: Wallet.from_dict(wallet_data) 
             for currency, wallet_data in data["wallets"].items()
         }
-        return cls(user_id=data["user_id"], wallets=wallets)
\ No newline at end of file
+        return cls(user_id=data["user_id"], wallets=wallets)
+
+class PriceAlert:
+    """класс ценового уведомления пользователя"""
+    DIRECTIONS = ("above", "below")
+
+    def __init__(self, alert_id: int, user_id: int, currency_code: str,
+                 base_currency: str, threshold: float, direction: str,
+                 created_at: datetime, triggered_at: Optional[datetime] = None,
+                 triggered_rate: Optional[float] = None):
+        if direction not in self.DIRECTIONS:
+            raise ValueError(f"Alert direction must be one of {self.DIRECTIONS}")
+        if not isinstance(threshold, (int, float)) or threshold <= 0:
+            raise ValueError("Alert threshold must be positive")
+
+        self._alert_id = alert_id
+        self._user_id = user_id
+        self._currency_code = currency_code.upper()
+        self._base_currency = base_currency.upper()
+        self._threshold = float(threshold)
+        self._direction = direction
+        self._created_at = created_at
+        self._triggered_at = triggered_at
+        self._triggered_rate = triggered_rate
+
+    @property
+    def alert_id(self) -> int:
+        return self._alert_id
+
+    @property
+    def user_id(self) -> int:
+        return self._user_id
+
+    @property
+    def currency_code(self) -> str:
+        return self._currency_code
+
+    @property
+    def base_currency(self) -> str:
+        return self._base_currency
+
+    @property
+    def pair(self) -> str:
+        return f"{self._currency_code}_{self._base_currency}"
+
+    @property
+    def threshold(self) -> float:
+        return self._threshold
+
+    @property
+    def direction(self) -> str:
+        return self._direction
+
+    @property
+    def created_at(self) -> datetime:
+        return self._created_at
+
+    @property
+    def triggered_at(self) -> Optional[datetime]:
+        return self._triggered_at
+
+    @property
+    def triggered_rate(self) -> Optional[float]:
+        return self._triggered_rate
+
+    @property
+    def is_triggered(self) -> bool:
+        return self._triggered_at is not None
+
+    def is_met(self, rate: float) -> bool:
+        """выполнено ли условие уведомления при данном курсе"""
+        if self._direction == "above":
+            return rate >= self._threshold
+        return rate <= self._threshold
+
+    def trigger(self, rate: float):
+        """помечает уведомление сработавшим"""
+        self._triggered_at = datetime.now()
+        self._triggered_rate = rate
+
+    def get_alert_info(self) -> str:
+        sign = "≥" if self._direction == "above" else "≤"
+        return f"#{self._alert_id} {self.pair} {sign} {self._threshold}"
+
+    def to_dict(self) -> dict:
+        return {
+            "alert_id": self._alert_id,
+            "user_id": self._user_id,
+            "currency_code": self._currency_code,
+            "base_currency": self._base_currency,
+            "threshold": self._threshold,
+            "direction": self._direction,
+            "created_at": self._created_at.isoformat(),
+            "triggered_at": (self._triggered_at.isoformat()
+                             if self._triggered_at else None),
+            "triggered_rate": self._triggered_rate
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'PriceAlert':
+        triggered_at = data.get("triggered_at")
+        return cls(
+            alert_id=data["alert_id"],
+            user_id=data["user_id"],
+            currency_code=data["currency_code"],
+            base_currency=data["base_currency"],
+            threshold=data["threshold"],
+            direction=data["direction"],
+            created_at=datetime.fromisoformat(data["created_at"]),
+            triggered_at=datetime.fromisoformat(triggered_at) if triggered_at else None,
+            triggered_rate=data.get("triggered_rate")
+        )
+
+
+class LimitOrder:
+    """класс лимитной заявки на покупку/продажу валюты"""
+    SIDES = ("buy", "sell")
+    STATUSES = ("pending", "filled", "cancelled", "failed")
+
+    def __init__(self, order_id: int, user_id: int, side: str, currency_code: str,
+                 amount: float, limit_rate: float, created_at: datetime,
+                 base_currency: str = "USD", status: str = "pending",
+                 closed_at: Optional[datetime] = None,
+                 fill_rate: Optional[float] = None, reason: Optional[str] = None):
+        if side not in self.SIDES:
+            raise ValueError(f"Order side must be one of {self.SIDES}")
+        if status not in self.STATUSES:
+            raise ValueError(f"Order status must be one of {self.STATUSES}")
+        if not isinstance(amount, (int, float)) or amount <= 0:
+            raise ValueError("Amount must be positive")
+        if not isinstance(limit_rate, (int, float)) or limit_rate <= 0:
+            raise ValueError("Limit rate must be positive")
+
+        self._order_id = order_id
+        self._user_id = user_id
+        self._side = side
+        self._currency_code = currency_code.upper()
+        self._base_currency = base_currency.upper()
+        self._amount = float(amount)
+        self._limit_rate = float(limit_rate)
+        self._created_at = created_at
+        self._status = status
+        self._closed_at = closed_at
+        self._fill_rate = fill_rate
+        self._reason = reason
+
+    @property
+    def order_id(self) -> int:
+        return self._order_id
+
+    @property
+    def user_id(self) -> int:
+        return self._user_id
+
+    @property
+    def side(self) -> str:
+        return self._side
+
+    @property
+    def currency_code(self) -> str:
+        return self._currency_code
+
+    @property
+    def base_currency(self) -> str:
+        return self._base_currency
+
+    @property
+    def pair(self) -> str:
+        return f"{self._currency_code}_{self._base_currency}"
+
+    @property
+    def amount(self) -> float:
+        return self._amount
+
+    @property
+    def limit_rate(self) -> float:
+        return self._limit_rate
+
+    @property
+    def created_at(self) -> datetime:
+        return self._created_at
+
+    @property
+    def status(self) -> str:
+        return self._status
+
+    @property
+    def closed_at(self) -> Optional[datetime]:
+        return self._closed_at
+
+    @property
+    def fill_rate(self) -> Optional[float]:
+        return self._fill_rate
+
+    @property
+    def reason(self) -> Optional[str]:
+        return self._reason
+
+    @property
+    def is_pending(self) -> bool:
+        return self._status == "pending"
+
+    def is_marketable(self, rate: float) -> bool:
+        """может ли заявка быть исполнена по данному курсу"""
+        if self._side == "buy":
+            return rate <= self._limit_rate
+        return rate >= self._limit_rate
+
+    def _close(self, status: str, fill_rate: Optional[float] = None,
+               reason: Optional[str] = None):
+        if not self.is_pending:
+            raise ValueError(f"Order #{self._order_id} is already {self._status}")
+        self._status = status
+        self._closed_at = datetime.now()
+        self._fill_rate = fill_rate
+        self._reason = reason
+
+    def fill(self, rate: float):
+        self._close("filled", fill_rate=rate)
+
+    def cancel(self):
+        self._close("cancelled")
+
+    def fail(self, reason: str):
+        self._close("failed", reason=reason)
+
+    def get_order_info(self) -> str:
+        sign = "≤" if self._side == "buy" else "≥"
+        return (f"#{self._order_id} {self._side.upper()} {self._amount:.4f} "
+                f"{self._currency_code} если {self.pair} {sign} {self._limit_rate}")
+
+    def to_dict(self) -> dict:
+        return {
+            "order_id": self._order_id,
+            "user_id": self._user_id,
+            "side": self._side,
+            "currency_code": self._currency_code,
+            "base_currency": self._base_currency,
+            "amount": self._amount,
+            "limit_rate": self._limit_rate,
+            "created_at": self._created_at.isoformat(),
+            "status": self._status,
+            "closed_at": self._closed_at.isoformat() if self._closed_at else None,
+            "fill_rate": self._fill_rate,
+            "reason": self._reason
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'LimitOrder':
+        closed_at = data.get("closed_at")
+        return cls(
+            order_id=data["order_id"],
+            user_id=data["user_id"],
+            side=data["side"],
+            currency_code=data["currency_code"],
+            amount=data["amount"],
+            limit_rate=data["limit_rate"],
+            created_at=datetime.fromisoformat(data["created_at"]),
+            base_currency=data.get("base_currency", "USD"),
+            status=data.get("status", "pending"),
+            closed_at=datetime.fromisoformat(closed_at) if closed_at else None,
+            fill_rate=data.get("fill_rate"),
+            reason=data.get("reason")
+        )
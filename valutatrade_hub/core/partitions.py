@@ -0,0 +1,488 @@
+import os
+import threading
+from collections import defaultdict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+
+from ..infra.serializers import get_serializer
+from .ledger import TradeLedger
+from .models import Portfolio, User
+from .usecases import PortfolioManager, UserManager
+from .utils import DataManager, ExchangeRateService
+
+try:
+    import fcntl
+except ImportError:  # нет flock (Windows) — блокировка только внутри процесса
+    fcntl = None
+
+_LAYOUT_LOCK = threading.Lock()
+# дескрипторы блокировки раскладки, открытые в этом процессе
+_LAYOUT_LOCK_FDS: Set[int] = set()
+
+
+def _close_inherited_layout_locks():
+    """
+    воркер раздела может стартовать (fork) под блокировкой раскладки;
+    его копия дескриптора держала бы flock, пока он жив
+    """
+    for fd in _LAYOUT_LOCK_FDS:
+        os.close(fd)
+    _LAYOUT_LOCK_FDS.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_close_inherited_layout_locks)
+
+PARTITIONS_FILE = "partitions.json"
+PARTITIONS_DIR = "partitions"
+# сюда init убирает корневые файлы пользователей: после раскладки
+# источник истины — только разделы
+RETIRED_DIR = "retired"
+_ROOT_USER_FILES = ("users.json", "portfolios.json",
+                    TradeLedger.LEDGER_FILE, TradeLedger.INDEX_DIR)
+
+# методы узла, доступные роутеру, кроме методов менеджеров
+_NODE_METHODS = ("find_user", "user_ids", "user_trades", "book_summary")
+_MANAGERS = ("user_manager", "portfolio_manager")
+
+
+def jump_hash(key: int, buckets: int) -> int:
+    """
+    jump consistent hash (Lamping, Veach): при переходе с N на N+1 разделов
+    переезжает только ~1/(N+1) ключей, и все они — в новый раздел
+    """
+    if buckets <= 0:
+        raise ValueError("Partition count must be positive")
+    key &= 0xFFFFFFFFFFFFFFFF
+    bucket, jump = -1, 0
+    while jump < buckets:
+        bucket = jump
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        jump = int((bucket + 1) * (float(1 << 31) / float((key >> 33) + 1)))
+    return bucket
+
+
+def partition_dir(data_dir: str, index: int) -> str:
+    return os.path.join(str(data_dir), PARTITIONS_DIR, f"p{index:03d}")
+
+
+def load_layout(data_dir: str) -> Optional[Dict[str, Any]]:
+    """раскладка разделов из partitions.json или None, если разделов нет"""
+    return DataManager(data_dir).load_json(PARTITIONS_FILE, {}) or None
+
+
+@contextmanager
+def _layout_locked(data_dir: str) -> Iterator[str]:
+    """
+    эксклюзивный flock раскладки для read-modify-write partitions.json;
+    отдаёт путь к файлу раскладки
+    """
+    path = os.path.join(str(data_dir), PARTITIONS_FILE)
+    if fcntl is None:
+        with _LAYOUT_LOCK:
+            yield path
+        return
+    # сам partitions.json заменяется через os.replace, блокировка на нём
+    # не переживала бы запись — блокируется постоянный файл рядом
+    fd = os.open(f"{path}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+    _LAYOUT_LOCK_FDS.add(fd)
+    try:
+        # снимается при закрытии файла
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield path
+    finally:
+        _LAYOUT_LOCK_FDS.discard(fd)
+        os.close(fd)
+
+
+class PartitionNode:
+    """
+    раздел пользователей: свой каталог данных (users, portfolios, журнал
+    сделок) и общие для всех разделов снимки курсов корневого каталога
+    """
+
+    def __init__(self, data_dir: str, rates_dir: str):
+        self.data_manager = DataManager(data_dir)
+        self.rate_service = ExchangeRateService(self.data_manager, rates_dir)
+        self.user_manager = UserManager(self.data_manager)
+        self.portfolio_manager = PortfolioManager(self.data_manager, self.rate_service)
+
+    def call(self, target: str, method: str, args: tuple) -> Any:
+        """вызов метода менеджера или узла в unit of work на одной версии курсов"""
+        if target in _MANAGERS:
+            handler = getattr(getattr(self, target), method)
+        elif target == "node" and method in _NODE_METHODS:
+            handler = getattr(self, method)
+        else:
+            raise ValueError(f"Unknown partition call {target}.{method}")
+        with self.data_manager.unit_of_work(), self.rate_service.snapshot():
+            return handler(*args)
+
+    def find_user(self, username: str) -> Optional[int]:
+        for user in self.data_manager.load_json("users.json", []):
+            if user["username"] == username:
+                return user["user_id"]
+        return None
+
+    def user_ids(self) -> List[int]:
+        users = self.data_manager.load_json("users.json", [])
+        return [user["user_id"] for user in users]
+
+    def user_trades(self, user_id: int) -> List[Dict[str, Any]]:
+        return list(self.portfolio_manager.ledger.iter_user_trades(user_id))
+
+    def book_summary(self) -> Dict[str, Any]:
+        """число пользователей и суммарные балансы по валютам"""
+        portfolios = self.data_manager.load_json("portfolios.json", [])
+        balances: Dict[str, float] = defaultdict(float)
+        for portfolio in portfolios:
+            for code, wallet in portfolio.get("wallets", {}).items():
+                balances[code] += wallet["balance"]
+        return {
+            "users": len(self.data_manager.load_json("users.json", [])),
+            "portfolios": len(portfolios),
+            "balances": dict(balances),
+        }
+
+    def export_users(self, user_ids: Iterable[int]) -> Dict[str, list]:
+        """записи пользователей, их портфели и сделки для переноса в другой раздел"""
+        user_ids = set(user_ids)
+        ledger = self.portfolio_manager.ledger
+        return {
+            "users": [user for user in self.data_manager.load_json("users.json", [])
+                      if user["user_id"] in user_ids],
+            "portfolios": [
+                portfolio
+                for portfolio in self.data_manager.load_json("portfolios.json", [])
+                if portfolio["user_id"] in user_ids
+            ],
+            "trades": [trade for user_id in sorted(user_ids)
+                       for trade in ledger.iter_user_trades(user_id)],
+        }
+
+    def import_users(self, payload: Dict[str, list]) -> int:
+        """добавляет перенесённых пользователей; уже имеющиеся пропускаются"""
+        with self.data_manager.unit_of_work():
+            users = self.data_manager.load_json("users.json", [])
+            existing = {user["user_id"] for user in users}
+            new_users = [user for user in payload["users"]
+                         if user["user_id"] not in existing]
+            if not new_users:
+                return 0
+            new_ids = {user["user_id"] for user in new_users}
+
+            self.portfolio_manager.ledger.import_trades(
+                [trade for trade in payload["trades"] if trade["user_id"] in new_ids]
+            )
+            portfolios = self.data_manager.load_json("portfolios.json", [])
+            portfolios.extend(portfolio for portfolio in payload["portfolios"]
+                              if portfolio["user_id"] in new_ids)
+            users.extend(new_users)
+            self.data_manager.save_json("users.json", users)
+            self.data_manager.save_json("portfolios.json", portfolios)
+        return len(new_users)
+
+    def drop_users(self, user_ids: Iterable[int]) -> int:
+        """удаляет пользователей, их портфели и сделки из раздела"""
+        user_ids = set(user_ids)
+        if not user_ids:
+            return 0
+        with self.data_manager.unit_of_work():
+            users = self.data_manager.load_json("users.json", [])
+            kept = [user for user in users if user["user_id"] not in user_ids]
+            portfolios = [
+                portfolio
+                for portfolio in self.data_manager.load_json("portfolios.json", [])
+                if portfolio["user_id"] not in user_ids
+            ]
+            self.data_manager.save_json("users.json", kept)
+            self.data_manager.save_json("portfolios.json", portfolios)
+        self.portfolio_manager.ledger.drop_users(user_ids)
+        return len(users) - len(kept)
+
+
+# узел раздела процесса-воркера, создаётся один раз через initializer
+_WORKER_STATE: Dict[str, Any] = {}
+
+
+def _init_worker(data_dir: str, rates_dir: str):
+    _WORKER_STATE["node"] = PartitionNode(data_dir, rates_dir)
+
+
+def _call_worker(target: str, method: str, args: tuple) -> Any:
+    return _WORKER_STATE["node"].call(target, method, args)
+
+
+class _LocalPartition:
+    """
+    раздел в текущем процессе: у каждого раздела свой поток, вызовы к одному
+    разделу идут по очереди, к разным — параллельно (с учётом GIL выигрыш
+    есть на вводе-выводе; для разбора JSON на нескольких ядрах — процессы)
+    """
+
+    def __init__(self, data_dir: str, rates_dir: str):
+        self.node = PartitionNode(data_dir, rates_dir)
+        self.pool = ThreadPoolExecutor(max_workers=1)
+
+    def submit(self, target: str, method: str, args: tuple) -> Future:
+        return self.pool.submit(self.node.call, target, method, args)
+
+    def close(self):
+        self.pool.shutdown()
+
+
+class _ProcessPartition:
+    """раздел в отдельном процессе: один воркер, вызовы идут через его очередь"""
+
+    def __init__(self, data_dir: str, rates_dir: str):
+        self.pool = ProcessPoolExecutor(max_workers=1, initializer=_init_worker,
+                                        initargs=(data_dir, rates_dir))
+
+    def submit(self, target: str, method: str, args: tuple) -> Future:
+        return self.pool.submit(_call_worker, target, method, args)
+
+    def close(self):
+        self.pool.shutdown()
+
+
+class _RoutedLedger:
+    """чтение журнала сделок пользователя из его раздела (как у TradeLedger)"""
+
+    def __init__(self, router: "PartitionRouter"):
+        self.router = router
+
+    def iter_user_trades(self, user_id: int) -> Iterator[Dict[str, Any]]:
+        yield from self.router.call(user_id, "node", "user_trades", user_id)
+
+
+class PartitionRouter:
+    """
+    маршрутизация вызовов UserManager/PortfolioManager в раздел-владелец
+    (jump hash от user_id); запросы по всей книге — scatter-gather;
+    разделы живут в текущем процессе или каждый в своём процессе
+    """
+
+    def __init__(self, data_dir: str = "data", processes: bool = False):
+        self.data_dir = str(data_dir)
+        self.data_manager = DataManager(self.data_dir)
+        self.rate_service = ExchangeRateService(self.data_manager)
+        layout = load_layout(self.data_dir)
+        if not layout:
+            raise ValueError(
+                "Partitions are not initialized, run 'partitions init' first")
+        self.count = layout["count"]
+        self._lock = threading.Lock()
+        backend = _ProcessPartition if processes else _LocalPartition
+        self.partitions = [backend(partition_dir(self.data_dir, index), self.data_dir)
+                           for index in range(self.count)]
+        self.ledger = _RoutedLedger(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        for partition in self.partitions:
+            partition.close()
+
+    def owner(self, user_id: int) -> int:
+        """номер раздела, которому принадлежит пользователь"""
+        return jump_hash(user_id, self.count)
+
+    def call(self, user_id: int, target: str, method: str, *args) -> Any:
+        """вызов в разделе-владельце пользователя"""
+        partition = self.partitions[self.owner(user_id)]
+        return partition.submit(target, method, args).result()
+
+    def scatter(self, target: str, method: str, *args) -> List[Any]:
+        """один и тот же вызов во всех разделах параллельно, результаты по порядку"""
+        futures = [partition.submit(target, method, args)
+                   for partition in self.partitions]
+        return [future.result() for future in futures]
+
+    @staticmethod
+    def _allocate_user_id(layout_path: str) -> int:
+        """
+        user_id уникален для всех разделов: счётчик хранится в partitions.json;
+        вызывается под _layout_locked, файл пишется сразу и атомарно, без
+        фиксации unit of work вызывающего
+        """
+        serializer = get_serializer()
+        layout = serializer.load_file(layout_path)
+        user_id = layout["next_user_id"]
+        layout["next_user_id"] = user_id + 1
+        tmp_path = f"{layout_path}.{os.getpid()}.tmp"
+        serializer.dump_file(layout, tmp_path)
+        os.replace(tmp_path, layout_path)
+        return user_id
+
+    def find_user(self, username: str) -> Optional[int]:
+        """user_id по имени: поиск во всех разделах"""
+        return next((user_id for user_id in self.scatter("node", "find_user", username)
+                     if user_id is not None), None)
+
+    def register_user(self, username: str, password: str) -> User:
+        # блокировка раскладки общая для роутеров всех процессов: проверка
+        # имени, выдача user_id и регистрация идут без чужих регистраций
+        with self._lock, _layout_locked(self.data_dir) as layout_path:
+            if self.find_user(username) is not None:
+                raise ValueError(f"Username '{username}' already exists")
+            user_id = self._allocate_user_id(layout_path)
+            return self.call(user_id, "user_manager", "register_user",
+                             username, password, user_id)
+
+    def login(self, username: str, password: str) -> User:
+        user_id = self.find_user(username)
+        if user_id is None:
+            raise ValueError(f"User '{username}' not found")
+        return self.call(user_id, "user_manager", "login", username, password)
+
+    def get_user_portfolio(self, user_id: int) -> Portfolio:
+        return self.call(user_id, "portfolio_manager", "get_user_portfolio", user_id)
+
+    def buy_currency(self, user_id: int, currency_code: str,
+                     amount: float) -> Dict[str, Any]:
+        return self.call(user_id, "portfolio_manager", "buy_currency",
+                         user_id, currency_code, amount)
+
+    def sell_currency(self, user_id: int, currency_code: str,
+                      amount: float) -> Dict[str, Any]:
+        return self.call(user_id, "portfolio_manager", "sell_currency",
+                         user_id, currency_code, amount)
+
+    def get_trade_history(self, user_id: int, limit: int = 20,
+                          before: Optional[int] = None) -> Dict[str, Any]:
+        return self.call(user_id, "portfolio_manager", "get_trade_history",
+                         user_id, limit, before)
+
+    def get_cost_basis(self, user_id: int) -> Dict[str, Dict[str, Any]]:
+        return self.call(user_id, "portfolio_manager", "get_cost_basis", user_id)
+
+    def book_summary(self, base: str = "USD") -> Dict[str, Any]:
+        """
+        сводка по всей книге: балансы собираются со всех разделов,
+        стоимость считается по одной версии общих курсов
+        """
+        parts = self.scatter("node", "book_summary")
+        balances: Dict[str, float] = defaultdict(float)
+        for part in parts:
+            for code, balance in part["balances"].items():
+                balances[code] += balance
+
+        with self.rate_service.snapshot():
+            rates = {code: self.rate_service.get_rate(code, base) for code in balances}
+
+        def value(part_balances: Dict[str, float]) -> float:
+            return sum(balance * rates[code] for code, balance in part_balances.items()
+                       if rates.get(code))
+
+        return {
+            "base": base,
+            "users": sum(part["users"] for part in parts),
+            "portfolios": sum(part["portfolios"] for part in parts),
+            "balances": dict(balances),
+            "value": value(balances),
+            "partitions": [{"users": part["users"], "portfolios": part["portfolios"],
+                            "value": value(part["balances"])} for part in parts],
+            "missing_rates": sorted(code for code, rate in rates.items() if not rate),
+        }
+
+
+def _move_users(nodes: List[PartitionNode], count: int) -> int:
+    """копирует каждого пользователя в его раздел при count разделах"""
+    moved = 0
+    for index, node in enumerate(nodes):
+        targets: Dict[int, List[int]] = defaultdict(list)
+        for user_id in node.user_ids():
+            owner = jump_hash(user_id, count)
+            if owner != index:
+                targets[owner].append(user_id)
+        for owner, user_ids in targets.items():
+            moved += nodes[owner].import_users(node.export_users(user_ids))
+    return moved
+
+
+def _drop_foreign_users(nodes: List[PartitionNode], count: int) -> int:
+    dropped = 0
+    for index, node in enumerate(nodes):
+        dropped += node.drop_users(
+            [user_id for user_id in node.user_ids()
+             if jump_hash(user_id, count) != index]
+        )
+    return dropped
+
+
+def _retire_root_files(data_dir: str):
+    """переносит корневые файлы пользователей в partitions/retired"""
+    retired = os.path.join(str(data_dir), PARTITIONS_DIR, RETIRED_DIR)
+    os.makedirs(retired, exist_ok=True)
+    for name in _ROOT_USER_FILES:
+        path = os.path.join(str(data_dir), name)
+        if os.path.exists(path):
+            os.replace(path, os.path.join(retired, name))
+
+
+def init_partitions(data_dir: str, count: int) -> Dict[str, Any]:
+    """
+    раскладывает пользователей, портфели и сделки корневого каталога по count
+    разделам; после записи раскладки корневые файлы убираются в
+    partitions/retired, чтобы их больше никто не читал и не менял
+    """
+    if load_layout(data_dir):
+        raise ValueError("Partitions already initialized, use 'partitions add' to grow")
+    if count < 1:
+        raise ValueError("Partition count must be positive")
+
+    root = PartitionNode(data_dir, data_dir)
+    user_ids = root.user_ids()
+    payload = root.export_users(user_ids)
+    nodes = [PartitionNode(partition_dir(data_dir, index), data_dir)
+             for index in range(count)]
+    by_owner: Dict[int, set] = defaultdict(set)
+    for user_id in user_ids:
+        by_owner[jump_hash(user_id, count)].add(user_id)
+    for index, owned in by_owner.items():
+        nodes[index].import_users({
+            name: [record for record in records if record["user_id"] in owned]
+            for name, records in payload.items()
+        })
+
+    with root.data_manager.unit_of_work():
+        root.data_manager.save_json(PARTITIONS_FILE, {
+            "count": count,
+            "next_user_id": max(user_ids, default=0) + 1,
+        })
+        # раскладка должна быть на диске раньше, чем исчезнут корневые файлы
+        root.data_manager.commit()
+    _retire_root_files(data_dir)
+    return {"partitions": count, "moved": len(user_ids),
+            "users": [len(node.user_ids()) for node in nodes]}
+
+
+def add_partitions(data_dir: str, count: int) -> Dict[str, Any]:
+    """
+    увеличивает число разделов до count: пользователи сначала копируются
+    в новых владельцев, затем раскладка переключается и копии в старых
+    разделах удаляются; повторный запуск с тем же count доделывает перенос.
+    Воркеры разделов на время переноса должны быть остановлены
+    """
+    layout = load_layout(data_dir)
+    if not layout:
+        raise ValueError("Partitions are not initialized, run 'partitions init' first")
+    if count < layout["count"]:
+        raise ValueError(f"Partition count can only grow (now {layout['count']})")
+
+    nodes = [PartitionNode(partition_dir(data_dir, index), data_dir)
+             for index in range(count)]
+    moved = _move_users(nodes, count)
+
+    data_manager = DataManager(data_dir)
+    with data_manager.unit_of_work():
+        data_manager.save_json(PARTITIONS_FILE, {**layout, "count": count})
+        data_manager.commit()
+    dropped = _drop_foreign_users(nodes, count)
+    return {"partitions": count, "moved": moved, "dropped": dropped,
+            "users": [len(node.user_ids()) for node in nodes]}
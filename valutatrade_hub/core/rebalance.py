@@ -0,0 +1,204 @@
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .exceptions import CurrencyNotFoundError, InsufficientFundsError
+
+
+def parse_targets(spec: str) -> Dict[str, float]:
+    """
+    целевые доли вида "BTC:60,USD:40" или "60% BTC / 40% USD" (проценты
+    или доли); возвращает доли, нормированные к 1
+    """
+    targets: Dict[str, float] = {}
+    for part in spec.replace("/", ",").split(","):
+        if not part.strip():
+            continue
+        words = part.split()
+        if len(words) == 2 and ":" not in part and "=" not in part:
+            part = f"{words[1]}:{words[0]}"
+        code, sep, weight = part.replace("=", ":").partition(":")
+        code = code.strip().upper()
+        try:
+            value = float(weight.strip().rstrip("%")) if sep else None
+        except ValueError:
+            value = None
+        if not code or value is None or value < 0:
+            raise ValueError(
+                f"Invalid target '{part.strip()}', expected e.g. BTC:60,USD:40")
+        if code in targets:
+            raise ValueError(f"Duplicate target currency '{code}'")
+        targets[code] = value
+
+    total = sum(targets.values())
+    if not targets or total <= 0:
+        raise ValueError("Target weights must not be empty")
+    # 60,40 и 0.6,0.4 — одно и то же, остальные суммы считаем ошибкой
+    if not (abs(total - 100.0) < 1e-6 or abs(total - 1.0) < 1e-9):
+        raise ValueError(f"Target weights must sum to 100% (got {total:g})")
+    return {code: value / total for code, value in targets.items()}
+
+
+def compute_rebalance(balances: np.ndarray, prices: np.ndarray, weights: np.ndarray,
+                      min_trade: float = 0.0,
+                      cash_index: Optional[int] = None) -> np.ndarray:
+    """
+    изменения балансов (пользователи × валюты) до целевых долей одним проходом:
+    сделки дешевле min_trade (в базовой валюте) отбрасываются, а разницу
+    по стоимости забирает денежная колонка cash_index, если она задана
+    """
+    values = balances * prices
+    totals = values.sum(axis=1, keepdims=True)
+    target_values = totals * weights
+    deltas = target_values / prices - balances
+
+    trade_values = np.abs(deltas) * prices
+    small = trade_values < min_trade
+    if cash_index is not None:
+        small[:, cash_index] = False
+    deltas[small] = 0.0
+
+    if cash_index is not None:
+        others = np.ones(len(prices), dtype=bool)
+        others[cash_index] = False
+        other_value = (deltas[:, others] * prices[others]).sum(axis=1)
+        cash_delta = -other_value / prices[cash_index]
+        # денежная нога тоже не меньше порога, иначе у пользователя нет сделок
+        cash_delta[np.abs(cash_delta) * prices[cash_index] < min_trade] = 0.0
+        deltas[:, cash_index] = cash_delta
+
+    # продать можно не больше, чем есть (погрешность деления)
+    return np.maximum(deltas, -balances)
+
+
+class RebalancePlan:
+    """
+    план ребалансировки: матрица изменений балансов и список заявок,
+    которые можно просмотреть и исполнить через PortfolioManager
+    """
+
+    def __init__(self, user_ids: np.ndarray, currencies: List[str], deltas: np.ndarray,
+                 prices: np.ndarray, base: str, targets: Dict[str, float],
+                 planning_seconds: float):
+        self.user_ids = user_ids
+        self.currencies = currencies
+        self.deltas = deltas
+        self.prices = prices
+        self.base = base
+        self.targets = targets
+        self.planning_seconds = planning_seconds
+
+    @property
+    def order_count(self) -> int:
+        return int(np.count_nonzero(self.deltas))
+
+    @property
+    def users_affected(self) -> int:
+        return int(np.count_nonzero(np.any(self.deltas != 0, axis=1)))
+
+    @property
+    def turnover(self) -> float:
+        """суммарный объём сделок в базовой валюте"""
+        return float((np.abs(self.deltas) * self.prices).sum())
+
+    def iter_orders(self) -> Iterable[Dict[str, Any]]:
+        """заявки по пользователям: сначала продажи, затем покупки"""
+        rows, cols = np.nonzero(self.deltas)
+        amounts = self.deltas[rows, cols]
+        # сортировка: пользователь, продажи раньше покупок
+        order = np.lexsort((amounts > 0, rows))
+        for index in order:
+            row, col, amount = rows[index], cols[index], float(amounts[index])
+            yield {
+                "user_id": int(self.user_ids[row]),
+                "side": "buy" if amount > 0 else "sell",
+                "currency": self.currencies[col],
+                "amount": abs(amount),
+                "value": abs(amount) * float(self.prices[col]),
+            }
+
+
+class RebalancePlanner:
+    """ребалансировка портфелей к целевым долям для одного или всех пользователей"""
+
+    def __init__(self, data_manager, portfolio_manager, rate_service):
+        self.data_manager = data_manager
+        self.portfolio_manager = portfolio_manager
+        self.rate_service = rate_service
+
+    @staticmethod
+    def build_matrix(
+        portfolios: List[dict], currencies: Iterable[str]
+    ) -> Tuple[np.ndarray, List[str], np.ndarray]:
+        """записи portfolios.json -> (user_ids, валюты, матрица балансов)"""
+        columns = list(dict.fromkeys(currencies))
+        held = {code for portfolio in portfolios
+                for code in portfolio.get("wallets", {})}
+        columns += sorted(held - set(columns))
+        position = {code: index for index, code in enumerate(columns)}
+
+        user_ids = np.fromiter((p["user_id"] for p in portfolios), dtype=np.int64,
+                               count=len(portfolios))
+        balances = np.zeros((len(portfolios), len(columns)))
+        for row, portfolio in enumerate(portfolios):
+            for code, wallet in portfolio.get("wallets", {}).items():
+                balances[row, position[code]] = wallet["balance"]
+        return user_ids, columns, balances
+
+    def _prices(self, currencies: List[str], targets: Dict[str, float],
+                base: str) -> np.ndarray:
+        prices = np.full(len(currencies), np.nan)
+        for index, code in enumerate(currencies):
+            prices[index] = self.rate_service.get_rate(code, base) or np.nan
+        missing = [code for code, price in zip(currencies, prices)
+                   if code in targets and np.isnan(price)]
+        if missing:
+            raise ValueError(
+                f"No rate to {base} for target currencies: {', '.join(missing)}")
+        return prices
+
+    def plan(self, targets: Dict[str, float], base: str = "USD", min_trade: float = 0.0,
+             user_id: Optional[int] = None) -> RebalancePlan:
+        """
+        план для пользователя user_id или для всех портфелей; валюты вне целевых
+        долей продаются, валюты без курса не учитываются и не торгуются
+        """
+        if min_trade < 0:
+            raise ValueError("Minimum trade must be non-negative")
+        base = base.upper()
+        portfolios = self.data_manager.load_json("portfolios.json", [])
+        if user_id is not None:
+            portfolios = [p for p in portfolios if p["user_id"] == user_id]
+
+        user_ids, currencies, balances = self.build_matrix(portfolios, targets)
+        prices = self._prices(currencies, targets, base)
+
+        started = time.perf_counter()
+        priced = ~np.isnan(prices)
+        priced_codes = [code for code, ok in zip(currencies, priced) if ok]
+        weights = np.array([targets.get(code, 0.0) for code in priced_codes])
+        cash_index = priced_codes.index(base) if base in targets else None
+
+        deltas = np.zeros_like(balances)
+        deltas[:, priced] = compute_rebalance(
+            balances[:, priced], prices[priced], weights, min_trade, cash_index
+        )
+        planning_seconds = time.perf_counter() - started
+
+        return RebalancePlan(user_ids, currencies, deltas, np.nan_to_num(prices),
+                             base, targets, planning_seconds)
+
+    def execute(self, plan: RebalancePlan) -> Dict[str, Any]:
+        """исполняет заявки плана обычными buy/sell; ошибка не прерывает остальные"""
+        executed = 0
+        failed: List[Tuple[Dict[str, Any], str]] = []
+        for order in plan.iter_orders():
+            settle = (self.portfolio_manager.buy_currency if order["side"] == "buy"
+                      else self.portfolio_manager.sell_currency)
+            try:
+                settle(order["user_id"], order["currency"], order["amount"])
+                executed += 1
+            except (InsufficientFundsError, CurrencyNotFoundError, ValueError) as e:
+                failed.append((order, str(e)))
+        return {"executed": executed, "failed": failed}
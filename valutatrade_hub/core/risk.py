@@ -0,0 +1,205 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .analytics import RateHistory
+from .rebalance import RebalancePlanner
+
+SECONDS_PER_YEAR = 365 * 24 * 3600
+
+
+class RiskService:
+    """
+    исторический VaR, expected shortfall и годовая волатильность портфелей;
+    матрица доходностей и ковариаций строится один раз на версию истории
+    курсов и используется для всех пользователей
+    """
+
+    # элементов (портфели × шаги) в одном блоке прохода по книге: блок в пару
+    # мегабайт переиспользует память, а не выделяет сотни мегабайт заново
+    _CHUNK_ELEMENTS = 1_000_000
+
+    def __init__(self, history: RateHistory, data_manager, rate_service):
+        self.history = history
+        self.data_manager = data_manager
+        self.rate_service = rate_service
+        self._cache: Dict[Tuple[int, int], Dict[str, Any]] = {}
+
+    def get_model(self, interval_seconds: int = 3600,
+                  lookback_days: int = 30) -> Dict[str, Any]:
+        """
+        доходности к USD на равномерной сетке (последний известный курс на шаг)
+        по общему для всех валют окну и их ковариационная матрица
+        """
+        if interval_seconds <= 0 or lookback_days <= 0:
+            raise ValueError("Interval and lookback must be positive")
+        if self.history.refresh():
+            self._cache.clear()
+
+        key = (interval_seconds, lookback_days)
+        if key in self._cache:
+            return self._cache[key]
+
+        step = np.timedelta64(interval_seconds, "s")
+        series = {}
+        for pair in self.history.pairs():
+            from_currency, _, to_currency = pair.partition("_")
+            if to_currency == "USD" and from_currency != "USD":
+                series[from_currency] = self.history.get_series(pair)
+        if not series:
+            raise ValueError("No rate history to build returns from")
+
+        end = max(timestamps[-1] for timestamps, _ in series.values())
+        start = max(max(timestamps[0] for timestamps, _ in series.values()),
+                    end - np.timedelta64(lookback_days, "D"))
+        grid = np.arange(end, start - np.timedelta64(1, "us"), -step)[::-1]
+        if len(grid) < 3:
+            raise ValueError(
+                f"Not enough common history for risk: {len(grid)} points "
+                f"at {interval_seconds} s interval"
+            )
+
+        currencies = sorted(series)
+        prices = np.column_stack([
+            self.history.rates_at(f"{code}_USD", grid) for code in currencies
+        ])
+        returns = prices[1:] / prices[:-1] - 1.0
+
+        model = {
+            "currencies": currencies,
+            "timestamps": grid[1:],
+            "returns": returns,
+            "covariance": np.atleast_2d(np.cov(returns, rowvar=False)),
+            "interval_seconds": interval_seconds,
+            "periods_per_year": SECONDS_PER_YEAR / interval_seconds,
+        }
+        self._cache[key] = model
+        return model
+
+    def _position_values(
+        self, portfolios: List[dict], model: Dict[str, Any]
+    ) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+        """(user_ids, стоимости позиций в USD по валютам модели, валюты без истории)"""
+        user_ids, columns, balances = RebalancePlanner.build_matrix(
+            portfolios, model["currencies"]
+        )
+        prices = np.array([self.rate_service.get_rate(code, "USD") or 0.0
+                           for code in columns])
+        values = balances * prices
+        modeled = len(model["currencies"])
+        # USD — деньги без риска, остальные валюты без истории в риск не входят
+        unmodeled = [code for code, column
+                     in zip(columns[modeled:], balances[:, modeled:].T)
+                     if code != "USD" and np.any(column)]
+        return user_ids, values, unmodeled
+
+    @staticmethod
+    def _tail_metrics(pnl: np.ndarray,
+                      confidence: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        VaR и expected shortfall по строкам сценариев P&L (портфели × шаги);
+        квантиль — линейная интерполяция, как np.quantile, но через сортировку
+        строк, которая на порядок быстрее квантиля по оси
+        """
+        pnl.sort(axis=1)
+        position = (1.0 - confidence) * (pnl.shape[1] - 1)
+        low = int(position)
+        high = min(low + 1, pnl.shape[1] - 1)
+        threshold = pnl[:, low] + (position - low) * (pnl[:, high] - pnl[:, low])
+        # хвост — сценарии не лучше порога, после сортировки это первые low + 1
+        shortfall = pnl[:, :low + 1].mean(axis=1)
+        return -threshold + 0.0, -shortfall + 0.0
+
+    def book_risk(self, confidence: float = 0.95, interval_seconds: int = 3600,
+                  lookback_days: int = 30,
+                  user_id: Optional[int] = None) -> Dict[str, Any]:
+        """
+        риск всех портфелей (или одного): сценарии P&L = доходности × позиции
+        одним матричным умножением, волатильность — через ковариационную матрицу
+        """
+        if not 0.5 <= confidence < 1.0:
+            raise ValueError("Confidence must be in [0.5, 1)")
+
+        model = self.get_model(interval_seconds, lookback_days)
+        portfolios = self.data_manager.load_json("portfolios.json", [])
+        if user_id is not None:
+            portfolios = [p for p in portfolios if p["user_id"] == user_id]
+        user_ids, values, unmodeled = self._position_values(portfolios, model)
+
+        modeled = len(model["currencies"])
+        exposure = values[:, :modeled]
+        returns = model["returns"]
+        covariance = model["covariance"]
+
+        var = np.empty(len(user_ids))
+        shortfall = np.empty(len(user_ids))
+        chunk = max(1, self._CHUNK_ELEMENTS // max(len(returns), 1))
+        for begin in range(0, len(user_ids), chunk):
+            part = slice(begin, begin + chunk)
+            var[part], shortfall[part] = self._tail_metrics(
+                exposure[part] @ returns.T, confidence
+            )
+
+        variance = np.einsum("uc,cd,ud->u", exposure, covariance, exposure)
+        volatility = np.sqrt(np.maximum(variance, 0.0) * model["periods_per_year"])
+        # вся книга как один портфель: риски пользователей не складываются
+        total = exposure.sum(axis=0)
+        total_var, total_shortfall = self._tail_metrics(
+            (returns @ total)[None, :], confidence)
+
+        return {
+            "user_ids": user_ids,
+            "value": values.sum(axis=1),
+            "exposure": exposure,
+            "var": var,
+            "expected_shortfall": shortfall,
+            "volatility_annual": volatility,
+            "book": {
+                "value": float(values.sum()),
+                "var": float(total_var[0]),
+                "expected_shortfall": float(total_shortfall[0]),
+                "volatility_annual": float(np.sqrt(
+                    max(total @ covariance @ total, 0.0) * model["periods_per_year"]
+                )),
+            },
+            "currencies": model["currencies"],
+            "unmodeled": unmodeled,
+            "confidence": confidence,
+            "observations": len(returns),
+            "interval_seconds": interval_seconds,
+            "start": model["timestamps"][0].item(),
+            "end": model["timestamps"][-1].item(),
+        }
+
+    def portfolio_risk(self, user_id: int, confidence: float = 0.95,
+                       interval_seconds: int = 3600,
+                       lookback_days: int = 30) -> Dict[str, Any]:
+        """риск одного портфеля с вкладом каждой валюты в волатильность"""
+        book = self.book_risk(confidence, interval_seconds, lookback_days, user_id)
+        if not len(book["user_ids"]):
+            raise ValueError(f"Portfolio for user {user_id} not found")
+
+        exposure = book["exposure"][0]
+        covariance = self.get_model(interval_seconds, lookback_days)["covariance"]
+        sigma = float(np.sqrt(max(exposure @ covariance @ exposure, 0.0)))
+        marginal = covariance @ exposure / sigma if sigma else np.zeros_like(exposure)
+        shares = exposure * marginal / sigma if sigma else np.zeros_like(exposure)
+
+        contributions = {
+            code: {"exposure": float(exposure[i]), "volatility_share": float(shares[i])}
+            for i, code in enumerate(book["currencies"]) if exposure[i]
+        }
+        return {
+            "user_id": user_id,
+            "value": float(book["value"][0]),
+            "var": float(book["var"][0]),
+            "expected_shortfall": float(book["expected_shortfall"][0]),
+            "volatility_annual": float(book["volatility_annual"][0]),
+            "contributions": contributions,
+            "unmodeled": book["unmodeled"],
+            "confidence": confidence,
+            "observations": book["observations"],
+            "interval_seconds": interval_seconds,
+            "start": book["start"],
+            "end": book["end"],
+        }
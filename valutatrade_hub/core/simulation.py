@@ -0,0 +1,191 @@
+import copy
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from .ledger import TradeLedger
+from .models import Portfolio
+from .usecases import PortfolioManager
+from .utils import DataManager, ExchangeRateService
+
+
+class _TradeBuffer:
+    """сделки повтора в памяти: в журнал они попадают после записи портфелей"""
+
+    def __init__(self):
+        self.trades: List[Dict[str, Any]] = []
+
+    def record(self, user_id: int, side: str, currency_code: str, amount: float,
+               rate: Optional[float], balance: float,
+               base_currency: str = "USD") -> Dict[str, Any]:
+        trade = {
+            "trade_id": None,
+            "user_id": user_id,
+            "side": side,
+            "pair": f"{currency_code}_{base_currency}",
+            "amount": amount,
+            "rate": rate,
+            "timestamp": datetime.now().isoformat(),
+            "balance": balance
+        }
+        self.trades.append(trade)
+        return trade
+
+
+class SimulationSession:
+    """
+    what-if сессия с копированием при записи: портфель копируется в оверлей
+    при первом изменении, остальные читаются из portfolios.json как есть;
+    сделки копятся в сессии и не попадают в журнал до фиксации
+    """
+
+    def __init__(self, data_manager: DataManager):
+        self.data_manager = data_manager
+        self.started_at = datetime.now()
+        # user_id -> портфель в сессии (только изменённые)
+        self.portfolios: Dict[int, dict] = {}
+        # user_id -> базовая версия портфеля на момент копирования
+        self._originals: Dict[int, Optional[dict]] = {}
+        self.trades: List[Dict[str, Any]] = []
+
+    def base_portfolio(self, user_id: int) -> Optional[dict]:
+        """портфель из реальных данных"""
+        for portfolio_data in self.data_manager.load_json("portfolios.json", []):
+            if portfolio_data["user_id"] == user_id:
+                return portfolio_data
+        return None
+
+    def load(self, user_id: int) -> Optional[dict]:
+        """портфель из оверлея, а если он в сессии не менялся — из реальных данных"""
+        if user_id in self.portfolios:
+            return self.portfolios[user_id]
+        return self.base_portfolio(user_id)
+
+    def store(self, portfolio: Portfolio):
+        """записывает портфель в оверлей; реальные данные не меняются"""
+        if portfolio.user_id not in self._originals:
+            self._originals[portfolio.user_id] = copy.deepcopy(
+                self.base_portfolio(portfolio.user_id)
+            )
+        self.portfolios[portfolio.user_id] = portfolio.to_dict()
+
+    def record(self, user_id: int, side: str, currency_code: str, amount: float,
+               rate: Optional[float], balance: float,
+               base_currency: str = "USD") -> Dict[str, Any]:
+        """сделка сессии (тот же интерфейс, что у TradeLedger.record)"""
+        trade = {
+            "trade_id": f"sim-{len(self.trades) + 1}",
+            "user_id": user_id,
+            "side": side,
+            "pair": f"{currency_code}_{base_currency}",
+            "currency": currency_code,
+            "amount": amount,
+            "rate": rate,
+            "timestamp": datetime.now().isoformat(),
+            "balance": balance
+        }
+        self.trades.append(trade)
+        return trade
+
+    def conflicts(self) -> List[int]:
+        """пользователи, чьи реальные портфели изменились после копирования в сессию"""
+        if not self._originals:
+            return []
+        portfolios = self.data_manager.load_json("portfolios.json", [])
+        current = {portfolio_data["user_id"]: portfolio_data
+                   for portfolio_data in portfolios}
+        return [user_id for user_id, original in self._originals.items()
+                if current.get(user_id) != original]
+
+    def discard(self):
+        """отбрасывает все изменения сессии"""
+        self.portfolios.clear()
+        self._originals.clear()
+        self.trades.clear()
+
+    def commit(self, portfolio_manager: PortfolioManager) -> int:
+        """
+        применяет сессию: сделки повторяются по реальным портфелям в одном
+        unit of work, portfolios.json записывается один раз, а сделки
+        дописываются в журнал только после успешной записи портфелей;
+        если реальные портфели успели измениться, ничего не применяется
+        """
+        conflicts = self.conflicts()
+        if conflicts:
+            raise ValueError(
+                "Portfolios changed outside the simulation for users: "
+                + ", ".join(str(user_id) for user_id in conflicts)
+            )
+
+        buffer = _TradeBuffer()
+        replay = PortfolioManager(
+            self.data_manager, portfolio_manager.rate_service, buffer)
+        try:
+            with self.data_manager.unit_of_work():
+                for trade in self.trades:
+                    settle = (replay.buy_currency if trade["side"] == "buy"
+                              else replay.sell_currency)
+                    settle(trade["user_id"], trade["currency"], trade["amount"])
+            # внутри команды CLI unit of work вложенный — записываем портфели сразу
+            self.data_manager.commit()
+        except Exception:
+            # и откатываем явно: ни портфели, ни журнал не изменились
+            self.data_manager.rollback()
+            raise
+        portfolio_manager.ledger.import_trades(buffer.trades)
+
+        applied = len(self.trades)
+        self.discard()
+        return applied
+
+
+class SimulatedPortfolioManager(PortfolioManager):
+    """
+    PortfolioManager поверх сессии симуляции: те же проверки и расчёты,
+    но портфели читаются и пишутся через оверлей, а сделки — в сессию
+    """
+
+    def __init__(self, data_manager: DataManager, rate_service: ExchangeRateService,
+                 session: SimulationSession, ledger: TradeLedger):
+        # сделки пишутся в сессию, история читается из общего журнала
+        super().__init__(data_manager, rate_service, session)
+        self.session = session
+        self.base_ledger = ledger
+
+    def get_user_portfolio(self, user_id: int) -> Portfolio:
+        portfolio_data = self.session.load(user_id)
+        if portfolio_data is not None:
+            return Portfolio.from_dict(portfolio_data)
+
+        portfolio = Portfolio(user_id)
+        self._save_portfolio(portfolio)
+        return portfolio
+
+    def buy_currency(self, user_id: int, currency_code: str,
+                     amount: float) -> Dict[str, Any]:
+        """покупка в симуляции (без записи в журнал действий)"""
+        return PortfolioManager.buy_currency.__wrapped__(
+            self, user_id, currency_code, amount)
+
+    def sell_currency(self, user_id: int, currency_code: str,
+                      amount: float) -> Dict[str, Any]:
+        """продажа в симуляции (без записи в журнал действий)"""
+        return PortfolioManager.sell_currency.__wrapped__(
+            self, user_id, currency_code, amount)
+
+    def _record_trade(self, result: Dict[str, Any], user_id: int, side: str,
+                      currency_code: str, amount: float, rate: Optional[float],
+                      balance: float):
+        # портфели сессии живут в оверлее, а не в unit of work — сделка сразу
+        trade = self.session.record(user_id, side, currency_code, amount, rate,
+                                    balance)
+        result["trade_id"] = trade["trade_id"]
+
+    def get_trade_history(self, user_id: int, limit: int = 20,
+                          before: Optional[int] = None) -> Dict[str, Any]:
+        return self.base_ledger.get_history(user_id, limit, before)
+
+    def get_cost_basis(self, user_id: int) -> Dict[str, Dict[str, Any]]:
+        return self.base_ledger.get_cost_basis(user_id)
+
+    def _save_portfolio(self, portfolio: Portfolio):
+        self.session.store(portfolio)
@@ -0,0 +1,353 @@
+import csv
+import gzip
+import io
+import json
+import os
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from ..infra.serializers import iter_json_array
+from .utils import DataManager, validate_currency_code
+
+CSV_FIELDS = {
+    "users": ["user_id", "username", "hashed_password", "salt", "registration_date"],
+    "portfolios": ["user_id", "currency_code", "balance"],
+    "history": ["from_currency", "to_currency", "rate", "timestamp", "source"],
+}
+DATASETS = tuple(CSV_FIELDS)
+FORMATS = ("csv", "jsonl")
+
+def detect_format(path: str, fmt: Optional[str] = None) -> Tuple[str, bool]:
+    """(формат, gzip) по явному формату или расширению файла"""
+    compress = path.endswith(".gz")
+    name = path[:-3] if compress else path
+    if fmt is None:
+        if name.endswith(".csv"):
+            fmt = "csv"
+        elif name.endswith((".jsonl", ".ndjson")):
+            fmt = "jsonl"
+        else:
+            raise ValueError(
+                f"Cannot detect format of '{path}', use --format csv|jsonl")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}', expected one of {FORMATS}")
+    return fmt, compress
+
+
+class _ProgressFile:
+    """состояние длинной операции рядом с файлом данных для продолжения после сбоя"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> Optional[dict]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def save(self, state: dict):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class _RecordWriter:
+    """
+    запись CSV/JSONL (опционально gzip) с точками сохранения: после checkpoint()
+    файл до offset корректен и его можно дописывать с этого места
+    """
+
+    def __init__(self, path: str, fmt: str, compress: bool, fields: List[str],
+                 offset: Optional[int] = None):
+        self.fmt = fmt
+        self.compress = compress
+        self.fields = fields
+        self._raw = open(path, 'r+b' if offset else 'wb')
+        if offset:
+            self._raw.truncate(offset)
+            self._raw.seek(offset)
+        self._open_text()
+        if fmt == "csv" and not offset:
+            self._csv.writeheader()
+
+    def _open_text(self):
+        stream = (gzip.GzipFile(fileobj=self._raw, mode='wb') if self.compress
+                  else self._raw)
+        self._text = io.TextIOWrapper(stream, encoding='utf-8', newline='',
+                                      write_through=False)
+        self._csv = csv.DictWriter(self._text, fieldnames=self.fields,
+                                   extrasaction='ignore')
+
+    def write(self, record: dict):
+        if self.fmt == "csv":
+            self._csv.writerow(record)
+        else:
+            self._text.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def _close_text(self):
+        self._text.flush()
+        if self.compress:
+            # закрываем gzip-член; следующий член допишется в тот же файл
+            self._text.detach().close()
+        else:
+            self._text.detach()
+
+    def checkpoint(self) -> int:
+        """сбрасывает буферы на диск; возвращает безопасное смещение в файле"""
+        self._close_text()
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+        offset = self._raw.tell()
+        self._open_text()
+        return offset
+
+    def close(self) -> int:
+        self._close_text()
+        self._raw.flush()
+        offset = self._raw.tell()
+        self._raw.close()
+        return offset
+
+
+def iter_file_records(path: str, fmt: str, compress: bool) -> Iterator[dict]:
+    """записи CSV/JSONL-файла по одной"""
+    opener = gzip.open if compress else open
+    with opener(path, 'rt', encoding='utf-8', newline='') as f:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _validate_user(record: dict) -> dict:
+    username = str(record.get("username") or "").strip()
+    if not username:
+        raise ValueError("Username cannot be empty")
+    for field in ("hashed_password", "salt"):
+        if not record.get(field):
+            raise ValueError(f"Field '{field}' is required")
+    registration_date = datetime.fromisoformat(str(record["registration_date"]))
+    return {
+        "user_id": int(record["user_id"]),
+        "username": username,
+        "hashed_password": str(record["hashed_password"]),
+        "salt": str(record["salt"]),
+        "registration_date": registration_date.isoformat()
+    }
+
+
+def _validate_wallet(record: dict) -> dict:
+    currency_code = str(record.get("currency_code") or "").upper()
+    if not validate_currency_code(currency_code):
+        raise ValueError(f"Invalid currency code '{currency_code}'")
+    balance = float(record["balance"])
+    if balance < 0:
+        raise ValueError("Balance cannot be negative")
+    return {"user_id": int(record["user_id"]), "currency_code": currency_code,
+            "balance": balance}
+
+
+def _validate_rate(record: dict) -> dict:
+    from_currency = str(record.get("from_currency") or "").upper()
+    to_currency = str(record.get("to_currency") or "").upper()
+    for code in (from_currency, to_currency):
+        if not validate_currency_code(code):
+            raise ValueError(f"Invalid currency code '{code}'")
+    rate = float(record["rate"])
+    if rate <= 0:
+        raise ValueError("Rate must be positive")
+    timestamp = datetime.fromisoformat(str(record["timestamp"]))
+    if timestamp.tzinfo is not None:
+        # история хранит локальное время без часового пояса
+        timestamp = timestamp.astimezone().replace(tzinfo=None)
+    return {"from_currency": from_currency, "to_currency": to_currency, "rate": rate,
+            "timestamp": timestamp.isoformat(), "source": record.get("source") or None}
+
+
+_VALIDATORS: Dict[str, Callable[[dict], dict]] = {
+    "users": _validate_user,
+    "portfolios": _validate_wallet,
+    "history": _validate_rate,
+}
+
+
+class BulkTransferService:
+    """потоковый экспорт и импорт пользователей, портфелей и истории курсов"""
+
+    CHECKPOINT_EVERY = 10000
+    MAX_REPORTED_ERRORS = 5
+
+    def __init__(self, data_manager: DataManager, rates_storage):
+        self.data_manager = data_manager
+        self.rates_storage = rates_storage
+
+    def _source(self, dataset: str) -> Iterator[dict]:
+        data_dir = self.data_manager.data_dir
+        if dataset == "users":
+            yield from iter_json_array(os.path.join(data_dir, "users.json"))
+        elif dataset == "portfolios":
+            for portfolio in iter_json_array(os.path.join(data_dir, "portfolios.json")):
+                for wallet in portfolio["wallets"].values():
+                    yield {"user_id": portfolio["user_id"], **wallet}
+        elif dataset == "history":
+            yield from self.rates_storage.archive.iter_records()
+            yield from iter_json_array(self.rates_storage.config.HISTORY_FILE_PATH)
+        else:
+            raise ValueError(f"Unknown dataset '{dataset}', expected one of {DATASETS}")
+
+    def export(self, dataset: str, path: str, fmt: Optional[str] = None,
+               resume: bool = False) -> Dict[str, Any]:
+        """выгружает набор данных в CSV/JSONL; resume продолжает прерванную выгрузку"""
+        fmt, compress = detect_format(path, fmt)
+        progress = _ProgressFile(f"{path}.progress")
+        state = progress.load() if resume else None
+        if state and (state["dataset"], state["format"]) != (dataset, fmt):
+            raise ValueError(f"Progress file belongs to a '{state['dataset']}' export")
+
+        skip = state["records"] if state else 0
+        source = self._source(dataset)
+        for _ in range(skip):
+            next(source, None)
+
+        writer = _RecordWriter(path, fmt, compress, CSV_FIELDS[dataset],
+                               state["offset"] if state else None)
+        written = skip
+        try:
+            for record in source:
+                writer.write(record)
+                written += 1
+                if written % self.CHECKPOINT_EVERY == 0:
+                    offset = writer.checkpoint()
+                    progress.save({"dataset": dataset, "format": fmt,
+                                   "records": written, "offset": offset})
+        finally:
+            size = writer.close()
+
+        progress.clear()
+        return {"records": written, "resumed_from": skip, "bytes": size}
+
+    def import_(self, dataset: str, path: str, fmt: Optional[str] = None,
+                batch_size: int = 1000, resume: bool = False) -> Dict[str, Any]:
+        """загружает CSV/JSONL с проверкой записей, фиксируя изменения пачками"""
+        if dataset not in _VALIDATORS:
+            raise ValueError(f"Unknown dataset '{dataset}', expected one of {DATASETS}")
+        if batch_size <= 0:
+            raise ValueError("Batch size must be positive")
+        if not os.path.exists(path):
+            raise ValueError(f"File '{path}' not found")
+
+        fmt, compress = detect_format(path, fmt)
+        progress = _ProgressFile(f"{path}.import-progress")
+        state = progress.load() if resume else None
+        if state and state["dataset"] != dataset:
+            raise ValueError(f"Progress file belongs to a '{state['dataset']}' import")
+
+        skip = state["records"] if state else 0
+        validate = _VALIDATORS[dataset]
+        commit = getattr(self, f"_commit_{dataset}")
+        result = {"records": skip, "imported": 0, "invalid": 0, "errors": [],
+                  "resumed_from": skip}
+        batch: List[Tuple[int, dict]] = []
+        if dataset == "history":
+            self.rates_storage.begin_history_import(resume=state is not None)
+
+        def reject(number: int, error: str):
+            result["invalid"] += 1
+            if len(result["errors"]) < self.MAX_REPORTED_ERRORS:
+                result["errors"].append(f"record {number}: {error}")
+
+        def flush():
+            if batch:
+                rejected = commit([record for _, record in batch])
+                for index, error in rejected:
+                    reject(batch[index][0], error)
+                result["imported"] += len(batch) - len(rejected)
+                batch.clear()
+            progress.save({"dataset": dataset, "records": result["records"]})
+
+        for number, record in enumerate(iter_file_records(path, fmt, compress), 1):
+            if number <= skip:
+                continue
+            result["records"] = number
+            try:
+                batch.append((number, validate(record)))
+            except (KeyError, TypeError, ValueError) as e:
+                reject(number, str(e))
+            if len(batch) >= batch_size:
+                flush()
+
+        flush()
+        if dataset == "history":
+            self.rates_storage.finish_history_import()
+        progress.clear()
+        return result
+
+    # _commit_<dataset>(batch) -> [(индекс в пачке, ошибка)] для отклонённых записей
+
+    def _commit_users(self, batch: List[dict]) -> List[Tuple[int, str]]:
+        users = self.data_manager.load_json("users.json", [])
+        by_id = {user["user_id"]: i for i, user in enumerate(users)}
+        owners = {user["username"]: user["user_id"] for user in users}
+        portfolios = self.data_manager.load_json("portfolios.json", [])
+        with_portfolio = {portfolio["user_id"] for portfolio in portfolios}
+
+        rejected = []
+        for index, user in enumerate(batch):
+            owner = owners.get(user["username"])
+            if owner is not None and owner != user["user_id"]:
+                rejected.append((
+                    index,
+                    f"Username '{user['username']}' already belongs to user {owner}"
+                ))
+                continue
+            if user["user_id"] in by_id:
+                users[by_id[user["user_id"]]] = user
+            else:
+                by_id[user["user_id"]] = len(users)
+                users.append(user)
+            owners[user["username"]] = user["user_id"]
+            if user["user_id"] not in with_portfolio:
+                portfolios.append({"user_id": user["user_id"], "wallets": {}})
+                with_portfolio.add(user["user_id"])
+
+        self.data_manager.save_json("users.json", users)
+        self.data_manager.save_json("portfolios.json", portfolios)
+        self.data_manager.commit()
+        return rejected
+
+    def _commit_portfolios(self, batch: List[dict]) -> List[Tuple[int, str]]:
+        users = self.data_manager.load_json("users.json", [])
+        known_users = {user["user_id"] for user in users}
+        portfolios = self.data_manager.load_json("portfolios.json", [])
+        by_user = {portfolio["user_id"]: portfolio for portfolio in portfolios}
+        rejected = []
+        for index, wallet in enumerate(batch):
+            if wallet["user_id"] not in known_users:
+                rejected.append((index, f"User {wallet['user_id']} not found"))
+                continue
+            portfolio = by_user.get(wallet["user_id"])
+            if portfolio is None:
+                portfolio = {"user_id": wallet["user_id"], "wallets": {}}
+                by_user[wallet["user_id"]] = portfolio
+                portfolios.append(portfolio)
+            portfolio["wallets"][wallet["currency_code"]] = {
+                "currency_code": wallet["currency_code"],
+                "balance": wallet["balance"]
+            }
+
+        self.data_manager.save_json("portfolios.json", portfolios)
+        self.data_manager.commit()
+        return rejected
+
+    def _commit_history(self, batch: List[dict]) -> List[Tuple[int, str]]:
+        self.rates_storage.stage_historical_records(batch)
+        return []
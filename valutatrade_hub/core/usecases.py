@@ -1,12 +1,17 @@
+import bisect
+import heapq
+import logging
+import math
 import secrets
 from datetime import datetime
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from ..decorators import log_action
 from .currencies import get_currency
 from .exceptions import CurrencyNotFoundError, InsufficientFundsError
-from .models import Portfolio, User
-from .utils import DataManager, ExchangeRateService, validate_amount
+from .ledger import TradeLedger
+from .models import LimitOrder, Portfolio, PriceAlert, User
+from .utils import DataManager, ExchangeRateService, resolve_rate, validate_amount
 
 
 class UserManager:
@@ -15,8 +20,9 @@ class UserManager:
         self.current_user: Optional[User] = None
 
     @log_action("REGISTER")
-    def register_user(self, username: str, password: str) -> User:
-        """регистрация пользователя"""
+    def register_user(self, username: str, password: str,
+                      user_id: Optional[int] = None) -> User:
+        """регистрация пользователя (user_id задаёт роутер разделов)"""
         if not username or not username.strip():
             raise ValueError("Username cannot be empty")
         
@@ -27,7 +33,8 @@ class UserManager:
         if any(user["username"] == username for user in users_data):
             raise ValueError(f"Username '{username}' already exists")
         
-        user_id = self.data_manager.get_next_user_id()
+        if user_id is None:
+            user_id = self.data_manager.get_next_user_id()
         salt = secrets.token_hex(8)
         hashed_password = self._hash_password(password, salt)
         registration_date = datetime.now()
@@ -77,9 +84,14 @@ class UserManager:
 
 
 class PortfolioManager:
-    def __init__(self, data_manager: DataManager, rate_service: ExchangeRateService):
+    def __init__(self, data_manager: DataManager, rate_service: ExchangeRateService,
+                 ledger=None):
         self.data_manager = data_manager
         self.rate_service = rate_service
+        # ledger — любой объект с record(...) (журнал, сессия симуляции, буфер)
+        if ledger is None:
+            ledger = TradeLedger(data_manager.data_dir)
+        self.ledger = ledger
 
     def get_user_portfolio(self, user_id: int) -> Portfolio:
         """получает портфель пользователя"""
@@ -124,8 +136,9 @@ class PortfolioManager:
         except CurrencyNotFoundError:
             rate = None
             estimated_cost = None
-        
-        return {
+
+        result = {
+            "trade_id": None,
             "currency": currency_code,
             "amount": amount,
             "rate": rate,
@@ -133,6 +146,9 @@ class PortfolioManager:
             "old_balance": old_balance,
             "new_balance": wallet.balance
         }
+        self._record_trade(result, user_id, "buy", currency_code, amount, rate,
+                           wallet.balance)
+        return result
 
     @log_action("SELL", verbose=True)
     def sell_currency(self, user_id: int, currency_code: str, amount: float) -> Dict[str, Any]:
@@ -169,8 +185,9 @@ class PortfolioManager:
         except CurrencyNotFoundError:
             rate = None
             estimated_revenue = None
-        
-        return {
+
+        result = {
+            "trade_id": None,
             "currency": currency_code,
             "amount": amount,
             "rate": rate,
@@ -178,6 +195,32 @@ class PortfolioManager:
             "old_balance": old_balance,
             "new_balance": wallet.balance
         }
+        self._record_trade(result, user_id, "sell", currency_code, amount, rate,
+                           wallet.balance)
+        return result
+
+    def _record_trade(self, result: Dict[str, Any], user_id: int, side: str,
+                      currency_code: str, amount: float, rate: Optional[float],
+                      balance: float):
+        """
+        сделка пишется в журнал после записи портфеля (при фиксации unit of
+        work), откат команды её отбрасывает; trade_id проставляется в result
+        """
+        def record():
+            trade = self.ledger.record(user_id, side, currency_code, amount, rate,
+                                       balance)
+            result["trade_id"] = trade["trade_id"]
+
+        self.data_manager.after_commit(record)
+
+    def get_trade_history(self, user_id: int, limit: int = 20,
+                          before: Optional[int] = None) -> Dict[str, Any]:
+        """страница истории сделок пользователя"""
+        return self.ledger.get_history(user_id, limit, before)
+
+    def get_cost_basis(self, user_id: int) -> Dict[str, Dict[str, Any]]:
+        """себестоимость и реализованный P&L по журналу сделок"""
+        return self.ledger.get_cost_basis(user_id)
 
     def _save_portfolio(self, portfolio: Portfolio):
         """сохраняет портфель в JSON"""
@@ -193,4 +236,290 @@ class PortfolioManager:
         if not found:
             portfolios_data.append(portfolio.to_dict())
         
-        self.data_manager.save_json("portfolios.json", portfolios_data)
\ No newline at end of file
+        self.data_manager.save_json("portfolios.json", portfolios_data)
+
+
+class AlertManager:
+    """ценовые уведомления с индексом порогов по парам"""
+
+    def __init__(self, data_manager: DataManager, rate_service: ExchangeRateService):
+        self.data_manager = data_manager
+        self.rate_service = rate_service
+        self.logger = logging.getLogger('actions')
+        self._alerts: Optional[Dict[int, PriceAlert]] = None
+        # pair -> direction -> отсортированный список (threshold, alert_id)
+        self._index: Dict[str, Dict[str, List[Tuple[float, int]]]] = {}
+
+    def _ensure_loaded(self):
+        """загружает уведомления и строит индекс порогов"""
+        if self._alerts is not None:
+            return
+
+        self._alerts = {}
+        self._index = {}
+        for alert_data in self.data_manager.load_json("alerts.json", []):
+            alert = PriceAlert.from_dict(alert_data)
+            self._alerts[alert.alert_id] = alert
+            if not alert.is_triggered:
+                self._index_add(alert)
+
+    def _index_add(self, alert: PriceAlert):
+        by_direction = self._index.setdefault(alert.pair, {"above": [], "below": []})
+        bisect.insort(by_direction[alert.direction], (alert.threshold, alert.alert_id))
+
+    def _index_remove(self, alert: PriceAlert):
+        thresholds = self._index.get(alert.pair, {}).get(alert.direction, [])
+        entry = (alert.threshold, alert.alert_id)
+        i = bisect.bisect_left(thresholds, entry)
+        if i < len(thresholds) and thresholds[i] == entry:
+            del thresholds[i]
+
+    def _save(self):
+        self.data_manager.save_json(
+            "alerts.json",
+            [alert.to_dict() for alert in self._alerts.values()]
+        )
+
+    @log_action("ADD_ALERT")
+    def add_alert(self, user_id: int, currency_code: str, threshold: float,
+                  direction: str, base_currency: str = "USD") -> PriceAlert:
+        """создание ценового уведомления"""
+        currency_code = currency_code.upper()
+        base_currency = base_currency.upper()
+        get_currency(currency_code)
+        get_currency(base_currency)
+        if currency_code == base_currency:
+            raise ValueError("Alert currencies must differ")
+
+        self._ensure_loaded()
+        alert_id = max(self._alerts, default=0) + 1
+        alert = PriceAlert(alert_id, user_id, currency_code, base_currency,
+                           threshold, direction, datetime.now())
+
+        current_rate = self.rate_service.get_rate(currency_code, base_currency)
+        if current_rate and alert.is_met(current_rate):
+            raise ValueError(
+                f"Alert condition is already met: {alert.pair} = {current_rate}"
+            )
+
+        self._alerts[alert_id] = alert
+        self._index_add(alert)
+        self._save()
+        return alert
+
+    def list_alerts(self, user_id: int) -> List[PriceAlert]:
+        """уведомления пользователя"""
+        self._ensure_loaded()
+        return [alert for alert in self._alerts.values() if alert.user_id == user_id]
+
+    @log_action("REMOVE_ALERT")
+    def remove_alert(self, user_id: int, alert_id: int) -> PriceAlert:
+        """удаление уведомления пользователя"""
+        self._ensure_loaded()
+        alert = self._alerts.get(alert_id)
+        if alert is None or alert.user_id != user_id:
+            raise ValueError(f"Alert #{alert_id} not found")
+
+        if not alert.is_triggered:
+            self._index_remove(alert)
+        del self._alerts[alert_id]
+        self._save()
+        return alert
+
+    def evaluate(self, old_rates: Dict[str, float],
+                 new_rates: Dict[str, float]) -> List[PriceAlert]:
+        """проверяет уведомления при переходе курсов от old_rates к new_rates"""
+        self._ensure_loaded()
+        current_rates = {**old_rates, **new_rates}
+        triggered = []
+
+        for pair, by_direction in self._index.items():
+            from_currency, to_currency = pair.split("_")
+            new_rate = resolve_rate(current_rates, from_currency, to_currency)
+            if new_rate is None:
+                continue
+            old_rate = resolve_rate(old_rates, from_currency, to_currency)
+
+            # above: пороги в (old_rate, new_rate]
+            above = by_direction["above"]
+            lo = 0
+            if old_rate is not None:
+                lo = bisect.bisect_right(above, (old_rate, math.inf))
+            hi = bisect.bisect_right(above, (new_rate, math.inf))
+            fired = above[lo:hi]
+            del above[lo:hi]
+
+            # below: пороги в [new_rate, old_rate)
+            below = by_direction["below"]
+            lo = bisect.bisect_left(below, (new_rate, -math.inf))
+            hi = len(below)
+            if old_rate is not None:
+                hi = bisect.bisect_left(below, (old_rate, -math.inf))
+            fired += below[lo:hi]
+            del below[lo:hi]
+
+            for _, alert_id in fired:
+                alert = self._alerts[alert_id]
+                alert.trigger(new_rate)
+                triggered.append(alert)
+                self.logger.info(
+                    f"ALERT user_id={alert.user_id} {alert.get_alert_info()} "
+                    f"rate={new_rate} result=TRIGGERED"
+                )
+
+        if triggered:
+            self._save()
+        return triggered
+
+
+
+class OrderManager:
+    """лимитные заявки, исполняемые при обновлении курсов"""
+
+    def __init__(self, data_manager: DataManager, portfolio_manager: PortfolioManager):
+        self.data_manager = data_manager
+        self.portfolio_manager = portfolio_manager
+        self.logger = logging.getLogger('actions')
+        self._orders: Optional[Dict[int, LimitOrder]] = None
+        # pair -> {"buy": max-куча (-limit, id), "sell": min-куча (limit, id)}
+        self._books: Dict[str, Dict[str, List[Tuple[float, int]]]] = {}
+
+    def _ensure_loaded(self):
+        """загружает книгу заявок и строит кучи по парам"""
+        if self._orders is not None:
+            return
+
+        self._orders = {}
+        self._books = {}
+        for order_data in self.data_manager.load_json("orders.json", []):
+            order = LimitOrder.from_dict(order_data)
+            self._orders[order.order_id] = order
+            if order.is_pending:
+                self._book_push(order)
+
+    def _book_push(self, order: LimitOrder):
+        book = self._books.setdefault(order.pair, {"buy": [], "sell": []})
+        if order.side == "buy":
+            heapq.heappush(book["buy"], (-order.limit_rate, order.order_id))
+        else:
+            heapq.heappush(book["sell"], (order.limit_rate, order.order_id))
+
+    def _save(self):
+        self.data_manager.save_json(
+            "orders.json",
+            [order.to_dict() for order in self._orders.values()]
+        )
+
+    @log_action("PLACE_ORDER")
+    def place_order(self, user_id: int, side: str, currency_code: str,
+                    amount: float, limit_rate: float) -> LimitOrder:
+        """размещение лимитной заявки"""
+        if not validate_amount(amount):
+            raise ValueError("Amount must be positive")
+        currency_code = currency_code.upper()
+        get_currency(currency_code)
+        if currency_code == "USD":
+            raise ValueError("Cannot place order for base currency 'USD'")
+
+        if side == "sell":
+            portfolio = self.portfolio_manager.get_user_portfolio(user_id)
+            wallet = portfolio.get_wallet(currency_code)
+            available = wallet.balance if wallet else 0.0
+            if amount > available:
+                raise InsufficientFundsError(currency_code, available, amount)
+
+        self._ensure_loaded()
+        order_id = max(self._orders, default=0) + 1
+        order = LimitOrder(order_id, user_id, side, currency_code, amount,
+                           limit_rate, datetime.now())
+        self._orders[order_id] = order
+        self._book_push(order)
+
+        rate_service = self.portfolio_manager.rate_service
+        current_rate = rate_service.get_rate(currency_code, "USD")
+        if current_rate:
+            self._match_pair(order.pair, current_rate)
+
+        self._save()
+        return order
+
+    def list_orders(self, user_id: int,
+                    include_closed: bool = False) -> List[LimitOrder]:
+        """заявки пользователя"""
+        self._ensure_loaded()
+        return [
+            order for order in self._orders.values()
+            if order.user_id == user_id and (include_closed or order.is_pending)
+        ]
+
+    @log_action("CANCEL_ORDER")
+    def cancel_order(self, user_id: int, order_id: int) -> LimitOrder:
+        """отмена заявки; запись в куче удаляется лениво при извлечении"""
+        self._ensure_loaded()
+        order = self._orders.get(order_id)
+        if order is None or order.user_id != user_id:
+            raise ValueError(f"Order #{order_id} not found")
+
+        order.cancel()
+        self._save()
+        return order
+
+    def _match_pair(self, pair: str, rate: float) -> List[LimitOrder]:
+        """извлекает из куч пары все заявки, исполнимые по курсу rate"""
+        book = self._books.get(pair)
+        if not book:
+            return []
+
+        ready = []
+        buys = book["buy"]
+        while buys and -buys[0][0] >= rate:
+            ready.append(heapq.heappop(buys)[1])
+        sells = book["sell"]
+        while sells and sells[0][0] <= rate:
+            ready.append(heapq.heappop(sells)[1])
+
+        executed = []
+        for order_id in sorted(ready):
+            order = self._orders[order_id]
+            if not order.is_pending:
+                continue
+            self._execute(order, rate)
+            executed.append(order)
+        return executed
+
+    def _execute(self, order: LimitOrder, rate: float):
+        """исполнение заявки через обычные buy/sell"""
+        settle = (self.portfolio_manager.buy_currency if order.side == "buy"
+                  else self.portfolio_manager.sell_currency)
+        try:
+            settle(order.user_id, order.currency_code, order.amount)
+        except (InsufficientFundsError, ValueError) as e:
+            order.fail(str(e))
+            self.logger.error(
+                f"ORDER user_id={order.user_id} {order.get_order_info()} "
+                f"result=ERROR error={type(e).__name__}:{e}"
+            )
+            return
+
+        order.fill(rate)
+        self.logger.info(
+            f"ORDER user_id={order.user_id} {order.get_order_info()} "
+            f"rate={rate} result=FILLED"
+        )
+
+    def evaluate(self, old_rates: Dict[str, float],
+                 new_rates: Dict[str, float]) -> List[LimitOrder]:
+        """исполняет заявки, ставшие исполнимыми после обновления курсов"""
+        self._ensure_loaded()
+        current_rates = {**old_rates, **new_rates}
+        executed = []
+
+        for pair in list(self._books):
+            from_currency, to_currency = pair.split("_")
+            rate = resolve_rate(current_rates, from_currency, to_currency)
+            if rate is not None:
+                executed += self._match_pair(pair, rate)
+
+        if executed:
+            self._save()
+        return executed
@@ -1,39 +1,40 @@
-import json
-import os
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import Any, Dict
+from typing import Any, Dict, Optional
+
+from ..infra import profiler
+from ..infra.snapshots import RatesSnapshotStore
+from ..infra.storage_engine import get_engine
 
 
 class DataManager:
     def __init__(self, data_dir: str = "data"):
         self.data_dir = data_dir
-        self._ensure_data_dir()
-
-    def _ensure_data_dir(self):
-        """создает папку для данных, если она не существует"""
-        if not os.path.exists(self.data_dir):
-            os.makedirs(self.data_dir)
-
-    def _get_file_path(self, filename: str) -> str:
-        return os.path.join(self.data_dir, filename)
+        self.engine = get_engine(data_dir)
 
     def load_json(self, filename: str, default: Any = None) -> Any:
         """читает JSON файл и возвращает данные"""
-        filepath = self._get_file_path(filename)
-        if not os.path.exists(filepath):
-            return default if default is not None else []
-        
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
-            return default if default is not None else []
+        return self.engine.load(filename, default if default is not None else [])
 
     def save_json(self, filename: str, data: Any):
         """записывает данные в JSON файл"""
-        filepath = self._get_file_path(filename)
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False, default=str)
+        self.engine.save(filename, data)
+
+    def unit_of_work(self):
+        """изменения внутри блока записываются один раз при выходе"""
+        return self.engine.unit_of_work()
+
+    def commit(self):
+        """записывает накопленные изменения, не дожидаясь конца unit of work"""
+        self.engine.flush()
+
+    def rollback(self):
+        """отбрасывает незаписанные изменения"""
+        self.engine.rollback()
+
+    def after_commit(self, callback):
+        """callback после записи изменений unit of work (при откате — не вызывается)"""
+        self.engine.after_flush(callback)
 
     def get_next_user_id(self) -> int:
         """генерация следующего ID пользователя"""
@@ -44,39 +45,60 @@ class DataManager:
 
 
 class ExchangeRateService:
-    def __init__(self, data_manager: DataManager):
+    def __init__(self, data_manager: DataManager, rates_dir: Optional[str] = None):
         self.data_manager = data_manager
         self._default_rates = {}
+        # разделы пользователей читают общие снимки курсов из rates_dir
+        self.snapshots = RatesSnapshotStore(rates_dir or data_manager.data_dir)
+        self._cache_key = None
+        self._cache_rates: Optional[Dict] = None
+        self._cache_pairs: Dict[str, float] = {}
+        self._pinned = False
 
     def get_rates(self) -> Dict:
-        """загрузка котировок из rates.json"""
-        rates = self.data_manager.load_json("rates.json")
+        """котировки из текущего снимка (перечитываются только при смене версии)"""
+        if self._pinned and self._cache_rates is not None:
+            return self._cache_rates
+
+        cache_key = self.snapshots.current_token()
+        if self._cache_rates is not None and cache_key == self._cache_key:
+            return self._cache_rates
+
+        _, rates = self.snapshots.read_current()
         if not rates:
-            return {"pairs": {}, "last_refresh": None}
+            rates = {"pairs": {}, "last_refresh": None}
+        self._cache_rates = rates
+        self._cache_pairs = {
+            pair: data["rate"] for pair, data in rates.get("pairs", {}).items()
+        }
+        self._cache_key = cache_key
         return rates
 
+    @contextmanager
+    def snapshot(self):
+        """
+        фиксирует одну версию курсов на время команды;
+        вложенный снимок перечитывает текущую версию и оставляет её
+        закреплённой для внешнего
+        """
+        outer = self._pinned
+        self._pinned = False
+        self.get_rates()
+        self._pinned = True
+        try:
+            yield self._cache_rates
+        finally:
+            self._pinned = outer
+
     def get_rate(self, from_currency: str, to_currency: str) -> float:
         """получает обменный курс из актуальных данных"""
         if from_currency == to_currency:
             return 1.0
         
-        rates = self.get_rates()
-        
-        rate_key = f"{from_currency}_{to_currency}"
-        if rate_key in rates.get("pairs", {}):
-            return rates["pairs"][rate_key]["rate"]
-        
-        reverse_key = f"{to_currency}_{from_currency}"
-        if reverse_key in rates.get("pairs", {}):
-            return 1.0 / rates["pairs"][reverse_key]["rate"]
-        
-        if from_currency != "USD" and to_currency != "USD":
-            usd_from = self.get_rate(from_currency, "USD")
-            usd_to = self.get_rate(to_currency, "USD")
-            if usd_from and usd_to:
-                return usd_from / usd_to
-        
-        return None
+        with profiler.phase(profiler.PHASE_RATE_LOOKUP):
+            self.get_rates()
+            return resolve_rate(self._cache_pairs, from_currency, to_currency)
+
 def is_rates_fresh(self, ttl_seconds: int = 300) -> bool:
         """проверка актуальности курсов"""
         rates = self.get_rates()
@@ -105,4 +127,26 @@ def validate_currency_code(currency_code: str) -> bool:
 
 def validate_amount(amount: float) -> bool:
     """проверка валидности суммы"""
-    return isinstance(amount, (int, float)) and amount > 0
\ No newline at end of file
+    return isinstance(amount, (int, float)) and amount > 0
+
+def resolve_rate(pairs: Dict[str, float], from_currency: str,
+                 to_currency: str) -> Optional[float]:
+    """курс по словарю пар: прямой, обратный или кросс-курс через USD"""
+    if from_currency == to_currency:
+        return 1.0
+
+    rate = pairs.get(f"{from_currency}_{to_currency}")
+    if rate:
+        return rate
+
+    reverse_rate = pairs.get(f"{to_currency}_{from_currency}")
+    if reverse_rate:
+        return 1.0 / reverse_rate
+
+    if from_currency != "USD" and to_currency != "USD":
+        usd_from = resolve_rate(pairs, from_currency, "USD")
+        usd_to = resolve_rate(pairs, to_currency, "USD")
+        if usd_from and usd_to:
+            return usd_from / usd_to
+
+    return None
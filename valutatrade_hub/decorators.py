@@ -1,4 +1,5 @@
 import functools
+import inspect
 import logging
 from datetime import datetime
 from typing import Any, Callable, Dict
@@ -9,6 +10,8 @@ def log_action(action_name: str = None, verbose: bool = False):
     декоратор для логирования ключевых операций
     """
     def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs) -> Any:
             logger = logging.getLogger('actions')
@@ -27,14 +30,21 @@ def log_action(action_name: str = None, verbose: bool = False):
                         log_data['username'] = user_manager.current_user.username
                         log_data['user_id'] = user_manager.current_user.user_id
                 
-                if 'currency_code' in kwargs:
-                    log_data['currency_code'] = kwargs['currency_code']
-                if 'amount' in kwargs:
-                    log_data['amount'] = kwargs['amount']
+                # аргументы метода по имени, в том числе переданные позиционно
+                try:
+                    call_args = signature.bind(*args, **kwargs).arguments
+                except TypeError:
+                    call_args = kwargs
+                for name in ('username', 'user_id', 'currency_code', 'amount'):
+                    if call_args.get(name) is not None:
+                        log_data.setdefault(name, call_args[name])
                 
                 result = func(*args, **kwargs)
                 
                 log_data['result'] = 'OK'
+                # REGISTER/LOGIN узнают user_id только из результата
+                if 'user_id' not in log_data and hasattr(result, 'user_id'):
+                    log_data['user_id'] = result.user_id
                 
                 if verbose and result:
                     if 'rate' in result:
@@ -72,6 +82,9 @@ def _format_log_message(log_data: Dict[str, Any]) -> str:
     if 'username' in log_data:
         parts.append(f"user='{log_data['username']}'")
     
+    if 'user_id' in log_data:
+        parts.append(f"user_id={log_data['user_id']}")
+
     if 'currency_code' in log_data:
         parts.append(f"currency='{log_data['currency_code']}'")
     
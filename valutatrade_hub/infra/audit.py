@@ -0,0 +1,325 @@
+import os
+import pickle
+import re
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from . import profiler
+
+AUDIT_INDEX_FILE = ".actions.audit.pickle"
+# меняется при изменении формата индекса — старый индекс строится заново
+AUDIT_INDEX_VERSION = 1
+
+RESULTS = ("OK", "ERROR")
+
+# строка log_action: "<LEVEL> <время> actions <ACTION> [user='..'] [user_id=N]
+# [currency='..'] ... result=<OK|ERROR> [error=..]"
+_LINE = re.compile(
+    rb"(\w+) (\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d) actions ([A-Z_]+)"
+    rb"(?: user='([^']*)')?(?: user_id=(\d+))?(?: currency='([^']*)')?"
+    rb".*? result=(OK|ERROR)"
+)
+_HEAD_BYTES = 256
+
+_COLUMNS = {
+    "ts": np.int64,          # секунды эпохи (локальное время лога)
+    "action": np.int16,      # код в словаре действий
+    "result": np.int8,       # индекс в RESULTS
+    "user_id": np.int64,     # -1 — не записан
+    "username": np.int32,    # код в словаре имён, -1 — не записано
+    "currency": np.int16,    # код в словаре валют, -1 — не записано
+    "segment": np.int32,     # серийный номер файла лога
+    "offset": np.int64,      # смещение строки в файле
+}
+
+
+class AuditIndex:
+    """
+    инкрементальный индекс строк log_action в actions.log и его ротациях:
+    колонки с кодами пользователя, действия, результата, валюты и временем;
+    файлы узнаются по inode и первой строке, поэтому после ротации
+    (actions.log -> actions.log.1) индексируется только дописанное
+    """
+
+    def __init__(self, log_path="logs/actions.log", index_path=None):
+        self.log_path = Path(log_path)
+        self.index_path = Path(index_path) if index_path else \
+            self.log_path.parent / AUDIT_INDEX_FILE
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._reset()
+
+    def _reset(self):
+        # отпечаток файла -> {"serial", "offset"}; пути — только для текущего обхода
+        self._segments: Dict[Tuple[int, bytes], Dict[str, int]] = {}
+        self._paths: Dict[int, Path] = {}
+        self._next_serial = 0
+        self._dictionaries: Dict[str, List[str]] = {
+            "action": [], "username": [], "currency": []
+        }
+        self._codes: Dict[str, Dict[str, int]] = {
+            name: {} for name in self._dictionaries
+        }
+        self._columns = {
+            name: np.empty(0, dtype=dtype) for name, dtype in _COLUMNS.items()
+        }
+        self._sorted = True
+
+    def __len__(self) -> int:
+        return len(self._columns["ts"])
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            with open(self.index_path, "rb") as f:
+                raw = f.read()
+            with profiler.phase(profiler.PHASE_STORAGE_LOAD):
+                state = pickle.loads(raw)
+            profiler.record_io(self.index_path, read=len(raw))
+        except Exception:
+            # нет индекса или он повреждён — построится заново из логов
+            return
+        if not isinstance(state, dict) or state.get("version") != AUDIT_INDEX_VERSION:
+            return
+        self._segments = state["segments"]
+        self._next_serial = state["next_serial"]
+        self._dictionaries = state["dictionaries"]
+        self._codes = {name: {value: code for code, value in enumerate(values)}
+                       for name, values in self._dictionaries.items()}
+        self._columns = state["columns"]
+        self._sorted = state["sorted"]
+
+    def _save(self):
+        """атомарная запись индекса рядом с логами"""
+        tmp_path = f"{self.index_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with profiler.phase(profiler.PHASE_STORAGE_SAVE):
+                raw = pickle.dumps({
+                    "version": AUDIT_INDEX_VERSION,
+                    "segments": self._segments,
+                    "next_serial": self._next_serial,
+                    "dictionaries": self._dictionaries,
+                    "columns": self._columns,
+                    "sorted": self._sorted,
+                }, protocol=pickle.HIGHEST_PROTOCOL)
+                with open(tmp_path, "wb") as f:
+                    f.write(raw)
+                os.replace(tmp_path, self.index_path)
+            profiler.record_io(self.index_path, written=len(raw))
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def _log_files(self) -> List[Path]:
+        """файлы лога от старых к новым: actions.log.N, ..., actions.log"""
+        backups = []
+        for path in self.log_path.parent.glob(f"{self.log_path.name}.*"):
+            suffix = path.name[len(self.log_path.name) + 1:]
+            if suffix.isdigit():
+                backups.append((int(suffix), path))
+        files = [path for _, path in sorted(backups, reverse=True)]
+        if self.log_path.exists():
+            files.append(self.log_path)
+        return files
+
+    @staticmethod
+    def _fingerprint(path: Path) -> Optional[Tuple[Tuple[int, bytes], int]]:
+        """(inode, первая строка) и размер; None, пока первая строка не дописана"""
+        try:
+            with open(path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                head = f.readline(_HEAD_BYTES)
+                inode = os.fstat(f.fileno()).st_ino
+        except OSError:
+            return None
+        if not head.endswith(b"\n") and len(head) < _HEAD_BYTES:
+            return None
+        return (inode, head), size
+
+    def _code(self, name: str, value: Optional[bytes]) -> int:
+        if value is None:
+            return -1
+        text = value.decode("utf-8", errors="replace")
+        codes = self._codes[name]
+        code = codes.get(text)
+        if code is None:
+            code = codes[text] = len(self._dictionaries[name])
+            self._dictionaries[name].append(text)
+        return code
+
+    def _scan(self, path: Path,
+              segment: Dict[str, int]) -> Optional[Dict[str, np.ndarray]]:
+        """разбирает строки файла после уже проиндексированного смещения"""
+        with open(path, "rb") as f:
+            f.seek(segment["offset"])
+            data = f.read()
+        profiler.record_io(path, read=len(data))
+        # недописанную последнюю строку оставляем до следующего обновления
+        end = data.rfind(b"\n") + 1
+        if not end:
+            return None
+
+        rows = {name: [] for name in _COLUMNS if name not in ("ts", "segment")}
+        timestamps = []
+        position = segment["offset"]
+        for line in data[:end].split(b"\n")[:-1]:
+            match = _LINE.match(line)
+            if match:
+                _, ts, action, username, user_id, currency, result = match.groups()
+                timestamps.append(ts)
+                rows["action"].append(self._code("action", action))
+                rows["result"].append(RESULTS.index(result.decode()))
+                rows["user_id"].append(int(user_id) if user_id else -1)
+                rows["username"].append(self._code("username", username))
+                rows["currency"].append(self._code("currency", currency))
+                rows["offset"].append(position)
+            position += len(line) + 1
+        segment["offset"] += end
+
+        if not timestamps:
+            return None
+        chunk = {name: np.array(values, dtype=_COLUMNS[name])
+                 for name, values in rows.items()}
+        chunk["ts"] = (np.array(timestamps, dtype="S19")
+                       .astype("datetime64[s]").astype(np.int64))
+        chunk["segment"] = np.full(len(timestamps), segment["serial"], dtype=np.int32)
+        return chunk
+
+    def refresh(self) -> Dict[str, int]:
+        """дочитывает новые строки, забывает файлы, ушедшие из ротации"""
+        with self._lock:
+            self._ensure_loaded()
+            seen = {}
+            chunks = []
+            for path in self._log_files():
+                fingerprint = self._fingerprint(path)
+                if fingerprint is None:
+                    continue
+                key, size = fingerprint
+                segment = self._segments.get(key)
+                if segment is None or size < segment["offset"]:
+                    # новый файл (или файл перезаписан) — индексируется с начала
+                    segment = {"serial": self._next_serial, "offset": 0}
+                    self._next_serial += 1
+                seen[key] = segment
+                self._paths[segment["serial"]] = path
+                if size > segment["offset"]:
+                    chunk = self._scan(path, segment)
+                    if chunk is not None:
+                        chunks.append(chunk)
+
+            live = {segment["serial"] for segment in seen.values()}
+            dropped = [segment for key, segment in self._segments.items()
+                       if key not in seen or seen[key] is not segment]
+            self._segments = seen
+            if dropped:
+                keep = np.isin(self._columns["segment"], list(live))
+                self._columns = {name: column[keep]
+                                 for name, column in self._columns.items()}
+
+            indexed = sum(len(chunk["ts"]) for chunk in chunks)
+            if chunks:
+                self._columns = {
+                    name: np.concatenate(
+                        [self._columns[name]] + [chunk[name] for chunk in chunks])
+                    for name in _COLUMNS
+                }
+            if chunks or dropped:
+                # процессы пишут в лог почти по порядку; если нет — фильтр по маске
+                self._sorted = bool(np.all(np.diff(self._columns["ts"]) >= 0))
+                self._save()
+            return {"indexed": indexed, "dropped_files": len(dropped),
+                    "rows": len(self), "files": len(seen)}
+
+    def query(self, user_id: Optional[int] = None, username: Optional[str] = None,
+              action: Optional[str] = None, result: Optional[str] = None,
+              currency: Optional[str] = None, start: Optional[datetime] = None,
+              end: Optional[datetime] = None, limit: int = 50) -> Dict[str, Any]:
+        """
+        записи по фильтрам (пользователь — по user_id или имени, время — [start, end));
+        возвращает число совпадений, разбивку по действиям и последние limit записей
+        """
+        with self._lock:
+            self._ensure_loaded()
+            columns = self._columns
+            low, high = 0, len(columns["ts"])
+            ts = columns["ts"]
+            start_s = np.datetime64(start, "s").astype(np.int64) if start else None
+            end_s = np.datetime64(end, "s").astype(np.int64) if end else None
+            if self._sorted:
+                # время упорядочено — диапазон строк двумя бинарными поисками
+                if start_s is not None:
+                    low = int(np.searchsorted(ts, start_s, side="left"))
+                if end_s is not None:
+                    high = int(np.searchsorted(ts, end_s, side="left"))
+                start_s = end_s = None
+            part = slice(low, max(low, high))
+
+            mask = np.ones(part.stop - part.start, dtype=bool)
+            if start_s is not None:
+                mask &= ts[part] >= start_s
+            if end_s is not None:
+                mask &= ts[part] < end_s
+            for name, value in (("action", action), ("currency", currency)):
+                if value is not None:
+                    code = self._codes[name].get(value.upper(), -2)
+                    mask &= columns[name][part] == code
+            if result is not None:
+                result = result.upper()
+                code = RESULTS.index(result) if result in RESULTS else -2
+                mask &= columns["result"][part] == code
+            if user_id is not None or username is not None:
+                user_mask = np.zeros_like(mask)
+                if user_id is not None:
+                    user_mask |= columns["user_id"][part] == user_id
+                if username is not None:
+                    user_mask |= columns["username"][part] == \
+                        self._codes["username"].get(username, -2)
+                mask &= user_mask
+
+            rows = np.flatnonzero(mask) + low
+            actions, counts = np.unique(columns["action"][rows], return_counts=True)
+            by_action = {self._dictionaries["action"][code]: int(count)
+                         for code, count in zip(actions, counts)}
+            latest = rows[::-1][:max(limit, 0)]
+            entries = [self._entry(row) for row in latest.tolist()]
+        return {"count": len(rows), "by_action": by_action, "entries": entries}
+
+    def _entry(self, row: int) -> Dict[str, Any]:
+        """запись индекса с исходной строкой лога"""
+        columns = self._columns
+
+        def decode(name: str) -> Optional[str]:
+            code = int(columns[name][row])
+            return self._dictionaries[name][code] if code >= 0 else None
+
+        user_id = int(columns["user_id"][row])
+        return {
+            "timestamp": np.datetime64(int(columns["ts"][row]), "s").item(),
+            "action": decode("action"),
+            "result": RESULTS[columns["result"][row]],
+            "user_id": user_id if user_id >= 0 else None,
+            "username": decode("username"),
+            "currency": decode("currency"),
+            "line": self._read_line(int(columns["segment"][row]),
+                                    int(columns["offset"][row])),
+        }
+
+    def _read_line(self, serial: int, offset: int) -> Optional[str]:
+        path = self._paths.get(serial)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                f.seek(offset)
+                return f.readline().decode("utf-8", errors="replace").rstrip("\n")
+        except OSError:
+            return None
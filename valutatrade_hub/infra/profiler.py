@@ -0,0 +1,146 @@
+import cProfile
+import os
+import re
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+PHASE_STORAGE_LOAD = "storage load"
+PHASE_STORAGE_SAVE = "storage save"
+PHASE_RATE_LOOKUP = "rate lookup"
+PHASE_HTTP = "http"
+
+_TMP_SUFFIX = re.compile(r"(\.\d+)+\.tmp$")
+
+
+class CommandProfiler:
+    """
+    профиль одной команды: время по фазам (без вложенных фаз), байты по файлам,
+    пик памяти tracemalloc и, при необходимости, дамп cProfile
+    """
+
+    def __init__(self, command: str, dump_path: Optional[str] = None):
+        self.command = command
+        self.dump_path = dump_path
+        self.phases: Dict[str, float] = {}
+        self.io: Dict[str, Dict[str, int]] = {}
+        self.wall_time = 0.0
+        self.peak_memory = 0
+        self._stack: List[List] = []
+        self._lock = threading.Lock()
+        self._thread_id = threading.get_ident()
+        self._cprofile: Optional[cProfile.Profile] = None
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._tracing = not tracemalloc.is_tracing()
+        if self._tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        if self.dump_path:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def stop(self):
+        if self._cprofile:
+            self._cprofile.disable()
+            os.makedirs(os.path.dirname(self.dump_path) or ".", exist_ok=True)
+            self._cprofile.dump_stats(self.dump_path)
+        self.peak_memory = tracemalloc.get_traced_memory()[1]
+        if self._tracing:
+            tracemalloc.stop()
+        self.wall_time = time.perf_counter() - self._started
+
+    @contextmanager
+    def phase(self, name: str):
+        # вложенные фазы вычитаются из внешней; фоновые потоки считаются без вложенности
+        if threading.get_ident() != self._thread_id:
+            started = time.perf_counter()
+            try:
+                yield
+            finally:
+                self._add(name, time.perf_counter() - started)
+            return
+
+        now = time.perf_counter()
+        if self._stack:
+            outer = self._stack[-1]
+            self._add(outer[0], now - outer[1])
+        self._stack.append([name, now])
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            self._add(name, now - self._stack.pop()[1])
+            if self._stack:
+                self._stack[-1][1] = now
+
+    def _add(self, name: str, elapsed: float):
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+    def record_io(self, path, read: int = 0, written: int = 0):
+        # временные файлы атомарной записи (<file>.<pid>.tmp) учитываются как <file>
+        key = _TMP_SUFFIX.sub("", str(path))
+        if os.path.isabs(key):
+            key = os.path.relpath(key)
+        with self._lock:
+            stats = self.io.setdefault(key, {"read": 0, "written": 0})
+            stats["read"] += read
+            stats["written"] += written
+
+    def report(self) -> Dict:
+        """сводка для вывода в CLI"""
+        accounted = sum(self.phases.values())
+        phases = dict(sorted(self.phases.items(), key=lambda item: -item[1]))
+        phases["other"] = max(self.wall_time - accounted, 0.0)
+        return {
+            "command": self.command,
+            "wall_time": self.wall_time,
+            "phases": phases,
+            "io": dict(sorted(self.io.items())),
+            "peak_memory": self.peak_memory,
+            "dump_path": self.dump_path
+        }
+
+
+_active: Optional[CommandProfiler] = None
+
+
+def get_profiler() -> Optional[CommandProfiler]:
+    """активный профиль команды или None"""
+    return _active
+
+
+@contextmanager
+def profile_command(command: str, dump_path: Optional[str] = None):
+    """включает профилирование на время выполнения команды"""
+    global _active
+    profiler = CommandProfiler(command, dump_path)
+    _active = profiler
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        _active = None
+
+
+@contextmanager
+def phase(name: str):
+    """фаза команды; без активного профиля ничего не делает"""
+    profiler = _active
+    if profiler is None:
+        yield
+        return
+    with profiler.phase(name):
+        yield
+
+
+def record_io(path, read: int = 0, written: int = 0):
+    """учёт прочитанных и записанных байт по файлу"""
+    profiler = _active
+    if profiler is not None:
+        profiler.record_io(path, read, written)
@@ -0,0 +1,192 @@
+import json
+import logging
+import os
+import re
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, Optional
+
+from . import profiler
+
+logger = logging.getLogger('storage')
+
+
+class Serializer(ABC):
+    """
+    формат хранения JSON-файлов данных; все реализации читают и пишут обычный JSON
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def dumps(self, data: Any) -> bytes:
+        """сериализует данные в байты UTF-8"""
+        pass
+
+    @abstractmethod
+    def loads(self, raw: bytes) -> Any:
+        """разбирает байты; при ошибке формата — ValueError"""
+        pass
+
+    def dump_file(self, data: Any, path, mode: str = 'wb'):
+        with profiler.phase(profiler.PHASE_STORAGE_SAVE):
+            raw = self.dumps(data)
+            with open(path, mode) as f:
+                f.write(raw)
+            profiler.record_io(path, written=len(raw))
+
+    def load_file(self, path) -> Any:
+        with profiler.phase(profiler.PHASE_STORAGE_LOAD):
+            with open(path, 'rb') as f:
+                raw = f.read()
+            profiler.record_io(path, read=len(raw))
+            return self.loads(raw)
+
+
+class JsonSerializer(Serializer):
+    """стандартный json; по умолчанию компактный, indent=2 — для чтения глазами"""
+
+    def __init__(self, indent: Optional[int] = None):
+        self.indent = indent
+        self.name = "json-pretty" if indent else "json"
+        self._separators = None if indent else (",", ":")
+
+    def dumps(self, data: Any) -> bytes:
+        return json.dumps(
+            data, indent=self.indent, separators=self._separators,
+            ensure_ascii=False, default=str
+        ).encode("utf-8")
+
+    def loads(self, raw: bytes) -> Any:
+        return json.loads(raw)
+
+
+class OrjsonSerializer(Serializer):
+    """orjson (если установлен)"""
+
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+
+    def dumps(self, data: Any) -> bytes:
+        return self._orjson.dumps(data, default=str)
+
+    def loads(self, raw: bytes) -> Any:
+        return self._orjson.loads(raw)
+
+
+class MsgspecSerializer(Serializer):
+    """msgspec.json (если установлен)"""
+
+    name = "msgspec"
+
+    def __init__(self):
+        import msgspec
+        self._encoder = msgspec.json.Encoder(enc_hook=str)
+        self._decoder = msgspec.json.Decoder()
+        self._decode_error = msgspec.DecodeError
+
+    def dumps(self, data: Any) -> bytes:
+        return self._encoder.encode(data)
+
+    def loads(self, raw: bytes) -> Any:
+        try:
+            return self._decoder.decode(raw)
+        except self._decode_error as e:
+            raise ValueError(str(e)) from e
+
+
+_BACKENDS = {
+    "json": JsonSerializer,
+    "json-pretty": lambda: JsonSerializer(indent=2),
+    "orjson": OrjsonSerializer,
+    "msgspec": MsgspecSerializer,
+}
+_AUTO_ORDER = ("orjson", "msgspec", "json")
+_INSTANCES: Dict[str, Serializer] = {}
+
+
+def available_serializers() -> Dict[str, Serializer]:
+    """все форматы, доступные в текущем окружении"""
+    result = {}
+    for name, factory in _BACKENDS.items():
+        try:
+            result[name] = factory()
+        except ImportError:
+            continue
+    return result
+
+
+def get_serializer(name: Optional[str] = None) -> Serializer:
+    """
+    сериализатор по имени или из настройки "serializer";
+    "auto" — самый быстрый установленный, недоступный бэкенд заменяется на json
+    """
+    if name is None:
+        from .settings import settings
+        name = settings.get("serializer", "auto")
+
+    if name in _INSTANCES:
+        return _INSTANCES[name]
+
+    candidates = _AUTO_ORDER if name == "auto" else (name, "json")
+    serializer = None
+    for candidate in candidates:
+        factory = _BACKENDS.get(candidate)
+        if factory is None:
+            logger.warning(f"Unknown serializer '{candidate}', falling back to json")
+            continue
+        try:
+            serializer = factory()
+            break
+        except ImportError:
+            if name != "auto":
+                logger.warning(
+                    f"Serializer '{candidate}' is not installed, falling back to json"
+                )
+
+    _INSTANCES[name] = serializer
+    return serializer
+
+
+_WHITESPACE = re.compile(r"[\s,]*")
+
+
+def iter_json_array(path: str, chunk_size: int = 1 << 16) -> Iterator[Any]:
+    """элементы JSON-массива из файла без загрузки всего файла в память"""
+    if not os.path.exists(path):
+        return
+
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = f.read(chunk_size).lstrip()
+        if not buffer:
+            return
+        if buffer[0] != "[":
+            raise ValueError(f"{path}: expected a JSON array")
+
+        pos, eof = 1, False
+        while True:
+            pos = _WHITESPACE.match(buffer, pos).end()
+            if pos < len(buffer) and buffer[pos] == "]":
+                return
+
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+                # число на границе чанка могло оборваться — дочитываем
+                complete = end < len(buffer) or eof
+            except json.JSONDecodeError:
+                if eof:
+                    raise ValueError(f"{path}: truncated JSON array")
+                complete = False
+
+            if not complete:
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                continue
+
+            yield item
+            pos = end
@@ -20,7 +20,14 @@ class SettingsLoader:
         self._settings = {
             "data_dir": "data",
             "rates_ttl_seconds": 300,
-            "default_base_currency": "USD"
+            "default_base_currency": "USD",
+            # формат JSON-файлов: auto | json | json-pretty | orjson | msgspec
+            "serializer": "auto",
+            # бинарные записи разобранных коллекций для быстрого старта
+            # (data/.warm_state/)
+            "warm_state": True,
+            # ключ HMAC записей тёплого состояния — вне каталога данных
+            "warm_state_key_path": "~/.valutatrade/warm_state.key"
         }
     
     def get(self, key: str, default: Any = None) -> Any:
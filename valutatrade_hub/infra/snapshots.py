@@ -0,0 +1,128 @@
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+from . import profiler
+from .serializers import get_serializer
+from .warm_state import get_warm_state
+
+
+class RatesSnapshotStore:
+    """
+    неизменяемые версии текущих курсов: rates_snapshots/rates-<N>.json
+    и указатель CURRENT, который атомарно подменяется через os.replace
+    """
+
+    SNAPSHOT_DIR = "rates_snapshots"
+    POINTER_FILE = "CURRENT"
+    LEGACY_FILE = "rates.json"
+
+    def __init__(self, data_dir: str = "data", keep: int = 5):
+        self.data_dir = Path(data_dir)
+        self.snapshot_dir = self.data_dir / self.SNAPSHOT_DIR
+        self.pointer_path = self.snapshot_dir / self.POINTER_FILE
+        self.keep = max(1, keep)
+        self.warm = get_warm_state(data_dir)
+
+    def _load(self, path: Path) -> Any:
+        """разбор файла курсов; снимки неизменяемы и берутся из тёплого состояния"""
+        if not self.warm:
+            return get_serializer().load_file(path)
+        key = os.path.relpath(path, self.data_dir)
+        return self.warm.load(key, path, lambda: get_serializer().load_file(path))
+
+    def _snapshot_path(self, version: int) -> Path:
+        return self.snapshot_dir / f"rates-{version:08d}.json"
+
+    def read_pointer(self) -> Optional[dict]:
+        """текущий указатель или None, если снимков ещё не было"""
+        try:
+            with open(self.pointer_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def current_token(self) -> Optional[float]:
+        """метка текущей версии (mtime указателя или старого rates.json) для кэшей"""
+        for path in (self.pointer_path, self.data_dir / self.LEGACY_FILE):
+            try:
+                return os.path.getmtime(path)
+            except OSError:
+                continue
+        return None
+
+    def read_current(self) -> Tuple[Optional[int], Any]:
+        """(версия, данные) текущего снимка; без снимков — старый rates.json"""
+        for _ in range(3):
+            pointer = self.read_pointer()
+            if pointer is None:
+                return None, self._read_legacy()
+            try:
+                snapshot = self._load(self.snapshot_dir / pointer["file"])
+                return pointer["version"], snapshot
+            except FileNotFoundError:
+                # снимок удалён ротацией между чтением указателя и файла — читаем заново
+                continue
+        return None, None
+
+    def _read_legacy(self) -> Any:
+        legacy_path = self.data_dir / self.LEGACY_FILE
+        if not legacy_path.exists():
+            return None
+        try:
+            return self._load(legacy_path)
+        except (ValueError, FileNotFoundError):
+            return None
+
+    def publish(self, data: Any) -> int:
+        """записывает новый снимок и переключает на него указатель; возвращает версию"""
+        self.snapshot_dir.mkdir(parents=True, exist_ok=True)
+        pointer = self.read_pointer()
+        version = (pointer["version"] if pointer else 0) + 1
+
+        while True:
+            path = self._snapshot_path(version)
+            try:
+                # 'x' — эксклюзивное создание: параллельный писатель
+                # возьмёт следующую версию
+                with profiler.phase(profiler.PHASE_STORAGE_SAVE):
+                    raw = get_serializer().dumps(data)
+                    with open(path, 'xb') as f:
+                        f.write(raw)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    profiler.record_io(path, written=len(raw))
+                break
+            except FileExistsError:
+                version += 1
+
+        tmp_name = f"{self.POINTER_FILE}.{os.getpid()}.{threading.get_ident()}.tmp"
+        tmp_pointer = self.snapshot_dir / tmp_name
+        with open(tmp_pointer, 'w', encoding='utf-8') as f:
+            json.dump({
+                "version": version,
+                "file": path.name,
+                "published_at": datetime.now().isoformat()
+            }, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_pointer, self.pointer_path)
+
+        self._prune(version)
+        return version
+
+    def _prune(self, current_version: int):
+        """оставляет последние keep версий"""
+        for path in self.snapshot_dir.glob("rates-*.json"):
+            try:
+                version = int(path.stem.split("-")[1])
+            except (IndexError, ValueError):
+                continue
+            if version <= current_version - self.keep:
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
@@ -0,0 +1,214 @@
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from .serializers import get_serializer
+from .warm_state import MISSING, get_warm_state
+
+try:
+    import fcntl
+except ImportError:  # нет flock (Windows) — блокировка только внутри процесса
+    fcntl = None
+
+_MISSING = object()
+
+
+class StorageEngine:
+    """
+    единое хранилище JSON-коллекций: identity map (файл разбирается один раз,
+    пока не изменится на диске), учёт изменённых коллекций и unit of work,
+    который записывает только изменённые файлы один раз при фиксации;
+    между запусками разобранные коллекции берутся из тёплого состояния;
+    unit of work держит flock каталога, поэтому процессы не затирают
+    изменения друг друга
+    """
+
+    def __init__(self, data_dir: str):
+        # абсолютный путь: движок общий для каталога и переживает смену cwd
+        self.data_dir = os.path.abspath(str(data_dir))
+        os.makedirs(self.data_dir, exist_ok=True)
+        self._lock = threading.RLock()
+        self._identity_map: Dict[str, Any] = {}
+        self._signatures: Dict[str, Optional[Tuple[int, int]]] = {}
+        self._dirty: Set[str] = set()
+        self._depth = 0
+        self._dir_fd: Optional[int] = None
+        self._after_flush: List[Callable[[], None]] = []
+        self.warm = get_warm_state(self.data_dir)
+        self.stats = {"parses": 0, "cache_hits": 0, "warm_hits": 0, "writes": 0}
+
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.data_dir, filename)
+
+    def _lock_dir(self) -> bool:
+        """эксклюзивный flock каталога; False — блокировка уже взята"""
+        if fcntl is None or self._dir_fd is not None:
+            return False
+        # дескриптор открывается заново: унаследованный после fork
+        # разделял бы блокировку с родителем
+        fd = os.open(self.data_dir, os.O_RDONLY)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        except OSError:
+            os.close(fd)
+            raise
+        self._dir_fd = fd
+        return True
+
+    def _unlock_dir(self):
+        """снимает flock каталога (закрытием дескриптора)"""
+        if self._dir_fd is not None:
+            os.close(self._dir_fd)
+            self._dir_fd = None
+
+    def _signature(self, filename: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self._path(filename))
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def load(self, filename: str, default: Any = None) -> Any:
+        """
+        данные коллекции; повторное чтение возвращает тот же объект,
+        если файл не менялся на диске или коллекция ещё не записана
+        """
+        with self._lock:
+            cached = self._identity_map.get(filename, _MISSING)
+            if cached is not _MISSING and (
+                filename in self._dirty
+                or self._signatures.get(filename) == self._signature(filename)
+            ):
+                self.stats["cache_hits"] += 1
+                return cached
+
+            signature = self._signature(filename)
+            if signature is None:
+                self._identity_map.pop(filename, None)
+                return default
+
+            data = self.warm.get(filename, signature) if self.warm else MISSING
+            if data is not MISSING:
+                self.stats["warm_hits"] += 1
+            else:
+                try:
+                    data = get_serializer().load_file(self._path(filename))
+                except (ValueError, FileNotFoundError):
+                    return default
+                self.stats["parses"] += 1
+                if self.warm:
+                    self.warm.put(filename, signature, data)
+
+            self._identity_map[filename] = data
+            self._signatures[filename] = signature
+            return data
+
+    def save(self, filename: str, data: Any):
+        """помечает коллекцию изменённой; вне unit of work пишет её сразу"""
+        with self._lock:
+            self._identity_map[filename] = data
+            self._dirty.add(filename)
+            if self._depth == 0:
+                self.flush()
+
+    def after_flush(self, callback: Callable[[], None]):
+        """
+        callback после записи изменённых коллекций: внутри unit of work —
+        при фиксации (откат его отбрасывает), вне — сразу
+        """
+        with self._lock:
+            if self._depth:
+                self._after_flush.append(callback)
+                return
+        callback()
+
+    def flush(self):
+        """
+        атомарно записывает все изменённые коллекции; тёплое состояние
+        сохраняется пачкой (WarmState.maybe_save) и при выходе из процесса
+        """
+        with self._lock:
+            # вне unit of work блокировка берётся только на время записи
+            locked = self._lock_dir() if self._dirty else False
+            try:
+                self._write_dirty()
+                # запись журналов и т. п. — под той же блокировкой каталога
+                callbacks, self._after_flush = self._after_flush, []
+                for callback in callbacks:
+                    callback()
+            finally:
+                if locked:
+                    self._unlock_dir()
+            if self.warm:
+                self.warm.maybe_save()
+
+    def _write_dirty(self):
+        serializer = get_serializer()
+        for filename in sorted(self._dirty):
+            path = self._path(filename)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            serializer.dump_file(self._identity_map[filename], tmp_path)
+            os.replace(tmp_path, path)
+            self._signatures[filename] = self._signature(filename)
+            if self.warm:
+                self.warm.put(filename, self._signatures[filename],
+                              self._identity_map[filename])
+            self.stats["writes"] += 1
+        self._dirty.clear()
+
+    def rollback(self):
+        """отбрасывает незаписанные изменения; коллекции перечитаются с диска"""
+        with self._lock:
+            for filename in self._dirty:
+                self._identity_map.pop(filename, None)
+                self._signatures.pop(filename, None)
+                # объект мог быть изменён на месте — в тёплом состоянии его не оставляем
+                if self.warm:
+                    self.warm.discard(filename)
+            self._dirty.clear()
+            self._after_flush.clear()
+
+    @contextmanager
+    def unit_of_work(self):
+        """
+        группирует изменения: запись один раз при выходе из внешнего блока,
+        при исключении изменения отбрасываются
+        """
+        with self._lock:
+            if self._depth == 0:
+                # коллекции читаются и пишутся под одной блокировкой каталога
+                self._lock_dir()
+            self._depth += 1
+        try:
+            yield self
+        except BaseException:
+            with self._lock:
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        self.rollback()
+                    finally:
+                        self._unlock_dir()
+            raise
+        else:
+            with self._lock:
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        self.flush()
+                    finally:
+                        self._unlock_dir()
+
+
+_ENGINES: Dict[str, StorageEngine] = {}
+_ENGINES_LOCK = threading.Lock()
+
+
+def get_engine(data_dir: str) -> StorageEngine:
+    """общий движок для каталога данных"""
+    key = os.path.abspath(str(data_dir))
+    with _ENGINES_LOCK:
+        if key not in _ENGINES:
+            _ENGINES[key] = StorageEngine(data_dir)
+        return _ENGINES[key]
@@ -0,0 +1,255 @@
+import atexit
+import gc
+import hashlib
+import hmac
+import os
+import pickle
+import threading
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+from urllib.parse import quote, unquote
+
+from . import profiler
+from .settings import settings
+
+WARM_STATE_DIR = ".warm_state"
+# прежний формат: один дамп на весь каталог (удаляется при первой записи)
+LEGACY_WARM_STATE_FILE = ".warm_state.pickle"
+# меняется при изменении формата записи — старые записи просто игнорируются
+WARM_STATE_VERSION = 2
+# сколько записей коллекций копится до сохранения; остальное — при выходе
+SAVE_EVERY = 20
+
+MISSING = object()
+
+_MAGIC = b"VTWARM02"
+_DIGEST = hashlib.sha256
+
+
+def file_signature(path) -> Optional[Tuple[int, int]]:
+    """(mtime_ns, size) файла или None, если файла нет"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _load_secret() -> Optional[bytes]:
+    """
+    ключ HMAC записей: файл вне каталога данных (по умолчанию
+    ~/.valutatrade/warm_state.key), создаётся при первом запуске;
+    None — ключ недоступен, тёплое состояние живёт только в памяти
+    """
+    path = os.path.expanduser(settings.get("warm_state_key_path",
+                                           "~/.valutatrade/warm_state.key"))
+    try:
+        with open(path, "rb") as f:
+            secret = f.read()
+        if len(secret) >= 32:
+            return secret
+    except OSError:
+        pass
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        secret = os.urandom(32)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(secret)
+        return secret
+    except FileExistsError:
+        # ключ только что создал другой процесс
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+class WarmState:
+    """
+    тёплое состояние каталога данных: разобранные коллекции и построенные
+    объекты, по файлу на запись в data/.warm_state; запись действительна,
+    пока подпись исходного файла (mtime, размер) совпадает с сохранённой.
+    Записи подписаны HMAC ключом вне каталога данных — чужой или подменённый
+    pickle не распаковывается. Изменённые записи сохраняются пачкой раз
+    в SAVE_EVERY изменений и при выходе из процесса, а не при каждой записи
+    """
+
+    def __init__(self, data_dir: str):
+        # абсолютный путь: запись при выходе не зависит от cwd в этот момент
+        self.data_dir = os.path.abspath(str(data_dir))
+        self.path = os.path.join(self.data_dir, WARM_STATE_DIR)
+        self._lock = threading.RLock()
+        self._secret = _load_secret()
+        self._entries: Dict[str, Tuple[Tuple[int, int], Any]] = {}
+        # ключи, которые уже пробовали прочитать с диска
+        self._probed: Set[str] = set()
+        self._dirty: Set[str] = set()
+        self._changes = 0
+        self.stats = {"hits": 0, "misses": 0, "saves": 0, "rejected": 0}
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.path, quote(key, safe="") + ".pickle")
+
+    def _sign(self, payload: bytes) -> bytes:
+        return hmac.new(self._secret, payload, _DIGEST).digest()
+
+    def _read_entry(self, key: str):
+        """запись с диска после проверки подписи, версии и ключа"""
+        try:
+            with open(self._entry_path(key), "rb") as f:
+                raw = f.read()
+        except OSError:
+            return
+        header = len(_MAGIC) + _DIGEST().digest_size
+        payload = raw[header:]
+        if raw[:len(_MAGIC)] != _MAGIC or \
+                not hmac.compare_digest(raw[len(_MAGIC):header], self._sign(payload)):
+            self.stats["rejected"] += 1
+            return
+        # при распаковке создаются миллионы контейнеров — без сборщика мусора
+        # это примерно вдвое быстрее, циклических ссылок в записях нет
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            with profiler.phase(profiler.PHASE_STORAGE_LOAD):
+                version, stored_key, signature, value = pickle.loads(payload)
+            profiler.record_io(self._entry_path(key), read=len(raw))
+        except Exception:
+            # повреждённая запись — полная загрузка из исходного файла
+            return
+        finally:
+            if gc_enabled:
+                gc.enable()
+        if version == WARM_STATE_VERSION and stored_key == key:
+            self._entries[key] = (signature, value)
+
+    def get(self, key: str, signature: Optional[Tuple[int, int]]) -> Any:
+        """объект для key, если подпись исходного файла не изменилась; иначе MISSING"""
+        if signature is None:
+            return MISSING
+        with self._lock:
+            if key not in self._entries and key not in self._probed and self._secret:
+                self._probed.add(key)
+                self._read_entry(key)
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                self.stats["hits"] += 1
+                return entry[1]
+            self.stats["misses"] += 1
+            return MISSING
+
+    def put(self, key: str, signature: Optional[Tuple[int, int]], value: Any):
+        """запоминает объект, построенный из файла с подписью signature"""
+        if signature is None:
+            return
+        with self._lock:
+            self._probed.add(key)
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature and entry[1] is value:
+                return
+            self._entries[key] = (signature, value)
+            self._dirty.add(key)
+            self._changes += 1
+
+    def discard(self, key: str):
+        with self._lock:
+            self._probed.add(key)
+            self._dirty.discard(key)
+            if self._entries.pop(key, None) is not None:
+                try:
+                    os.remove(self._entry_path(key))
+                except OSError:
+                    pass
+
+    def load(self, key: str, path, build: Callable[[], Any]) -> Any:
+        """объект из тёплого состояния или build() с запоминанием результата"""
+        signature = file_signature(path)
+        value = self.get(key, signature)
+        if value is MISSING:
+            value = build()
+            self.put(key, signature, value)
+        return value
+
+    def maybe_save(self):
+        """сохраняет изменённые записи, если их накопилось SAVE_EVERY"""
+        if self._changes >= SAVE_EVERY:
+            self.save()
+
+    def save(self):
+        """атомарно записывает изменённые записи, каждую в свой файл"""
+        with self._lock:
+            self._changes = 0
+            if not self._dirty or not self._secret:
+                self._dirty.clear()
+                return
+            try:
+                os.makedirs(self.path, exist_ok=True)
+                legacy_path = os.path.join(self.data_dir, LEGACY_WARM_STATE_FILE)
+                if os.path.exists(legacy_path):
+                    os.remove(legacy_path)
+            except OSError:
+                return
+            for key in sorted(self._dirty):
+                signature, value = self._entries[key]
+                # исходный файл успел измениться — запись уже неактуальна
+                if file_signature(os.path.join(self.data_dir, key)) != signature:
+                    continue
+                self._write_entry(key, signature, value)
+            self._dirty.clear()
+            self._remove_orphans()
+            self.stats["saves"] += 1
+
+    def _remove_orphans(self):
+        """удаляет записи, чьих исходных файлов больше нет (старые снимки курсов)"""
+        try:
+            names = os.listdir(self.path)
+        except OSError:
+            return
+        for name in names:
+            if not name.endswith(".pickle"):
+                continue
+            key = unquote(name[:-len(".pickle")])
+            if not os.path.exists(os.path.join(self.data_dir, key)):
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except OSError:
+                    pass
+
+    def _write_entry(self, key: str, signature: Tuple[int, int], value: Any):
+        path = self._entry_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with profiler.phase(profiler.PHASE_STORAGE_SAVE):
+                payload = pickle.dumps((WARM_STATE_VERSION, key, signature, value),
+                                       protocol=pickle.HIGHEST_PROTOCOL)
+                with open(tmp_path, "wb") as f:
+                    f.write(_MAGIC + self._sign(payload) + payload)
+                os.replace(tmp_path, path)
+            profiler.record_io(path, written=len(payload))
+        except (OSError, pickle.PicklingError):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+_WARM_STATES: Dict[str, WarmState] = {}
+_WARM_STATES_LOCK = threading.Lock()
+
+
+def get_warm_state(data_dir: str) -> Optional[WarmState]:
+    """общее тёплое состояние каталога данных; None, если выключено в настройках"""
+    if not settings.get("warm_state", True):
+        return None
+    key = os.path.abspath(str(data_dir))
+    with _WARM_STATES_LOCK:
+        if key not in _WARM_STATES:
+            _WARM_STATES[key] = WarmState(data_dir)
+        return _WARM_STATES[key]
+
+
+@atexit.register
+def _save_warm_states():
+    """несохранённые записи тёплого состояния — при завершении процесса"""
+    for warm in list(_WARM_STATES.values()):
+        warm.save()
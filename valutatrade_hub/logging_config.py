@@ -35,5 +35,8 @@ def setup_logging():
     action_logger.setLevel(logging.INFO)
     action_logger.addHandler(file_handler)
     action_logger.addHandler(console_handler)
+    # обработчики те же, что у корневого логгера: без этого каждая строка
+    # попадала бы в actions.log дважды
+    action_logger.propagate = False
     
     return action_logger
\ No newline at end of file
@@ -1,11 +1,22 @@
 import logging
 from abc import ABC, abstractmethod
-from typing import Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+from urllib.parse import urlsplit
 
 import requests
 
+from ..core.currencies import (
+    get_all_currencies,
+    get_crypto_currencies,
+    register_crypto_coins,
+    register_fiat_codes,
+)
 from ..core.exceptions import ApiRequestError
+from ..infra import profiler
+from .coin_ids import CoinIdDirectory
 from .config import ParserConfig
+from .rate_limiter import TokenBucket
 
 
 class BaseApiClient(ABC):
@@ -14,6 +25,7 @@ class BaseApiClient(ABC):
     def __init__(self, config: ParserConfig):
         self.config = config
         self.logger = logging.getLogger('parser')
+        self.session = requests.Session()
     
     @abstractmethod
     def fetch_rates(self) -> Dict[str, float]:
@@ -23,9 +35,11 @@ class BaseApiClient(ABC):
     def _make_request(self, url: str) -> dict:
         """выполняет HTTP запрос с обработкой ошибок"""
         try:
-            response = requests.get(url, timeout=self.config.REQUEST_TIMEOUT)
-            response.raise_for_status()
-            return response.json()
+            with profiler.phase(profiler.PHASE_HTTP):
+                response = self.session.get(url, timeout=self.config.REQUEST_TIMEOUT)
+                profiler.record_io(urlsplit(url).netloc, read=len(response.content))
+                response.raise_for_status()
+                return response.json()
         except requests.exceptions.RequestException as e:
             self.logger.error(f"Request failed: {e}")
             raise ApiRequestError(f"Network error: {e}")
@@ -36,32 +50,109 @@ class BaseApiClient(ABC):
 
 class CoinGeckoClient(BaseApiClient):
     """клиент для CoinGecko API"""
+
+    def __init__(self, config: ParserConfig):
+        super().__init__(config)
+        self.limiter = TokenBucket(config.COINGECKO_RATE_LIMIT,
+                                   config.COINGECKO_RATE_BURST)
+        self.coin_ids = CoinIdDirectory(config, self._limited_request)
+
+    def _limited_request(self, url: str) -> dict:
+        self.limiter.acquire()
+        return self._make_request(url)
     
     def fetch_rates(self) -> Dict[str, float]:
-        """получает курсы криптовалют"""
+        """получает курсы криптовалют частями, параллельно и с ограничением частоты"""
         self.logger.info("Fetching crypto rates from CoinGecko")
         
-        crypto_ids = [self.config.CRYPTO_ID_MAP[code] for code in self.config.CRYPTO_CURRENCIES]
-        ids_param = ",".join(crypto_ids)
-        
-        url = f"{self.config.COINGECKO_URL}?ids={ids_param}&vs_currencies=usd"
+        id_map = self._resolve_ids()
+        if not id_map:
+            self.logger.warning("No crypto currencies with known CoinGecko ids")
+            return {}
+
+        ids = list(dict.fromkeys(id_map.values()))
+        chunk_size = max(1, self.config.COINGECKO_CHUNK_SIZE)
+        chunks = [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+        workers = max(1, min(self.config.COINGECKO_MAX_WORKERS, len(chunks)))
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(self._fetch_chunk, chunks))
+
+        data = {}
+        failed = 0
+        for chunk_data in results:
+            if chunk_data is None:
+                failed += 1
+            else:
+                data.update(chunk_data)
+
+        if failed == len(chunks):
+            self.logger.error("Failed to fetch crypto rates")
+            raise ApiRequestError(f"All {failed} CoinGecko requests failed")
+        if failed:
+            self.logger.warning(f"CoinGecko: {failed} of {len(chunks)} chunks failed, "
+                                f"using partial data")
+
+        rates = {}
+        for crypto_code, crypto_id in id_map.items():
+            if crypto_id in data and "usd" in data[crypto_id]:
+                rate_key = f"{crypto_code}_{self.config.BASE_CURRENCY}"
+                rates[rate_key] = data[crypto_id]["usd"]
         
+        self.logger.info(f"Fetched {len(rates)} crypto rates")
+        return rates
+
+    def _fetch_chunk(self, ids: List[str]):
+        """один запрос для части id; None при ошибке"""
+        url = f"{self.config.COINGECKO_URL}?ids={','.join(ids)}&vs_currencies=usd"
         try:
-            data = self._make_request(url)
-            rates = {}
-            
-            for crypto_code in self.config.CRYPTO_CURRENCIES:
-                crypto_id = self.config.CRYPTO_ID_MAP[crypto_code]
-                if crypto_id in data and "usd" in data[crypto_id]:
-                    rate_key = f"{crypto_code}_{self.config.BASE_CURRENCY}"
-                    rates[rate_key] = data[crypto_id]["usd"]
-            
-            self.logger.info(f"Fetched {len(rates)} crypto rates")
-            return rates
-            
-        except ApiRequestError:
-            self.logger.error("Failed to fetch crypto rates")
-            raise
+            return self._limited_request(url)
+        except ApiRequestError as e:
+            self.logger.error(f"CoinGecko chunk of {len(ids)} ids failed: {e}")
+            return None
+
+    def _register_top_coins(self):
+        """добавляет в реестр крупнейшие монеты из справочника (с их id)"""
+        try:
+            coins = self.coin_ids.top_coins()
+        except ApiRequestError as e:
+            self.logger.warning(f"CoinGecko coin list unavailable: {e}")
+            return
+        added = register_crypto_coins(coins)
+        if added:
+            self.logger.info(f"Registered {added} crypto currencies from CoinGecko")
+
+    def _resolve_ids(self) -> Dict[str, str]:
+        """
+        код криптовалюты -> id CoinGecko: CRYPTO_ID_MAP, provider_id из реестра,
+        остальные коды — по справочнику монет (сеть нужна только при его загрузке)
+        """
+        if not self.config.CRYPTO_CURRENCIES and self.config.COINGECKO_TOP_COINS > 0:
+            self._register_top_coins()
+
+        registry = get_crypto_currencies()
+        codes = self.config.CRYPTO_CURRENCIES or tuple(registry)
+
+        id_map = {}
+        unresolved = []
+        for code in codes:
+            crypto_id = self.config.CRYPTO_ID_MAP.get(code)
+            if not crypto_id and code in registry:
+                crypto_id = registry[code].provider_id
+            if crypto_id:
+                id_map[code] = crypto_id
+            else:
+                unresolved.append(code)
+
+        if unresolved:
+            try:
+                id_map.update(self.coin_ids.resolve(unresolved))
+            except ApiRequestError as e:
+                self.logger.warning(f"CoinGecko coin list unavailable: {e}")
+            for code in unresolved:
+                if code not in id_map:
+                    self.logger.warning(f"Unknown CoinGecko id for {code}")
+        return id_map
 
 
 class ExchangeRateApiClient(BaseApiClient):
@@ -86,13 +177,22 @@ class ExchangeRateApiClient(BaseApiClient):
             
             rates = {}
 
-            available_currencies = list(data.get("conversion_rates", {}).keys())
-            self.logger.info(f"Available currencies from API: {len(available_currencies)} currencies")
+            conversion_rates = data.get("conversion_rates", {})
+            self.logger.info(
+                f"Available currencies from API: {len(conversion_rates)} currencies")
+
+            currencies = self.config.FIAT_CURRENCIES or tuple(
+                code for code in conversion_rates if code != self.config.BASE_CURRENCY
+            )
+            register_fiat_codes(currencies)
+            registry = get_all_currencies()
 
-            for currency in self.config.FIAT_CURRENCIES:
-                if currency in data.get("conversion_rates", {}):
+            # conversion_rates — единиц валюты за 1 BASE, пары храним как CUR_BASE
+            for currency in currencies:
+                rate = conversion_rates.get(currency)
+                if rate and currency in registry:
                     rate_key = f"{currency}_{self.config.BASE_CURRENCY}"
-                    rates[rate_key] = data["conversion_rates"][currency]
+                    rates[rate_key] = 1.0 / rate
             
             self.logger.info(f"Fetched {len(rates)} fiat rates")
             return rates
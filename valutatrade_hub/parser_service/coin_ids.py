@@ -0,0 +1,175 @@
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from ..core.exceptions import ApiRequestError
+from ..infra.serializers import get_serializer
+from ..infra.warm_state import get_warm_state
+from .config import ParserConfig
+
+MARKETS_PAGE_SIZE = 250
+
+
+def build_symbol_index(coins: Iterable[Dict[str, Any]]) -> Dict[str, str]:
+    """
+    символ -> id монеты; один символ носят десятки монет, побеждает
+    монета с наибольшей капитализацией (без капитализации — последними)
+    """
+    ranked = sorted(
+        (coin for coin in coins if coin.get("symbol") and coin.get("id")),
+        key=lambda coin: (-(coin.get("market_cap") or 0.0), coin["id"])
+    )
+    index: Dict[str, str] = {}
+    for coin in ranked:
+        index.setdefault(coin["symbol"].upper(), coin["id"])
+    return index
+
+
+def build_top_coins(coins: Iterable[Dict[str, Any]],
+                    limit: int) -> List[Dict[str, Any]]:
+    """первые limit монет по капитализации (монеты без капитализации не входят)"""
+    ranked = sorted(
+        (coin for coin in coins
+         if coin.get("symbol") and coin.get("id") and coin.get("market_cap")),
+        key=lambda coin: (-coin["market_cap"], coin["id"])
+    )
+    return ranked[:max(0, limit)]
+
+
+class CoinIdDirectory:
+    """
+    справочник id монет CoinGecko: список монет скачивается один раз и
+    хранится на диске COINGECKO_COINS_TTL секунд, в памяти — индекс символ -> id
+    """
+
+    def __init__(self, config: ParserConfig, fetch: Callable[[str], Any]):
+        self.config = config
+        self.fetch = fetch
+        self.path = config.COINGECKO_COINS_FILE_PATH
+        self.logger = logging.getLogger('parser')
+        self._lock = threading.Lock()
+        self._index: Optional[Dict[str, str]] = None
+        self._top: List[Dict[str, Any]] = []
+        self._fetched_at: Optional[datetime] = None
+        self.stats = {"downloads": 0, "file_loads": 0}
+
+    def _is_fresh(self, fetched_at: Optional[datetime]) -> bool:
+        ttl = timedelta(seconds=self.config.COINGECKO_COINS_TTL)
+        return fetched_at is not None and datetime.now() - fetched_at < ttl
+
+    def _load_file(self) -> Optional[Dict[str, Any]]:
+        """индекс из файла справочника; разбор кэшируется в тёплом состоянии"""
+        if not os.path.exists(self.path):
+            return None
+
+        limit = self.config.COINGECKO_TOP_COINS
+
+        def build() -> Dict[str, Any]:
+            data = get_serializer().load_file(self.path)
+            coins = data["coins"]
+            return {"fetched_at": data["fetched_at"],
+                    "index": build_symbol_index(coins),
+                    "top": build_top_coins(coins, limit),
+                    "top_limit": limit}
+
+        warm = get_warm_state(os.path.dirname(self.path) or ".")
+        # ключ — имя файла: по нему тёплое состояние проверяет подпись
+        key = os.path.basename(self.path)
+        try:
+            if not warm:
+                return build()
+            cached = warm.load(key, self.path, build)
+            if cached.get("top_limit") != limit:
+                # другой размер списка крупнейших монет — пересборка
+                warm.discard(key)
+                cached = warm.load(key, self.path, build)
+            return cached
+        except (ValueError, KeyError, OSError) as e:
+            self.logger.warning(f"Ignoring broken CoinGecko coin list {self.path}: {e}")
+            return None
+
+    def _download(self) -> List[Dict[str, Any]]:
+        """/coins/list и капитализации первых страниц /coins/markets"""
+        coins = self.fetch(self.config.COINGECKO_COINS_LIST_URL)
+        if not isinstance(coins, list):
+            raise ApiRequestError("Unexpected /coins/list response")
+
+        market_caps: Dict[str, float] = {}
+        for page in range(1, self.config.COINGECKO_MARKET_PAGES + 1):
+            url = (f"{self.config.COINGECKO_MARKETS_URL}"
+                   f"?vs_currency=usd&order=market_cap_desc"
+                   f"&per_page={MARKETS_PAGE_SIZE}&page={page}")
+            try:
+                markets = self.fetch(url)
+            except ApiRequestError as e:
+                # без капитализаций коллизии решаются хуже, но справочник полезен
+                self.logger.warning(f"CoinGecko markets page {page} failed: {e}")
+                break
+            for market in markets or []:
+                if market.get("id") and market.get("market_cap"):
+                    market_caps[market["id"]] = float(market["market_cap"])
+            if len(markets or []) < MARKETS_PAGE_SIZE:
+                break
+
+        return [{"id": coin["id"], "symbol": coin["symbol"], "name": coin.get("name"),
+                 "market_cap": market_caps.get(coin["id"])}
+                for coin in coins if coin.get("id") and coin.get("symbol")]
+
+    def _save(self, coins: List[Dict[str, Any]], fetched_at: datetime):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        get_serializer().dump_file(
+            {"fetched_at": fetched_at.isoformat(), "coins": coins}, tmp_path)
+        os.replace(tmp_path, self.path)
+
+    def _ensure_index(self) -> Dict[str, str]:
+        if self._index is not None and self._is_fresh(self._fetched_at):
+            return self._index
+
+        cached = self._load_file()
+        cached_at = datetime.fromisoformat(cached["fetched_at"]) if cached else None
+        if cached and self._is_fresh(cached_at):
+            self.stats["file_loads"] += 1
+            self._index, self._top = cached["index"], cached["top"]
+            self._fetched_at = cached_at
+            return self._index
+
+        try:
+            coins = self._download()
+        except ApiRequestError as e:
+            if cached is None:
+                raise
+            # устаревший справочник лучше, чем никакого; следующая попытка — через TTL
+            self.logger.warning(
+                f"Using stale CoinGecko coin list from {cached_at}: {e}")
+            self._index, self._top = cached["index"], cached["top"]
+            self._fetched_at = datetime.now()
+            return self._index
+
+        fetched_at = datetime.now()
+        self.stats["downloads"] += 1
+        try:
+            self._save(coins, fetched_at)
+        except OSError as e:
+            self.logger.warning(f"Failed to cache CoinGecko coin list: {e}")
+        self._index, self._fetched_at = build_symbol_index(coins), fetched_at
+        self._top = build_top_coins(coins, self.config.COINGECKO_TOP_COINS)
+        self.logger.info(f"Loaded CoinGecko coin list: {len(coins)} coins, "
+                         f"{len(self._index)} symbols")
+        return self._index
+
+    def resolve(self, codes: Iterable[str]) -> Dict[str, str]:
+        """id для кодов, которые есть в справочнике"""
+        with self._lock:
+            index = self._ensure_index()
+        return {code: index[code] for code in codes if code in index}
+
+    def top_coins(self) -> List[Dict[str, Any]]:
+        """крупнейшие по капитализации монеты (COINGECKO_TOP_COINS штук)"""
+        with self._lock:
+            self._ensure_index()
+            return list(self._top)
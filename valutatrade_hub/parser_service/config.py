@@ -14,16 +14,60 @@ class ParserConfig:
     EXCHANGERATE_API_URL: str = "https://v6.exchangerate-api.com/v6"
 
     BASE_CURRENCY: str = "USD"
-    FIAT_CURRENCIES: tuple = ("EUR", "GBP", "RUB", "JPY")
-    CRYPTO_CURRENCIES: tuple = ("BTC", "ETH", "LTC", "ADA")
-    CRYPTO_ID_MAP: Dict[str, str] = field(default_factory=lambda: {
-        "BTC": "bitcoin",
-        "ETH": "ethereum", 
-        "LTC": "litecoin",
-        "ADA": "cardano",
-    })
+    # пустой кортеж — все фиатные валюты из ответа ExchangeRate-API
+    FIAT_CURRENCIES: tuple = ()
+    # пустой кортеж — все криптовалюты реестра
+    CRYPTO_CURRENCIES: tuple = ()
+    # явные id CoinGecko поверх provider_id из реестра и справочника монет
+    CRYPTO_ID_MAP: Dict[str, str] = field(default_factory=dict)
+
+    # справочник монет CoinGecko (/coins/list) для кодов без известного id:
+    # хранится на диске COINGECKO_COINS_TTL секунд, коллизии символов решаются
+    # по капитализации из первых COINGECKO_MARKET_PAGES страниц /coins/markets
+    COINGECKO_COINS_LIST_URL: str = "https://api.coingecko.com/api/v3/coins/list"
+    COINGECKO_MARKETS_URL: str = "https://api.coingecko.com/api/v3/coins/markets"
+    COINGECKO_COINS_FILE_PATH: str = "data/coingecko_coins.json"
+    COINGECKO_COINS_TTL: int = 7 * 24 * 3600
+    COINGECKO_MARKET_PAGES: int = 4
+    # сколько крупнейших по капитализации монет из справочника регистрировать
+    # в реестре автоматически (0 — только валюты из data/currencies.json);
+    # капитализации известны только для первых COINGECKO_MARKET_PAGES * 250 монет
+    COINGECKO_TOP_COINS: int = 300
 
     RATES_FILE_PATH: str = "data/rates.json"
+    # сколько последних версий снимков курсов хранить в data/rates_snapshots
+    RATES_SNAPSHOT_KEEP: int = 5
     HISTORY_FILE_PATH: str = "data/exchange_rates.json"
+    HISTORY_ARCHIVE_DIR: str = "data/history_archive"
+    # курс пишется в историю, только если изменился больше чем на эту долю
+    HISTORY_CHANGE_TOLERANCE: float = 0.0
+    # сырые записи хранятся HISTORY_RAW_RETENTION_DAYS дней, затем прореживаются
+    # до одной записи на HISTORY_DOWNSAMPLE_SECONDS и уходят в сжатый архив;
+    # архивные сегменты старше HISTORY_ARCHIVE_RETENTION_DAYS удаляются (0 — никогда)
+    HISTORY_RAW_RETENTION_DAYS: int = 7
+    HISTORY_DOWNSAMPLE_SECONDS: int = 3600
+    HISTORY_ARCHIVE_RETENTION_DAYS: int = 365
+    HISTORY_AUTO_COMPACT: bool = True
+    SOURCES_HEALTH_FILE_PATH: str = "data/sources_health.json"
+
+    REQUEST_TIMEOUT: int = 10
+
+    # circuit breaker: после CIRCUIT_FAILURE_THRESHOLD ошибок подряд источник
+    # пропускается CIRCUIT_RESET_TIMEOUT секунд, затем делается пробный запрос
+    CIRCUIT_FAILURE_THRESHOLD: int = 3
+    CIRCUIT_RESET_TIMEOUT: int = 300
+    HEALTH_WINDOW: int = 50
+
+    # CoinGecko: не больше COINGECKO_CHUNK_SIZE id в одном запросе,
+    # до COINGECKO_MAX_WORKERS параллельных запросов, token bucket на частоту запросов
+    COINGECKO_CHUNK_SIZE: int = 100
+    COINGECKO_MAX_WORKERS: int = 4
+    COINGECKO_RATE_LIMIT: float = 0.5
+    COINGECKO_RATE_BURST: int = 5
 
-    REQUEST_TIMEOUT: int = 10
\ No newline at end of file
+    # потоковый приём тиков (stream-rates): очередь на STREAM_QUEUE_SIZE тиков,
+    # запись пакетом раз в STREAM_BATCH_INTERVAL секунд
+    # или каждые STREAM_BATCH_SIZE тиков
+    STREAM_QUEUE_SIZE: int = 10000
+    STREAM_BATCH_INTERVAL: float = 0.25
+    STREAM_BATCH_SIZE: int = 1000
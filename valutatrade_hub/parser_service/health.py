@@ -0,0 +1,119 @@
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+
+class SourceHealthTracker:
+    """
+    circuit breaker (closed/open/half_open) и скользящая статистика по источникам,
+    состояние хранится в sources_health.json между запусками
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, config):
+        self.config = config
+        self._state: Optional[Dict[str, Dict[str, Any]]] = None
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if self._state is None:
+            path = self.config.SOURCES_HEALTH_FILE_PATH
+            self._state = {}
+            if os.path.exists(path):
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        self._state = json.load(f)
+                except (json.JSONDecodeError, OSError):
+                    self._state = {}
+        return self._state
+
+    def _save(self):
+        path = self.config.SOURCES_HEALTH_FILE_PATH
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._state, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _source(self, name: str) -> Dict[str, Any]:
+        return self._load().setdefault(name, {
+            "state": self.CLOSED,
+            "consecutive_failures": 0,
+            "opened_at": None,
+            "last_error": None,
+            "last_success_at": None,
+            "samples": []
+        })
+
+    def get_state(self, name: str) -> str:
+        """текущее состояние с учётом истечения таймаута открытой цепи"""
+        source = self._source(name)
+        if source["state"] == self.OPEN and source["opened_at"]:
+            opened_at = datetime.fromisoformat(source["opened_at"])
+            reset_timeout = timedelta(seconds=self.config.CIRCUIT_RESET_TIMEOUT)
+            if datetime.now() - opened_at >= reset_timeout:
+                return self.HALF_OPEN
+        return source["state"]
+
+    def allow_request(self, name: str) -> bool:
+        """можно ли обращаться к источнику; в half_open пропускается пробный запрос"""
+        state = self.get_state(name)
+        if state == self.HALF_OPEN:
+            self._source(name)["state"] = self.HALF_OPEN
+        return state != self.OPEN
+
+    def _add_sample(self, source: Dict[str, Any], ok: bool, latency_ms: float):
+        source["samples"].append([1 if ok else 0, round(latency_ms, 1)])
+        del source["samples"][:-self.config.HEALTH_WINDOW]
+
+    def record_success(self, name: str, latency_ms: float):
+        source = self._source(name)
+        self._add_sample(source, True, latency_ms)
+        source["state"] = self.CLOSED
+        source["consecutive_failures"] = 0
+        source["opened_at"] = None
+        source["last_success_at"] = datetime.now().isoformat()
+        self._save()
+
+    def record_failure(self, name: str, latency_ms: float, error: str):
+        source = self._source(name)
+        self._add_sample(source, False, latency_ms)
+        source["consecutive_failures"] += 1
+        source["last_error"] = error
+
+        threshold = self.config.CIRCUIT_FAILURE_THRESHOLD
+        if (source["state"] == self.HALF_OPEN
+                or source["consecutive_failures"] >= threshold):
+            source["state"] = self.OPEN
+            source["opened_at"] = datetime.now().isoformat()
+        self._save()
+
+    def get_status(self) -> Dict[str, Dict[str, Any]]:
+        """сводка по всем источникам для sources-status"""
+        status = {}
+        for name, source in self._load().items():
+            samples = source["samples"]
+            latencies = sorted(latency for _, latency in samples)
+            success_rate = avg_latency = p95_latency = None
+            if samples:
+                success_rate = sum(ok for ok, _ in samples) / len(samples)
+                avg_latency = sum(latencies) / len(latencies)
+                p95_latency = latencies[int(0.95 * (len(latencies) - 1))]
+            retry_at = None
+            if source["state"] == self.OPEN and source["opened_at"]:
+                retry_at = (datetime.fromisoformat(source["opened_at"])
+                            + timedelta(seconds=self.config.CIRCUIT_RESET_TIMEOUT))
+            status[name] = {
+                "state": self.get_state(name),
+                "requests": len(samples),
+                "success_rate": success_rate,
+                "avg_latency_ms": avg_latency,
+                "p95_latency_ms": p95_latency,
+                "consecutive_failures": source["consecutive_failures"],
+                "last_error": source["last_error"],
+                "last_success_at": source["last_success_at"],
+                "retry_at": retry_at
+            }
+        return status
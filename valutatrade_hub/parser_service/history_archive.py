@@ -0,0 +1,145 @@
+import gzip
+import os
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from ..infra import profiler
+from ..infra.serializers import get_serializer
+
+
+class HistoryArchive:
+    """
+    архив истории курсов: сжатые дневные сегменты history_archive/YYYY-MM-DD.json.gz
+    в колоночном формате {pair: {"t": [...], "r": [...], "s": [...]}}
+    """
+
+    SUFFIX = ".json.gz"
+
+    def __init__(self, archive_dir: str):
+        self.archive_dir = archive_dir
+
+    def _segment_path(self, day: date) -> str:
+        return os.path.join(self.archive_dir, f"{day.isoformat()}{self.SUFFIX}")
+
+    def segment_days(self) -> List[date]:
+        """даты всех сегментов по возрастанию"""
+        if not os.path.isdir(self.archive_dir):
+            return []
+        days = []
+        for name in os.listdir(self.archive_dir):
+            if name.endswith(self.SUFFIX):
+                try:
+                    days.append(date.fromisoformat(name[:-len(self.SUFFIX)]))
+                except ValueError:
+                    continue
+        return sorted(days)
+
+    def signature(self) -> Optional[int]:
+        """меняется при любой записи или удалении сегмента"""
+        if not os.path.isdir(self.archive_dir):
+            return None
+        return os.stat(self.archive_dir).st_mtime_ns
+
+    def _read_segment(self, day: date) -> Dict[str, Dict[str, list]]:
+        try:
+            path = self._segment_path(day)
+            with profiler.phase(profiler.PHASE_STORAGE_LOAD):
+                with gzip.open(path, 'rb') as f:
+                    raw = f.read()
+                profiler.record_io(path, read=os.path.getsize(path))
+                return get_serializer().loads(raw)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_segment(self, day: date, columns: Dict[str, Dict[str, list]]):
+        os.makedirs(self.archive_dir, exist_ok=True)
+        path = self._segment_path(day)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with profiler.phase(profiler.PHASE_STORAGE_SAVE):
+            with gzip.open(tmp_path, 'wb') as f:
+                f.write(get_serializer().dumps(columns))
+            profiler.record_io(path, written=os.path.getsize(tmp_path))
+        os.replace(tmp_path, path)
+
+    def append(self, records: Iterable[dict]) -> int:
+        """дописывает записи в дневные сегменты; возвращает число затронутых"""
+        by_day: Dict[date, List[dict]] = {}
+        for record in records:
+            day = datetime.fromisoformat(record["timestamp"]).date()
+            by_day.setdefault(day, []).append(record)
+
+        for day, day_records in by_day.items():
+            columns = self._read_segment(day)
+            for record in day_records:
+                pair = f"{record['from_currency']}_{record['to_currency']}"
+                column = columns.setdefault(pair, {"t": [], "r": [], "s": []})
+                column["t"].append(record["timestamp"])
+                column["r"].append(record["rate"])
+                column["s"].append(record.get("source"))
+
+            for column in columns.values():
+                # повторная запись той же точки (например, при повторном импорте)
+                # заменяет старую
+                points = dict(zip(column["t"], zip(column["r"], column["s"])))
+                column["t"] = sorted(points)
+                column["r"] = [points[t][0] for t in column["t"]]
+                column["s"] = [points[t][1] for t in column["t"]]
+            self._write_segment(day, columns)
+
+        return len(by_day)
+
+    def read(self, since: Optional[datetime] = None) -> List[dict]:
+        """записи из сегментов, начиная с since (весь архив, если не задано)"""
+        return list(self.iter_records(since))
+
+    def iter_records(self, since: Optional[datetime] = None) -> Iterator[dict]:
+        """потоковое чтение: в памяти не больше одного сегмента"""
+        for day in self.segment_days():
+            if since and day < since.date():
+                continue
+            for pair, column in self._read_segment(day).items():
+                from_currency, to_currency = pair.split('_')
+                points = zip(column["t"], column["r"], column["s"])
+                for timestamp, rate, source in points:
+                    if since and timestamp < since.isoformat():
+                        continue
+                    yield {
+                        "from_currency": from_currency,
+                        "to_currency": to_currency,
+                        "rate": rate,
+                        "timestamp": timestamp,
+                        "source": source
+                    }
+
+    def prune(self, keep_days: int) -> int:
+        """удаляет сегменты старше keep_days дней; 0 — хранить всё"""
+        if keep_days <= 0:
+            return 0
+        cutoff = date.today() - timedelta(days=keep_days)
+        removed = 0
+        for day in self.segment_days():
+            if day < cutoff:
+                os.remove(self._segment_path(day))
+                removed += 1
+        return removed
+
+    def size_bytes(self) -> int:
+        return sum(
+            os.path.getsize(self._segment_path(day)) for day in self.segment_days()
+        )
+
+
+def downsample(records: Iterable[dict], interval_seconds: int) -> List[dict]:
+    """оставляет последнюю запись каждой пары в каждом интервале interval_seconds"""
+    buckets: Dict[tuple, dict] = {}
+    for record in records:
+        moment = datetime.fromisoformat(record["timestamp"])
+        seconds = moment.hour * 3600 + moment.minute * 60 + moment.second
+        key = (
+            record["from_currency"], record["to_currency"],
+            moment.date(), seconds // interval_seconds
+        )
+        current = buckets.get(key)
+        if current is None or record["timestamp"] >= current["timestamp"]:
+            buckets[key] = record
+    return sorted(buckets.values(), key=lambda record: record["timestamp"])
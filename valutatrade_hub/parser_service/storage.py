@@ -1,8 +1,13 @@
-import json
+import heapq
 import os
-from datetime import datetime
+import shutil
+from datetime import date, datetime, timedelta
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from ..infra.serializers import get_serializer, iter_json_array
+from ..infra.snapshots import RatesSnapshotStore
+from .history_archive import HistoryArchive, downsample
 
 
 class RatesStorage:
@@ -11,13 +16,17 @@ class RatesStorage:
     def __init__(self, config):
         self.config = config
         self._ensure_data_dir()
+        self.snapshots = RatesSnapshotStore(
+            os.path.dirname(config.RATES_FILE_PATH) or ".", config.RATES_SNAPSHOT_KEEP
+        )
+        self.archive = HistoryArchive(config.HISTORY_ARCHIVE_DIR)
     
     def _ensure_data_dir(self):
         """создает директорию для данных если не существует"""
         Path("data").mkdir(exist_ok=True)
     
-    def save_current_rates(self, rates: Dict[str, float], source: str):
-        """сохраняет текущие курсы в rates.json"""
+    def save_current_rates(self, rates: Dict[str, float], source: str) -> int:
+        """публикует текущие курсы новой неизменяемой версией снимка"""
         current_data = {
             "pairs": {},
             "last_refresh": datetime.now().isoformat()
@@ -30,45 +39,281 @@ class RatesStorage:
                 "source": source
             }
         
-        with open(self.config.RATES_FILE_PATH, 'w', encoding='utf-8') as f:
-            json.dump(current_data, f, indent=2, ensure_ascii=False)
+        return self.snapshots.publish(current_data)
+
+    def merge_current_rates(self, rates: Dict[str, float], source: str,
+                            timestamps: Optional[Dict[str, str]] = None) -> int:
+        """публикует снимок, в котором обновлены только переданные пары"""
+        now = datetime.now().isoformat()
+        pairs = dict(self.load_current_rates().get("pairs", {}))
+        for pair, rate in rates.items():
+            pairs[pair] = {
+                "rate": rate,
+                "updated_at": (timestamps or {}).get(pair, now),
+                "source": source
+            }
+        return self.snapshots.publish({"pairs": pairs, "last_refresh": now})
     
-    def save_historical_record(self, from_currency: str, to_currency: str, rate: float, source: str, meta: dict = None):
-        """сохраняет историческую запись в exchange_rates.json"""
+    def _make_historical_record(self, from_currency: str, to_currency: str, rate: float,
+                                source: str, meta: dict = None,
+                                timestamp: Optional[str] = None) -> dict:
         record = {
-            "id": f"{from_currency}_{to_currency}_{datetime.now().isoformat()}",
             "from_currency": from_currency,
             "to_currency": to_currency,
             "rate": rate,
-            "timestamp": datetime.now().isoformat(),
-            "source": source,
-            "meta": meta or {}
+            "timestamp": timestamp or datetime.now().isoformat(),
+            "source": source
         }
-        
-        historical_data = self.load_historical_data()
-        historical_data.append(record)
-        
-        with open(self.config.HISTORY_FILE_PATH, 'w', encoding='utf-8') as f:
-            json.dump(historical_data, f, indent=2, ensure_ascii=False)
-    
-    def load_historical_data(self) -> List[dict]:
-        """загружает исторические данные"""
+        if meta:
+            record["meta"] = meta
+        return record
+
+    def save_historical_record(self, from_currency: str, to_currency: str, rate: float, source: str, meta: dict = None):
+        """сохраняет историческую запись в exchange_rates.json"""
+        self.save_historical_records(
+            {f"{from_currency}_{to_currency}": rate}, source, meta
+        )
+
+    def _is_changed(self, last_rate: float, rate: float) -> bool:
+        if last_rate is None:
+            return True
+        if last_rate == 0:
+            return rate != 0
+        change = abs(rate - last_rate) / abs(last_rate)
+        return change > self.config.HISTORY_CHANGE_TOLERANCE
+
+    def save_historical_records(self, rates: Dict[str, float], source: str,
+                                meta: dict = None,
+                                timestamps: Optional[Dict[str, str]] = None) -> int:
+        """
+        дописывает в историю только изменившиеся курсы (с допуском
+        HISTORY_CHANGE_TOLERANCE) за одно чтение и одну запись файла;
+        timestamps — время курса по паре (по умолчанию — текущее);
+        возвращает число записанных курсов
+        """
+        if not rates:
+            return 0
+        codes = {pair: pair.split('_') for pair in rates}
+        invalid = [pair for pair, pair_codes in codes.items() if len(pair_codes) != 2]
+        if invalid:
+            raise ValueError(f"Invalid currency pairs: {', '.join(invalid)}")
+
+        historical_data = self._load_hot_history()
+        last_rates: Dict[str, float] = {}
+        missing = set(rates)
+        for record in reversed(historical_data):
+            if not missing:
+                break
+            pair = f"{record['from_currency']}_{record['to_currency']}"
+            if pair in missing:
+                last_rates[pair] = record["rate"]
+                missing.discard(pair)
+
+        written = 0
+        for pair, rate in rates.items():
+            if not self._is_changed(last_rates.get(pair), rate):
+                continue
+            from_currency, to_currency = codes[pair]
+            historical_data.append(
+                self._make_historical_record(
+                    from_currency, to_currency, rate, source, meta,
+                    (timestamps or {}).get(pair)
+                )
+            )
+            written += 1
+
+        if self.config.HISTORY_AUTO_COMPACT and self._needs_compaction(historical_data):
+            self._compact(historical_data)
+        elif written:
+            self._write_hot_history(historical_data)
+        return written
+
+    def _import_staging_dir(self) -> str:
+        return f"{self.config.HISTORY_FILE_PATH}.import"
+
+    def begin_history_import(self, resume: bool = False):
+        """
+        начинает импорт истории; без resume отбрасывает пачки, оставшиеся
+        от прерванного импорта
+        """
+        if not resume:
+            shutil.rmtree(self._import_staging_dir(), ignore_errors=True)
+
+    def stage_historical_records(self, records: List[dict]):
+        """
+        пачка импортируемых записей дописывается в дневные файлы подготовки
+        (JSON Lines); история и архив меняются один раз в finish_history_import
+        """
+        by_day: Dict[str, List[dict]] = {}
+        for record in records:
+            by_day.setdefault(record["timestamp"][:10], []).append(record)
+
+        staging = self._import_staging_dir()
+        os.makedirs(staging, exist_ok=True)
+        # файлы подготовки — JSON Lines, поэтому без форматирования с отступами
+        serializer = get_serializer("auto")
+        for day, day_records in by_day.items():
+            with open(os.path.join(staging, f"{day}.jsonl"), 'ab') as f:
+                f.write(b"".join(serializer.dumps(record) + b"\n"
+                                 for record in day_records))
+
+    def _staged_days(self) -> List[date]:
+        staging = self._import_staging_dir()
+        if not os.path.isdir(staging):
+            return []
+        return sorted(date.fromisoformat(name[:-len(".jsonl")])
+                      for name in os.listdir(staging) if name.endswith(".jsonl"))
+
+    def _read_staged(self, day: date) -> List[dict]:
+        path = os.path.join(self._import_staging_dir(), f"{day.isoformat()}.jsonl")
+        serializer = get_serializer("auto")
+        with open(path, 'rb') as f:
+            return [serializer.loads(line) for line in f if line.strip()]
+
+    def finish_history_import(self) -> Dict[str, int]:
+        """
+        переносит подготовленные записи: старше срока хранения — в архив
+        (по дню за раз, с прореживанием), свежие — слиянием с файлом истории
+        (оба потока упорядочены по времени, дубли отбрасываются); в памяти
+        не больше одного дня импортируемых записей
+        """
+        days = self._staged_days()
+        cutoff = self._retention_cutoff().isoformat()
+        cutoff_day = self._retention_cutoff().date()
+
+        archived = 0
+        for day in days:
+            if day > cutoff_day:
+                break
+            old = [record for record in self._read_staged(day)
+                   if record["timestamp"] < cutoff]
+            if old:
+                archived += len(old)
+                self.archive.append(
+                    downsample(old, self.config.HISTORY_DOWNSAMPLE_SECONDS))
+
+        fresh_days = [day for day in days if day >= cutoff_day]
+
+        def staged_fresh() -> Iterator[dict]:
+            for day in fresh_days:
+                records = [record for record in self._read_staged(day)
+                           if record["timestamp"] >= cutoff]
+                records.sort(key=lambda record: record["timestamp"])
+                yield from records
+
+        written = 0
+        if fresh_days:
+            # при равном времени heapq.merge отдаёт сначала запись из файла истории
+            merged = heapq.merge(
+                iter_json_array(self.config.HISTORY_FILE_PATH), staged_fresh(),
+                key=lambda record: record["timestamp"]
+            )
+            written = self._write_hot_history_stream(self._unique(merged))
+
+        shutil.rmtree(self._import_staging_dir(), ignore_errors=True)
+        return {"archived": archived, "hot_records": written}
+
+    @staticmethod
+    def _unique(records: Iterable[dict]) -> Iterator[dict]:
+        """убирает повторы (пара, время) в упорядоченном по времени потоке"""
+        timestamp, seen = None, set()
+        for record in records:
+            if record["timestamp"] != timestamp:
+                timestamp, seen = record["timestamp"], set()
+            key = (record["from_currency"], record["to_currency"])
+            if key not in seen:
+                seen.add(key)
+                yield record
+
+    def _write_hot_history_stream(self, records: Iterable[dict]) -> int:
+        """пишет файл истории JSON-массивом по одной записи; возвращает их число"""
+        path = self.config.HISTORY_FILE_PATH
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        serializer = get_serializer()
+        count = 0
+        with open(tmp_path, 'wb') as f:
+            f.write(b"[")
+            for record in records:
+                if count:
+                    f.write(b",\n")
+                f.write(serializer.dumps(record))
+                count += 1
+            f.write(b"]")
+        os.replace(tmp_path, path)
+        return count
+
+    def _load_hot_history(self) -> List[dict]:
         if not os.path.exists(self.config.HISTORY_FILE_PATH):
             return []
-        
+
         try:
-            with open(self.config.HISTORY_FILE_PATH, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
+            return get_serializer().load_file(self.config.HISTORY_FILE_PATH)
+        except (ValueError, FileNotFoundError):
             return []
+
+    def _write_hot_history(self, records: List[dict]):
+        path = self.config.HISTORY_FILE_PATH
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        get_serializer().dump_file(records, tmp_path)
+        os.replace(tmp_path, path)
+
+    def load_historical_data(self, since: Optional[datetime] = None) -> List[dict]:
+        """загружает исторические данные: архивные сегменты и свежие записи"""
+        records = self.archive.read(since)
+        hot = self._load_hot_history()
+        if since:
+            since_iso = since.isoformat()
+            hot = [record for record in hot if record["timestamp"] >= since_iso]
+        records.extend(hot)
+        return records
+
+    def history_signature(self) -> tuple:
+        """меняется при любом изменении истории (файл или архив)"""
+        path = self.config.HISTORY_FILE_PATH
+        mtime = os.path.getmtime(path) if os.path.exists(path) else None
+        return mtime, self.archive.signature()
+
+    def _retention_cutoff(self) -> datetime:
+        return datetime.now() - timedelta(days=self.config.HISTORY_RAW_RETENTION_DAYS)
+
+    def _needs_compaction(self, records: List[dict]) -> bool:
+        # ждём ещё один интервал прореживания, чтобы не сжимать на каждом обновлении
+        if not records:
+            return False
+        threshold = self._retention_cutoff() - timedelta(
+            seconds=self.config.HISTORY_DOWNSAMPLE_SECONDS
+        )
+        return min(record["timestamp"] for record in records) < threshold.isoformat()
+
+    def compact_history(self) -> Dict[str, int]:
+        """переносит записи старше срока хранения в сжатый архив с прореживанием"""
+        return self._compact(self._load_hot_history())
+
+    def _compact(self, records: List[dict]) -> Dict[str, int]:
+        path = self.config.HISTORY_FILE_PATH
+        size_before = os.path.getsize(path) if os.path.exists(path) else 0
+        cutoff = self._retention_cutoff().isoformat()
+
+        old = [record for record in records if record["timestamp"] < cutoff]
+        fresh = [record for record in records if record["timestamp"] >= cutoff]
+        archived = downsample(old, self.config.HISTORY_DOWNSAMPLE_SECONDS)
+
+        segments = self.archive.append(archived) if archived else 0
+        self._write_hot_history(fresh)
+        pruned = self.archive.prune(self.config.HISTORY_ARCHIVE_RETENTION_DAYS)
+
+        return {
+            "moved": len(old),
+            "archived": len(archived),
+            "kept": len(fresh),
+            "segments": segments,
+            "pruned_segments": pruned,
+            "hot_bytes_before": size_before,
+            "hot_bytes_after": os.path.getsize(path),
+            "archive_bytes": self.archive.size_bytes()
+        }
     
     def load_current_rates(self) -> dict:
-        """загружает текущие курсы"""
-        if not os.path.exists(self.config.RATES_FILE_PATH):
-            return {"pairs": {}, "last_refresh": None}
-        
-        try:
-            with open(self.config.RATES_FILE_PATH, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
-            return {"pairs": {}, "last_refresh": None}
\ No newline at end of file
+        """загружает текущие курсы из актуального снимка"""
+        _, data = self.snapshots.read_current()
+        return data or {"pairs": {}, "last_refresh": None}
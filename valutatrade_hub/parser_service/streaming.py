@@ -0,0 +1,230 @@
+import json
+import logging
+import math
+import queue
+import socket
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from ..core.utils import validate_currency_code
+from .config import ParserConfig
+from .storage import RatesStorage
+
+Tick = Tuple[str, float, str]
+
+_STOP = object()
+
+
+def parse_tick(line: bytes) -> Optional[Tick]:
+    """
+    тик в формате JSON-строки
+    {"pair": "BTC_USD", "rate": 88000.0, "timestamp": "..."};
+    timestamp необязателен (ISO 8601 без часового пояса, как вся история);
+    None — строка не является корректным тиком
+    """
+    try:
+        data = json.loads(line)
+        pair = str(data["pair"]).upper()
+        rate = float(data["rate"])
+        timestamp = data.get("timestamp")
+        timestamp = datetime.fromisoformat(timestamp) if timestamp else datetime.now()
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+    codes = pair.split("_")
+    if len(codes) != 2 or not all(validate_currency_code(code) for code in codes):
+        return None
+    if not math.isfinite(rate) or rate <= 0 or timestamp.tzinfo is not None:
+        return None
+    return pair, rate, timestamp.isoformat()
+
+
+@contextmanager
+def open_feed(feed: str, timeout: float = 10.0):
+    """
+    источник строк с тиками: tcp://host:port, путь к файлу или '-' (stdin);
+    отдаёт итератор байтовых строк
+    """
+    if feed == "-":
+        yield iter(sys.stdin.buffer.readline, b"")
+        return
+
+    url = urlsplit(feed)
+    if url.scheme == "tcp":
+        if not url.hostname or not url.port:
+            raise ValueError(f"Invalid feed address '{feed}', expected tcp://host:port")
+        sock = socket.create_connection((url.hostname, url.port), timeout=timeout)
+        sock.settimeout(None)
+        stream = sock.makefile("rb")
+        try:
+            yield iter(stream.readline, b"")
+        finally:
+            stream.close()
+            sock.close()
+        return
+    if url.scheme:
+        raise ValueError(
+            f"Unsupported feed scheme '{url.scheme}', use tcp:// or a file")
+
+    with open(feed, "rb") as f:
+        yield iter(f.readline, b"")
+
+
+class StreamIngestor:
+    """
+    потоковый приём тиков: читающий поток кладёт тики в ограниченную очередь
+    (при переполнении чтение фида останавливается — backpressure), пишущий
+    цикл собирает микро-пакеты и сохраняет их одной записью снимка и истории
+    """
+
+    def __init__(self, config: Optional[ParserConfig] = None,
+                 storage: Optional[RatesStorage] = None, source: str = "STREAM"):
+        self.config = config or ParserConfig()
+        self.storage = storage or RatesStorage(self.config)
+        self.source = source
+        self.logger = logging.getLogger('parser')
+        self._listeners: List[Callable[[Dict[str, float], Dict[str, float]], None]] = []
+        self._stop = threading.Event()
+        self.stats: Dict[str, float] = {}
+
+    def add_listener(self,
+                     listener: Callable[[Dict[str, float], Dict[str, float]], None]):
+        """подписка на каждый записанный пакет: listener(old_rates, new_rates)"""
+        self._listeners.append(listener)
+
+    def stop(self):
+        """останавливает приём; накопленный пакет будет записан"""
+        self._stop.set()
+
+    def _reader(self, lines: Iterator[bytes], ticks: queue.Queue):
+        try:
+            for line in lines:
+                if self._stop.is_set():
+                    break
+                if not line.strip():
+                    continue
+                tick = parse_tick(line)
+                if tick is None:
+                    self.stats["invalid"] += 1
+                    continue
+                self.stats["received"] += 1
+                try:
+                    ticks.put_nowait(tick)
+                except queue.Full:
+                    started = time.perf_counter()
+                    self.stats["backpressure_waits"] += 1
+                    while not self._stop.is_set():
+                        try:
+                            ticks.put(tick, timeout=0.1)
+                            break
+                        except queue.Full:
+                            continue
+                    self.stats["backpressure_seconds"] += time.perf_counter() - started
+        except (OSError, ValueError) as e:
+            # после stop() фид закрывается под читающим потоком — это не ошибка
+            if not self._stop.is_set():
+                self.logger.error(f"Tick feed failed: {e}")
+        finally:
+            while True:
+                try:
+                    ticks.put(_STOP, timeout=0.1)
+                    break
+                except queue.Full:
+                    if self._stop.is_set():
+                        break
+
+    def _flush(self, batch: Dict[str, Tick], old_rates: Dict[str, float]):
+        """
+        пакет: последний тик каждой пары за интервал — одна запись истории и снимка;
+        снимок публикуется последним, после успешной записи истории
+        """
+        rates = {pair: rate for pair, rate, _ in batch.values()}
+        timestamps = {pair: timestamp for pair, _, timestamp in batch.values()}
+
+        self.stats["history_records"] += self.storage.save_historical_records(
+            rates, self.source, timestamps=timestamps
+        )
+        self.storage.merge_current_rates(rates, self.source, timestamps)
+        self.stats["batches"] += 1
+
+        for listener in self._listeners:
+            try:
+                listener(dict(old_rates), rates)
+            except Exception as e:
+                self.logger.error(f"Rates listener failed: {e}")
+        old_rates.update(rates)
+
+    def run(self, lines: Iterator[bytes],
+            duration: Optional[float] = None) -> Dict[str, float]:
+        """
+        принимает тики до конца фида, stop() или истечения duration секунд;
+        возвращает статистику приёма
+        """
+        self._stop.clear()
+        self.stats = dict.fromkeys(
+            ("received", "invalid", "written", "batches", "history_records",
+             "backpressure_waits", "backpressure_seconds", "max_queue"), 0
+        )
+        ticks: queue.Queue = queue.Queue(maxsize=max(1, self.config.STREAM_QUEUE_SIZE))
+        reader = threading.Thread(target=self._reader, args=(lines, ticks), daemon=True)
+
+        old_rates = {
+            pair: data["rate"]
+            for pair, data in self.storage.load_current_rates().get("pairs", {}).items()
+        }
+        interval = self.config.STREAM_BATCH_INTERVAL
+        batch_size = max(1, self.config.STREAM_BATCH_SIZE)
+        started = time.perf_counter()
+        deadline = started + duration if duration else None
+        reader.start()
+
+        batch: Dict[str, Tick] = {}
+        batch_ticks = 0
+        flush_at = time.perf_counter() + interval
+        finished = False
+        try:
+            while not finished:
+                timeout = flush_at - time.perf_counter()
+                if deadline is not None:
+                    timeout = min(timeout, deadline - time.perf_counter())
+                try:
+                    tick = ticks.get(timeout=max(timeout, 0.0))
+                except queue.Empty:
+                    tick = None
+
+                if tick is _STOP:
+                    finished = True
+                elif tick is not None:
+                    batch[tick[0]] = tick
+                    batch_ticks += 1
+
+                now = time.perf_counter()
+                if self._stop.is_set() or (deadline is not None and now >= deadline):
+                    finished = True
+                if batch and (finished or batch_ticks >= batch_size or now >= flush_at):
+                    self.stats["max_queue"] = max(self.stats["max_queue"],
+                                                  ticks.qsize())
+                    self._flush(batch, old_rates)
+                    self.stats["written"] += batch_ticks
+                    batch, batch_ticks = {}, 0
+                if now >= flush_at or not batch:
+                    flush_at = now + interval
+        except KeyboardInterrupt:
+            if batch:
+                self._flush(batch, old_rates)
+                self.stats["written"] += batch_ticks
+        finally:
+            self._stop.set()
+
+        self.stats["elapsed"] = time.perf_counter() - started
+        self.logger.info(
+            f"Stream finished: {self.stats['received']} ticks, "
+            f"{self.stats['batches']} batches, "
+            f"{self.stats['history_records']} history records"
+        )
+        return self.stats
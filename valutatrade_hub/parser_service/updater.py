@@ -1,30 +1,52 @@
 import logging
-from typing import Dict
+import time
+from typing import Callable, Dict, List, Optional
 
 from ..core.exceptions import ApiRequestError
 from .api_clients import CoinGeckoClient, ExchangeRateApiClient
 from .config import ParserConfig
+from .health import SourceHealthTracker
 from .storage import RatesStorage
 
 
 class RatesUpdater:
     """класс для обновления курсов"""
     
-    def __init__(self):
-        self.config = ParserConfig()
+    def __init__(self, config: Optional[ParserConfig] = None):
+        self.config = config or ParserConfig()
         self.storage = RatesStorage(self.config)
+        self.health = SourceHealthTracker(self.config)
         self.logger = logging.getLogger('parser')
         
         self.clients = {
             "coingecko": CoinGeckoClient(self.config),
             "exchangerate": ExchangeRateApiClient(self.config)
         }
+        self._listeners: List[Callable[[Dict[str, float], Dict[str, float]], None]] = []
+
+    def add_listener(self,
+                     listener: Callable[[Dict[str, float], Dict[str, float]], None]):
+        """подписка на обновление курсов: listener(old_rates, new_rates)"""
+        self._listeners.append(listener)
+
+    def _notify_listeners(self, old_rates: Dict[str, float],
+                          new_rates: Dict[str, float]):
+        """оповещает подписчиков о новых курсах"""
+        for listener in self._listeners:
+            try:
+                listener(old_rates, new_rates)
+            except Exception as e:
+                self.logger.error(f"Rates listener failed: {e}")
     
     def run_update(self, source: str = None) -> Dict[str, float]:
         """запускает обновление курсов"""
         self.logger.info("Starting rates update")
         
         all_rates = {}
+        old_rates = {
+            pair: data["rate"]
+            for pair, data in self.storage.load_current_rates().get("pairs", {}).items()
+        }
         sources_to_update = [source] if source else list(self.clients.keys())
         
         for client_name in sources_to_update:
@@ -32,27 +54,38 @@ class RatesUpdater:
                 self.logger.warning(f"Unknown source: {client_name}")
                 continue
             
+            if not self.health.allow_request(client_name):
+                self.logger.warning(f"Skipping {client_name}: circuit is open")
+                continue
+
+            started = time.perf_counter()
             try:
                 client = self.clients[client_name]
                 rates = client.fetch_rates()
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                self.health.record_success(client_name, elapsed_ms)
                 all_rates.update(rates)
                 
-                for pair, rate in rates.items():
-                    from_currency, to_currency = pair.split('_')
-                    self.storage.save_historical_record(
-                        from_currency, to_currency, rate, client_name.upper(),
-                        {"request_ms": 0, "status_code": 200}  # Заглушка для метаданных
-                    )
+                changed = self.storage.save_historical_records(
+                    rates, client_name.upper()
+                )
                 
-                self.logger.info(f"Successfully updated from {client_name}: {len(rates)} rates")
+                self.logger.info(
+                    f"Successfully updated from {client_name}: {len(rates)} rates, "
+                    f"{changed} changed"
+                )
                 
             except ApiRequestError as e:
+                self.health.record_failure(
+                    client_name, (time.perf_counter() - started) * 1000, str(e)
+                )
                 self.logger.error(f"Failed to update from {client_name}: {e}")
                 continue
         
         if all_rates:
             self.storage.save_current_rates(all_rates, "ParserService")
             self.logger.info(f"Update completed. Total rates: {len(all_rates)}")
+            self._notify_listeners(old_rates, all_rates)
         else:
             self.logger.warning("No rates were updated")
         